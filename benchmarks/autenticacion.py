@@ -0,0 +1,54 @@
+# benchmarks/autenticacion.py
+"""
+Peticiones por segundo autenticando con TokenAuthentication de DRF frente a
+TokenAuthenticationCacheada, y consultas SQL por petición. Se usa
+/api/categorias/ con la respuesta ya cacheada, así que la autenticación es
+la mayor parte del trabajo de base de datos.
+
+    python -m benchmarks.autenticacion --peticiones 2000
+"""
+import argparse
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+
+from benchmarks.comun import base_de_datos_temporal, cliente_para, crear_usuario, sembrar_movimientos
+from movimientos.autenticacion import TokenAuthenticationCacheada, cache_local
+from movimientos.views import CategoriaViewSet
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--peticiones', type=int, default=2000)
+    args = parser.parse_args()
+
+    with base_de_datos_temporal(cachear_respuestas=True):
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, 100)
+        cliente = cliente_para(usuario)
+        original = CategoriaViewSet.authentication_classes
+
+        try:
+            for nombre, clase in (('TokenAuthentication', TokenAuthentication),
+                                  ('TokenAuthenticationCacheada', TokenAuthenticationCacheada)):
+                CategoriaViewSet.authentication_classes = [clase]
+                cache_local().vaciar()
+                cliente.get('/api/categorias/')  # calienta caché de respuesta y de token
+
+                with CaptureQueriesContext(connection) as ctx:
+                    inicio = time.perf_counter()
+                    for _ in range(args.peticiones):
+                        r = cliente.get('/api/categorias/')
+                        assert r.status_code == 200, r.content
+                    duracion = time.perf_counter() - inicio
+
+                print(f'{nombre:>28}: {args.peticiones / duracion:8.0f} peticiones/s  '
+                      f'{len(ctx.captured_queries) / args.peticiones:.2f} consultas/petición')
+        finally:
+            CategoriaViewSet.authentication_classes = original
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/busqueda.py
+"""
+Latencia de ?search= en el listado de movimientos con SearchFilter (LIKE
+sobre todas las filas del usuario) frente a BusquedaMovimientosFilter (texto
+completo + trigramas con índices GIN y orden por relevancia).
+
+    python -m benchmarks.busqueda --filas 1000000
+
+La subcadena en cualquier posición necesita la extensión pg_trgm; la salida
+indica qué índices de búsqueda hay en el servidor.
+"""
+import argparse
+
+from django.db import connection
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from benchmarks.comun import (
+    base_de_datos_temporal, cliente_para, crear_usuario, medir, resumen_tiempos, sembrar_movimientos,
+)
+from movimientos.views import MovimientoViewSet
+
+TERMINOS = [
+    'gasolina',       # palabra frecuente (~1/8 de las filas)
+    '4321',           # término raro
+    'restaurantes',   # plural: solo lo encuentra el texto completo
+    'gasol',          # prefijo de palabra
+    'taur',           # fragmento interior: solo con pg_trgm
+]
+
+
+def indices_busqueda():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = 'movimientos_movimiento' "
+            "AND indexname LIKE 'mov_descripcion_%%'"
+        )
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=1_000_000)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args()
+
+    with base_de_datos_temporal():
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, args.filas, lote=20000)
+        cliente = cliente_para(usuario)
+        original = MovimientoViewSet.filter_backends
+        print(f'{args.filas} movimientos; índices de búsqueda: {", ".join(indices_busqueda()) or "ninguno"}')
+        print(f"{'término':>14} {'modo':>10} {'filas':>8} {'LIKE p50':>11} {'nuevo p50':>11} {'LIKE p90':>11} {'nuevo p90':>11}")
+
+        try:
+            for termino in TERMINOS:
+                for modo, extra in (('numerada', {}), ('cursor', {'paginacion': 'cursor'})):
+                    params = {'search': termino, **extra}
+                    resultados = {}
+                    for nombre, backends in (('like', [SearchFilter, OrderingFilter]), ('nuevo', original)):
+                        MovimientoViewSet.filter_backends = backends
+
+                        def peticion():
+                            r = cliente.get('/api/movimientos/', params)
+                            assert r.status_code == 200, r.content[:300]
+                            return r
+
+                        filas = peticion().json().get('count', '-')
+                        resultados[nombre] = (filas, resumen_tiempos(medir(peticion, args.repeticiones, 1)))
+                    (f_like, like), (f_nuevo, nuevo) = resultados['like'], resultados['nuevo']
+                    print(f"{termino:>14} {modo:>10} {str(f_like) + '/' + str(f_nuevo):>8} "
+                          f"{like['p50_ms']:>9.1f}ms {nuevo['p50_ms']:>9.1f}ms "
+                          f"{like['p90_ms']:>9.1f}ms {nuevo['p90_ms']:>9.1f}ms")
+        finally:
+            MovimientoViewSet.filter_backends = original
+
+
+if __name__ == '__main__':
+    main()
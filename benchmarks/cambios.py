@@ -0,0 +1,71 @@
+# benchmarks/cambios.py
+"""
+Sincronización incremental (/api/cambios/) frente a volver a descargarlo
+todo, que es lo que tiene que hacer un cliente con copia local sin ella: las
+categorías y todos los movimientos (con /exportar/?formato=ndjson, la forma
+más barata de bajarlos de una vez).
+
+Tras sembrar los movimientos se toma un token y se hacen --cambios
+modificaciones (un lote con actualizaciones y borrados a partes iguales);
+se mide la petición de cambios desde ese token y la recarga completa: bytes
+de la respuesta y latencia. El margen del token se pone a 0 para que no
+entren también los movimientos recién sembrados.
+
+    python -m benchmarks.cambios --filas 20000 --cambios 1 10 100 1000
+"""
+import argparse
+import random
+
+from benchmarks.comun import (
+    base_de_datos_temporal, cliente_para, crear_usuario, medir, resumen_tiempos, sembrar_movimientos,
+)
+from django.test.utils import override_settings
+
+from movimientos.models import Movimiento
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=20000)
+    parser.add_argument('--cambios', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    with base_de_datos_temporal(), override_settings(MOVIMIENTOS_CAMBIOS_MARGEN=0):
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, args.filas)
+        cliente = cliente_para(usuario)
+        azar = random.Random(1)
+        ids = list(Movimiento.objects.filter(usuario=usuario).values_list('id', flat=True))
+
+        def recarga():
+            categorias = cliente.get('/api/categorias/')
+            movimientos = cliente.get('/api/movimientos/exportar/', {'formato': 'ndjson'})
+            return len(categorias.content) + len(b''.join(movimientos.streaming_content))
+
+        bytes_recarga = recarga()
+        p50_recarga = resumen_tiempos(medir(recarga, args.repeticiones))['p50_ms']
+        print(f'{args.filas} movimientos; recarga completa: {bytes_recarga / 1024:9.1f} KiB  p50 {p50_recarga:8.2f} ms')
+
+        for n in args.cambios:
+            token = cliente.get('/api/cambios/', {'modelos': 'categorias'}).json()['token']
+            elegidos = azar.sample(ids, n)
+            for pk in elegidos[n // 2:]:
+                ids.remove(pk)
+            operaciones = [{'accion': 'actualizar', 'id': pk, 'descripcion': 'editado'} for pk in elegidos[:n // 2]]
+            operaciones += [{'accion': 'eliminar', 'id': pk} for pk in elegidos[n // 2:]]
+            assert cliente.post('/api/movimientos/lote/', operaciones, format='json').status_code == 200
+
+            def sincronizar():
+                r = cliente.get('/api/cambios/', {'since': token})
+                assert r.status_code == 200, r.content
+                return len(r.content)
+
+            tam = sincronizar()
+            p50 = resumen_tiempos(medir(sincronizar, args.repeticiones))['p50_ms']
+            print(f'  {n:5d} cambio(s): /cambios/ {tam / 1024:9.1f} KiB  p50 {p50:8.2f} ms   '
+                  f'x{bytes_recarga / tam:8.1f} menos bytes, x{p50_recarga / p50:6.1f} más rápido')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+# benchmarks/carga.py
+"""
+Prueba de carga WSGI frente a ASGI: latencia p50/p99 y peticiones por
+segundo de listado, resumen y resumen-mensual con concurrencia creciente.
+En WSGI se piden las vistas de /api/movimientos/ y en ASGI las asíncronas
+de /api/async/movimientos/.
+
+Por defecto las aplicaciones se llaman dentro del proceso, sin servidor
+HTTP: la WSGI (get_wsgi_application) desde tantos hilos cliente como
+concurrencia, limitados por un semáforo de --hilos como los hilos de un
+worker gthread de gunicorn, y la ASGI (get_asgi_application) con una tarea
+por cliente en un único bucle de eventos, como un worker de uvicorn.
+
+    python -m benchmarks.carga --filas 200000 --concurrencia 1 8 32
+
+Con --wsgi y --asgi se mide en cambio contra servidores ya arrancados, con
+datos propios y el token de un usuario:
+
+    gunicorn tfg_finanzas.wsgi -k gthread --threads 8 -b 127.0.0.1:8000
+    uvicorn tfg_finanzas.asgi:application --port 8001
+    python -m benchmarks.carga --wsgi http://127.0.0.1:8000 --asgi http://127.0.0.1:8001 --token <token>
+"""
+import argparse
+import asyncio
+import http.client
+import io
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import urlencode, urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+
+from benchmarks.comun import base_de_datos_temporal, crear_usuario, resumen_tiempos, sembrar_movimientos
+
+# Fechas que no empiezan en día 1: los resúmenes agregan sobre los movimientos
+# y no sobre AgregadoMensual, que es el caso lento
+ESCENARIOS = [
+    ('listado', 'movimientos/', {'page': 50}),
+    ('resumen', 'movimientos/resumen/', {'date_from': '2021-01-15'}),
+    ('resumen-mensual', 'movimientos/resumen-mensual/', {'date_from': '2021-01-15'}),
+]
+PREFIJOS = {'wsgi': '/api/', 'asgi': '/api/async/'}
+
+
+def en_hilos(peticion, concurrencia, duracion):
+    """Lanza `concurrencia` hilos que repiten peticion() durante `duracion` s."""
+    latencias, errores = [], []
+    fin = time.perf_counter() + duracion
+
+    def cliente():
+        hacer = peticion()
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            estado = hacer()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if estado != 200:
+                errores.append(estado)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=cliente) for _ in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return latencias, errores, time.perf_counter() - inicio
+
+
+def en_bucle(peticion, concurrencia, duracion):
+    """Como en_hilos, con `concurrencia` tareas de asyncio sobre peticion() (corrutina)."""
+    latencias, errores = [], []
+
+    async def cliente(fin):
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            estado = await peticion()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if estado != 200:
+                errores.append(estado)
+
+    async def principal():
+        fin = time.perf_counter() + duracion
+        await asyncio.gather(*(cliente(fin) for _ in range(concurrencia)))
+
+    inicio = time.perf_counter()
+    asyncio.run(principal())
+    return latencias, errores, time.perf_counter() - inicio
+
+
+# --- Aplicaciones dentro del proceso ---
+
+def peticion_wsgi(aplicacion, limite, ruta, params, token):
+    consulta = urlencode(params)
+
+    def fabrica():
+        def hacer():
+            estado = []
+            entorno = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': ruta, 'QUERY_STRING': consulta,
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': 'Token ' + token,
+                'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(),
+                'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            with limite:
+                cuerpo = aplicacion(entorno, lambda status, headers, exc_info=None: estado.append(status))
+                try:
+                    b''.join(cuerpo)
+                finally:
+                    cuerpo.close()  # envía request_finished: cierra la conexión como un servidor
+            return int(estado[0][:3])
+        return hacer
+    return fabrica
+
+
+def peticion_asgi(aplicacion, ruta, params, token):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(), 'root_path': '',
+        'query_string': urlencode(params).encode(),
+        'headers': [(b'host', b'testserver'), (b'authorization', ('Token ' + token).encode())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+
+    async def hacer():
+        estado = []
+        leido = False
+
+        async def receive():
+            nonlocal leido
+            if not leido:
+                leido = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await asyncio.Event().wait()  # el cliente no se desconecta
+
+        async def send(mensaje):
+            if mensaje['type'] == 'http.response.start':
+                estado.append(mensaje['status'])
+
+        await aplicacion(dict(scope), receive, send)
+        return estado[0]
+    return hacer
+
+
+# --- Servidores HTTP ---
+
+def peticion_http(base, ruta, params, token):
+    url = urlsplit(base)
+    objetivo = url.path.rstrip('/') + ruta + '?' + urlencode(params)
+    cabeceras = {'Authorization': 'Token ' + token}
+
+    def fabrica():
+        # Una conexión keep-alive por cliente
+        conexion = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=120)
+
+        def hacer():
+            try:
+                conexion.request('GET', objetivo, headers=cabeceras)
+                respuesta = conexion.getresponse()
+                respuesta.read()
+                return respuesta.status
+            except (OSError, http.client.HTTPException):
+                conexion.close()
+                return 'error'
+        return hacer
+    return fabrica
+
+
+def imprimir(despliegue, escenario, concurrencia, resultado):
+    latencias, errores, duracion = resultado
+    tiempos = resumen_tiempos(latencias) if latencias else {'p50_ms': 0, 'p99_ms': 0}
+    print(f'{escenario:>16} {despliegue:>5} c={concurrencia:<4} {len(latencias) / duracion:8.1f} pet/s  '
+          f'p50 {tiempos["p50_ms"]:8.1f} ms  p99 {tiempos["p99_ms"]:8.1f} ms'
+          + (f'  errores {len(errores)} ({sorted(set(map(str, errores)))})' if errores else ''))
+
+
+def medir_despliegues(args, token):
+    if args.wsgi or args.asgi:
+        despliegues = [(nombre, base) for nombre, base in (('wsgi', args.wsgi), ('asgi', args.asgi)) if base]
+    else:
+        despliegues = [('wsgi', None), ('asgi', None)]
+    wsgi = get_wsgi_application()
+    asgi = get_asgi_application()
+    limite = threading.BoundedSemaphore(args.hilos) if args.hilos else nullcontext()
+
+    for escenario, ruta, params in ESCENARIOS:
+        for nombre, base in despliegues:
+            ruta_completa = PREFIJOS[nombre] + ruta
+            for concurrencia in args.concurrencia:
+                if base:
+                    resultado = en_hilos(peticion_http(base, ruta_completa, params, token), concurrencia, args.duracion)
+                elif nombre == 'wsgi':
+                    resultado = en_hilos(peticion_wsgi(wsgi, limite, ruta_completa, params, token),
+                                         concurrencia, args.duracion)
+                else:
+                    resultado = en_bucle(peticion_asgi(asgi, ruta_completa, params, token),
+                                         concurrencia, args.duracion)
+                imprimir(nombre, escenario, concurrencia, resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=200000)
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--duracion', type=float, default=5, help='segundos por medida')
+    parser.add_argument('--hilos', type=int, default=8,
+                        help='hilos del worker WSGI dentro del proceso (0 = sin límite)')
+    parser.add_argument('--wsgi', help='URL base de un servidor WSGI ya arrancado')
+    parser.add_argument('--asgi', help='URL base de un servidor ASGI ya arrancado')
+    parser.add_argument('--token', help='token de usuario para --wsgi/--asgi')
+    args = parser.parse_args()
+
+    if args.wsgi or args.asgi:
+        if not args.token:
+            parser.error('--wsgi/--asgi necesitan --token')
+        medir_despliegues(args, args.token)
+        return
+
+    with base_de_datos_temporal():
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, args.filas)
+        medir_despliegues(args, usuario.auth_token.key)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/categorias.py
+"""
+Borrado y reasignación de categorías grandes:
+
+- Comprobación de si se puede borrar: COUNT(*) de los movimientos de la
+  categoría (lo que se hacía antes) frente a EXISTS, y latencia del DELETE
+  rechazado.
+- Mover sus movimientos a otra categoría: un PATCH por movimiento (medido
+  sobre una muestra) frente a /api/categorias/<id>/reasignar/.
+
+    python -m benchmarks.categorias --filas 200000
+"""
+import argparse
+import time
+
+from benchmarks.comun import (
+    base_de_datos_temporal, cliente_para, crear_usuario, medir, resumen_tiempos, sembrar_movimientos,
+)
+from movimientos.models import Movimiento
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=200000)
+    parser.add_argument('--muestra', type=int, default=300, help='movimientos movidos con PATCH')
+    args = parser.parse_args()
+
+    with base_de_datos_temporal():
+        usuario = crear_usuario()
+        categorias = sembrar_movimientos(usuario, args.filas)
+        origen, destino = (c for c in categorias if c.nombre in ('Supermercado', 'Transporte'))
+        cliente = cliente_para(usuario)
+        asociados = Movimiento.objects.filter(usuario=usuario, categoria=origen)
+        n = asociados.count()
+        print(f'{n} movimientos en la categoría')
+
+        for nombre, funcion in (('COUNT(*)', asociados.count), ('EXISTS', asociados.exists)):
+            print(f'  {nombre:>10}: p50 {resumen_tiempos(medir(funcion))["p50_ms"]:8.2f} ms')
+
+        def borrar():
+            r = cliente.delete(f'/api/categorias/{origen.pk}/')
+            assert r.status_code == 400, r.content
+        print(f'  DELETE rechazado: p50 {resumen_tiempos(medir(borrar))["p50_ms"]:8.2f} ms')
+
+        ids = list(asociados.values_list('pk', flat=True)[:args.muestra])
+        inicio = time.perf_counter()
+        for pk in ids:
+            r = cliente.patch(f'/api/movimientos/{pk}/', {'categoria': destino.pk}, format='json')
+            assert r.status_code == 200, r.content
+        por_patch = len(ids) / (time.perf_counter() - inicio)
+        Movimiento.objects.filter(pk__in=ids).update(categoria=origen)
+
+        inicio = time.perf_counter()
+        r = cliente.post(f'/api/categorias/{origen.pk}/reasignar/', {'destino': destino.pk}, format='json')
+        duracion = time.perf_counter() - inicio
+        assert r.status_code == 200 and r.json()['movidos'] == n, r.content
+
+        print(f'  PATCH por movimiento: {por_patch:10.0f} movimientos/s  ({n / por_patch:8.1f} s para toda la categoría)')
+        print(f'  reasignar:            {n / duracion:10.0f} movimientos/s  ({duracion:8.2f} s)')
+
+
+if __name__ == '__main__':
+    main()
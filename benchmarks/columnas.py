@@ -0,0 +1,62 @@
+# benchmarks/columnas.py
+"""
+Bytes y tiempo de serialización por cada 1.000 movimientos: JSON actual
+(MovimientoSerializer + JSONRenderer) frente a la representación en columnas
+(values_list + ColumnasRenderer) y MessagePack, si está instalado. También
+la latencia de una página de 100 del listado en cada formato.
+
+    python -m benchmarks.columnas --filas 20000
+"""
+import argparse
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks.comun import (
+    base_de_datos_temporal, cliente_para, crear_usuario, medir, resumen_tiempos, sembrar_movimientos,
+)
+from movimientos.columnas import CAMPOS_MOVIMIENTO, ColumnasRenderer, MsgpackRenderer, columnas_movimientos, msgpack
+from movimientos.models import Movimiento
+from movimientos.serializers import MovimientoSerializer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=20000)
+    args = parser.parse_args()
+
+    with base_de_datos_temporal():
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, args.filas)
+        qs = Movimiento.objects.filter(usuario=usuario).defer('descripcion_tsv').order_by('-fecha', '-id')
+        campos = [campo for _, campo in CAMPOS_MOVIMIENTO]
+
+        formatos = [
+            ('json', lambda: JSONRenderer().render(MovimientoSerializer(list(qs), many=True).data)),
+            ('columnas', lambda: ColumnasRenderer().render(columnas_movimientos(list(qs.values_list(*campos))))),
+        ]
+        if msgpack is not None:
+            formatos.append(
+                ('msgpack', lambda: MsgpackRenderer().render(columnas_movimientos(list(qs.values_list(*campos)))))
+            )
+
+        print(f'{args.filas} movimientos (consulta incluida); por cada 1.000:')
+        for nombre, funcion in formatos:
+            cuerpo = funcion()
+            inicio = time.perf_counter()
+            for _ in range(5):
+                funcion()
+            ms = (time.perf_counter() - inicio) / 5 * 1000
+            print(f'  {nombre:>9}: {ms * 1000 / args.filas:7.2f} ms  {len(cuerpo) * 1000 / args.filas / 1024:7.1f} KiB')
+
+        cliente = cliente_para(usuario)
+        print('Página de 100 del listado:')
+        for nombre, _ in formatos:
+            params = {'page_size': 100, 'page': 3, **({} if nombre == 'json' else {'format': nombre})}
+            tiempos = medir(lambda: cliente.get('/api/movimientos/', params))
+            print(f'  {nombre:>9}: p50 {resumen_tiempos(tiempos)["p50_ms"]:7.2f} ms  '
+                  f'{len(cliente.get("/api/movimientos/", params).content) / 1024:6.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
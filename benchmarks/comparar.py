@@ -0,0 +1,73 @@
+# benchmarks/comparar.py
+"""
+Comparar un periodo con otros: /comparar/ frente a lo que hacía el cliente
+sin él, pedir resumen y resumen-mensual de cada periodo por separado (dos
+peticiones y dos consultas por periodo) y restar.
+
+Se mide con un número creciente de periodos de comparación (el anterior,
+el del año anterior y los de años antes), con rangos de meses completos
+(leídos de los agregados mensuales) y con rangos a mitad de mes (los meses
+completos de los agregados y los días de los extremos de los movimientos).
+
+    python -m benchmarks.comparar --filas 200000 --periodos 1 2 4 8
+"""
+import argparse
+from datetime import date
+
+from benchmarks.comun import (
+    base_de_datos_temporal, cliente_para, crear_usuario, medir, resumen_tiempos, sembrar_movimientos,
+)
+
+from movimientos.comparacion import restar_meses
+
+RANGOS = [
+    ('meses completos', date(2025, 1, 1), date(2025, 6, 30)),
+    ('a mitad de mes', date(2025, 1, 15), date(2025, 7, 14)),
+]
+
+
+def comparaciones(desde, hasta, n):
+    """'anterior', 'anio_anterior' y los mismos meses de años anteriores hasta tener n."""
+    nombres = ['anterior', 'anio_anterior']
+    for anios in range(2, n):
+        nombres.append(f'{restar_meses(desde, 12 * anios)}:{restar_meses(hasta, 12 * anios)}')
+    return nombres[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=200000)
+    parser.add_argument('--periodos', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    with base_de_datos_temporal():
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, args.filas, anios=10)
+        cliente = cliente_para(usuario)
+        print(f'{args.filas} movimientos en 10 años; periodo base de 6 meses')
+
+        for nombre, desde, hasta in RANGOS:
+            print(f'{nombre}:')
+            for n in args.periodos:
+                nombres = comparaciones(desde, hasta, n)
+                params = {'date_from': desde.isoformat(), 'date_to': hasta.isoformat(), 'comparar': ','.join(nombres)}
+                periodos = cliente.get('/api/movimientos/comparar/', params).json()['periodos']
+
+                def endpoint():
+                    assert cliente.get('/api/movimientos/comparar/', params).status_code == 200
+
+                def por_separado():
+                    for periodo in periodos:
+                        filtro = {'date_from': periodo['desde'], 'date_to': periodo['hasta']}
+                        assert cliente.get('/api/movimientos/resumen/', filtro).status_code == 200
+                        assert cliente.get('/api/movimientos/resumen-mensual/', filtro).status_code == 200
+
+                unica = resumen_tiempos(medir(endpoint, args.repeticiones))['p50_ms']
+                separadas = resumen_tiempos(medir(por_separado, args.repeticiones))['p50_ms']
+                print(f'  {n} comparación(es): /comparar/ p50 {unica:8.2f} ms   '
+                      f'{2 * len(periodos)} peticiones p50 {separadas:8.2f} ms   x{separadas / unica:5.1f}')
+
+
+if __name__ == '__main__':
+    main()
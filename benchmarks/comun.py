@@ -0,0 +1,127 @@
+# benchmarks/comun.py
+"""
+Utilidades compartidas por los benchmarks.
+
+Cada benchmark crea su propia base de datos de pruebas (la de settings con
+el prefijo test_, igual que `manage.py test`) y la destruye al terminar, así
+que se puede lanzar contra la misma instancia de PostgreSQL del desarrollo:
+
+    python -m benchmarks.paginacion --filas 100000
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tfg_finanzas.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from movimientos.agregados import recalcular  # noqa: E402
+from movimientos.models import Categoria, Movimiento  # noqa: E402
+
+
+@contextmanager
+def base_de_datos_temporal(conservar=False, cachear_respuestas=False):
+    """
+    Crea la BD de pruebas, migrada, y la borra al salir (salvo conservar=True).
+    La caché de respuestas de la API se desactiva salvo que se pida: si no,
+    las repeticiones medirían aciertos de caché.
+    """
+    setup_test_environment(debug=False)  # como `manage.py test`: sin registro de consultas
+    nombre_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=conservar)
+    try:
+        with override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=cachear_respuestas):
+            yield
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=conservar)
+        teardown_test_environment()
+
+
+def crear_usuario(username='bench'):
+    usuario = User.objects.create_user(username=username, password='pass123456')
+    Token.objects.get_or_create(user=usuario)
+    return usuario
+
+
+def cliente_para(usuario):
+    token, _ = Token.objects.get_or_create(user=usuario)
+    cliente = APIClient()
+    cliente.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+    return cliente
+
+
+def sembrar_movimientos(usuario, n, anios=5, lote=5000, semilla=1):
+    """Inserta n movimientos aleatorios repartidos en `anios` años y recalcula agregados."""
+    rnd = random.Random(semilla)
+    categorias = Categoria.objects.bulk_create([
+        Categoria(usuario=usuario, nombre=nombre, tipo=tipo)
+        for nombre, tipo in [
+            ('Salario', 'ingreso'), ('Otros ingresos', 'ingreso'), ('Alquiler', 'gasto'),
+            ('Supermercado', 'gasto'), ('Transporte', 'gasto'), ('Ocio', 'gasto'),
+        ]
+    ])
+    fin = date(2025, 12, 31)
+    dias = 365 * anios
+    palabras = ['compra', 'recibo', 'transferencia', 'nómina', 'gasolina', 'restaurante', 'alquiler', 'luz']
+    filas = []
+    for i in range(n):
+        filas.append(Movimiento(
+            usuario=usuario,
+            categoria=rnd.choice(categorias),
+            descripcion=f'{rnd.choice(palabras)} {rnd.randint(1, 9999)}',
+            fecha=fin - timedelta(days=rnd.randrange(dias)),
+            cantidad=Decimal(rnd.randint(100, 200000)) / 100,
+        ))
+        if len(filas) >= lote:
+            Movimiento.objects.bulk_create(filas)
+            filas = []
+    Movimiento.objects.bulk_create(filas)
+    recalcular(usuario.id)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    return categorias
+
+
+def medir(funcion, repeticiones=20, calentamiento=2):
+    """Ejecuta `funcion` y devuelve la lista de duraciones en milisegundos."""
+    for _ in range(calentamiento):
+        funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+def resumen_tiempos(tiempos):
+    return {
+        'p50_ms': round(statistics.median(tiempos), 3),
+        'p90_ms': round(percentil(tiempos, 90), 3),
+        'p99_ms': round(percentil(tiempos, 99), 3),
+    }
@@ -0,0 +1,121 @@
+# benchmarks/conexiones.py
+"""
+Parte de la latencia que se va en abrir la conexión a PostgreSQL, según el
+modo de conexiones de settings_produccion (DJANGO_DB_MODO):
+
+- sin persistencia: CONN_MAX_AGE = 0, una conexión nueva por petición (lo
+  que hace settings.py)
+- persistente: CONN_MAX_AGE = 60 con CONN_HEALTH_CHECKS
+- pool: tfg_finanzas.postgresql_pool
+
+Cada modo se mide en un proceso aparte con la aplicación WSGI llamada dentro
+del proceso (como un worker de gunicorn, que cierra la conexión al terminar
+cada petición según CONN_MAX_AGE), contra la misma base de datos de pruebas.
+Para cada uno da p50/p99, peticiones por segundo y el porcentaje del tiempo
+pasado en DatabaseWrapper.connect().
+
+    python -m benchmarks.conexiones --peticiones 2000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import nullcontext
+
+MODOS = [
+    ('sin persistencia', {'DJANGO_DB_MODO': 'persistente', 'DJANGO_DB_CONN_MAX_AGE': '0'}),
+    ('persistente', {'DJANGO_DB_MODO': 'persistente', 'DJANGO_DB_CONN_MAX_AGE': '60'}),
+    ('pool', {'DJANGO_DB_MODO': 'pool'}),
+]
+RUTA = '/api/movimientos/'
+
+
+def medir_modo(args):
+    """Proceso hijo: mide las peticiones con la configuración del entorno."""
+    from benchmarks.comun import resumen_tiempos
+    from benchmarks.carga import peticion_wsgi
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connections
+    from django.test.utils import override_settings
+
+    clase = type(connections['default'])
+    conectar = clase.connect
+    en_conexion = []
+
+    def connect_medido(self):
+        inicio = time.perf_counter()
+        try:
+            return conectar(self)
+        finally:
+            en_conexion.append((time.perf_counter() - inicio) * 1000)
+
+    clase.connect = connect_medido
+    with override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=False):
+        hacer = peticion_wsgi(get_wsgi_application(), nullcontext(), RUTA, {'page': 3}, args.token)()
+        for _ in range(20):
+            hacer()
+        en_conexion.clear()
+        latencias = []
+        for _ in range(args.peticiones):
+            inicio = time.perf_counter()
+            estado = hacer()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            assert estado == 200, estado
+    print(json.dumps({
+        **resumen_tiempos(latencias),
+        'peticiones_s': round(len(latencias) / (sum(latencias) / 1000), 1),
+        'conexiones': len(en_conexion),
+        'conexion_pct': round(sum(en_conexion) / sum(latencias) * 100, 1),
+        'conexion_ms': round(sum(en_conexion) / max(len(en_conexion), 1), 3),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peticiones', type=int, default=2000)
+    parser.add_argument('--filas', type=int, default=20000)
+    parser.add_argument('--token', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.token:
+        medir_modo(args)
+        return
+
+    from benchmarks.comun import base_de_datos_temporal, crear_usuario, sembrar_movimientos
+    from django.db import connection
+
+    if connection.vendor != 'postgresql':
+        parser.error('Este benchmark necesita PostgreSQL.')
+
+    with base_de_datos_temporal():
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, args.filas)
+        datos = connection.settings_dict
+        entorno = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'tfg_finanzas.settings_produccion',
+            'DJANGO_SECRET_KEY': 'benchmark', 'DJANGO_ALLOWED_HOSTS': 'testserver',
+            'DJANGO_DB_NAME': datos['NAME'], 'DJANGO_DB_USER': datos['USER'] or '',
+            'DJANGO_DB_PASSWORD': datos['PASSWORD'] or '', 'DJANGO_DB_HOST': datos['HOST'] or '',
+            'DJANGO_DB_PORT': str(datos['PORT'] or '5432'),
+        }
+        # Que el hijo no cree ni borre nada: usa la base de datos ya creada
+        connection.close()
+
+        print(f"{'modo':>18} {'p50 ms':>8} {'p99 ms':>8} {'pet/s':>8} {'conexiones':>10} {'ms/conexión':>11} {'% en conexión':>13}")
+        for nombre, variables in MODOS:
+            salida = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.conexiones', '--peticiones', str(args.peticiones),
+                 '--token', usuario.auth_token.key],
+                env={**entorno, **variables}, capture_output=True, text=True,
+            )
+            if salida.returncode:
+                sys.exit(f'{nombre}: el proceso de medida ha fallado\n{salida.stderr}')
+            r = json.loads(salida.stdout.strip().splitlines()[-1])
+            print(f"{nombre:>18} {r['p50_ms']:8.2f} {r['p99_ms']:8.2f} {r['peticiones_s']:8.0f} "
+                  f"{r['conexiones']:10d} {r['conexion_ms']:11.2f} {r['conexion_pct']:12.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# benchmarks/exportacion.py
+"""
+Exportación completa por /api/movimientos/exportar/: tiempo hasta el primer
+byte, filas por segundo y pico de memoria de Python mientras se consume la
+respuesta en streaming.
+
+    python -m benchmarks.exportacion --filas 200000
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.comun import base_de_datos_temporal, cliente_para, crear_usuario, sembrar_movimientos
+
+
+def consumir(cliente, formato):
+    inicio = time.perf_counter()
+    respuesta = cliente.get('/api/movimientos/exportar/', {'formato': formato})
+    contenido = iter(respuesta.streaming_content)
+    primero = next(contenido)
+    primer_byte = time.perf_counter() - inicio
+    total_bytes, lineas = len(primero), primero.count(b'\n')
+    for trozo in contenido:
+        total_bytes += len(trozo)
+        lineas += trozo.count(b'\n')
+    respuesta.close()
+    return primer_byte, time.perf_counter() - inicio, total_bytes, lineas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=200000)
+    args = parser.parse_args()
+
+    with base_de_datos_temporal():
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, args.filas)
+        cliente = cliente_para(usuario)
+
+        for formato in ('csv', 'ndjson'):
+            primer_byte, duracion, total_bytes, _ = consumir(cliente, formato)
+            tracemalloc.start()
+            consumir(cliente, formato)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'{formato:>6}: primer byte {primer_byte * 1000:7.1f} ms  total {duracion:6.2f}s  '
+                  f'{args.filas / duracion:9.0f} filas/s  {total_bytes / 1024 / 1024:7.1f} MiB  '
+                  f'pico de memoria {pico / 1024 / 1024:5.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
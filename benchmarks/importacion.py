@@ -0,0 +1,68 @@
+# benchmarks/importacion.py
+"""
+Importación de extractos CSV: filas por segundo y pico de memoria de Python
+(tracemalloc) para ficheros de distinto tamaño. Con la importación en
+streaming el pico debe mantenerse prácticamente constante.
+
+    python -m benchmarks.importacion --filas 1000 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.comun import base_de_datos_temporal, crear_usuario
+from movimientos.importacion import importar, leer_csv
+from movimientos.models import Movimiento
+
+CATEGORIAS = ['Supermercado', 'Transporte', 'Ocio', 'Restaurantes', 'Salario']
+
+
+def escribir_csv(ruta, n, semilla=1):
+    rnd = random.Random(semilla)
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        f.write('fecha;descripcion;cantidad;categoria\n')
+        for i in range(n):
+            categoria = rnd.choice(CATEGORIAS)
+            signo = '' if categoria == 'Salario' else '-'
+            importe = f'{rnd.randint(100, 200000) / 100:.2f}'.replace('.', ',')
+            f.write(f'{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025;fila {i};{signo}{importe};{categoria}\n')
+
+
+def importar_fichero(usuario, ruta, tam_lote):
+    with open(ruta, encoding='utf-8', newline='') as f:
+        return importar(usuario, leer_csv(f), tam_lote=tam_lote)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--tam-lote', type=int, default=1000)
+    args = parser.parse_args()
+
+    with base_de_datos_temporal(), tempfile.TemporaryDirectory() as directorio:
+        usuario = crear_usuario()
+        for n in args.filas:
+            ruta = os.path.join(directorio, f'extracto_{n}.csv')
+            escribir_csv(ruta, n)
+
+            # Dos pasadas: tracemalloc ralentiza mucho, así que no se mide el tiempo con él activo
+            inicio = time.perf_counter()
+            resultado = importar_fichero(usuario, ruta, args.tam_lote)
+            duracion = time.perf_counter() - inicio
+            assert resultado['importados'] == n, resultado
+            Movimiento.objects.filter(usuario=usuario).delete()
+
+            tracemalloc.start()
+            importar_fichero(usuario, ruta, args.tam_lote)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            Movimiento.objects.filter(usuario=usuario).delete()
+
+            print(f'{n:>9} filas  {duracion:8.2f}s  {n / duracion:10.0f} filas/s  '
+                  f'pico de memoria {pico / 1024 / 1024:6.1f} MiB')
+
+if __name__ == '__main__':
+    main()
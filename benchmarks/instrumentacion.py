@@ -0,0 +1,68 @@
+# benchmarks/instrumentacion.py
+"""
+Coste de la instrumentación por petición: peticiones por segundo del
+listado y del resumen sin InstrumentacionMiddleware (ni execute_wrapper),
+con él sin muestreo (solo Server-Timing) y con muestreo completo (huellas de
+las consultas y registro JSON, aquí a un logger sin salida).
+
+    python -m benchmarks.instrumentacion --peticiones 1000
+"""
+import argparse
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+
+from benchmarks.comun import base_de_datos_temporal, cliente_para, crear_usuario, sembrar_movimientos
+from movimientos import instrumentacion
+
+MIDDLEWARE = 'movimientos.instrumentacion.InstrumentacionMiddleware'
+RUTAS = ['/api/movimientos/', '/api/movimientos/resumen/?date_from=2021-01-15']
+CONFIGURACIONES = [
+    ('sin instrumentación', False, 0.0),
+    ('muestreo 0', True, 0.0),
+    ('muestreo 1', True, 1.0),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--peticiones', type=int, default=1000)
+    parser.add_argument('--filas', type=int, default=20000)
+    args = parser.parse_args()
+
+    # Se mide el trabajo de preparar el registro, no la escritura a consola
+    registro = logging.getLogger('movimientos.instrumentacion')
+    registro.handlers, registro.propagate = [logging.NullHandler()], False
+    registro.setLevel(logging.INFO)
+
+    with base_de_datos_temporal():
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, args.filas)
+
+        for ruta in RUTAS:
+            for nombre, activa, muestreo in CONFIGURACIONES:
+                middleware = [m for m in settings.MIDDLEWARE if activa or m != MIDDLEWARE]
+                with override_settings(MIDDLEWARE=middleware, MOVIMIENTOS_INSTRUMENTACION_MUESTREO=muestreo):
+                    if activa:
+                        instrumentacion.instalar(connection)
+                    elif instrumentacion._envoltorio in connection.execute_wrappers:
+                        connection.execute_wrappers.remove(instrumentacion._envoltorio)
+                    # Cliente nuevo: carga la cadena de middleware de esta configuración
+                    cliente = cliente_para(usuario)
+                    for _ in range(20):
+                        cliente.get(ruta)
+                    inicio = time.perf_counter()
+                    for _ in range(args.peticiones):
+                        r = cliente.get(ruta)
+                        assert r.status_code == 200, r.content
+                    duracion = time.perf_counter() - inicio
+                print(f'{ruta:>48} {nombre:>20}: {args.peticiones / duracion:8.0f} peticiones/s  '
+                      f'{duracion / args.peticiones * 1000:.3f} ms/petición')
+        instrumentacion.instalar(connection)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/lote.py
+"""
+Rendimiento de alta de movimientos: una petición POST por fila frente a
+una sola petición a /api/movimientos/lote/.
+
+    python -m benchmarks.lote --filas 5000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.comun import base_de_datos_temporal, cliente_para, crear_usuario
+from movimientos.models import Categoria, Movimiento
+
+
+def filas_aleatorias(categorias, n, semilla=1):
+    rnd = random.Random(semilla)
+    return [
+        {
+            'categoria': rnd.choice(categorias).id,
+            'fecha': f'2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}',
+            'cantidad': f'{rnd.randint(1, 100000) / 100:.2f}',
+            'descripcion': f'fila {i}',
+        }
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=5000)
+    args = parser.parse_args()
+
+    with base_de_datos_temporal():
+        usuario = crear_usuario()
+        categorias = [
+            Categoria.objects.create(usuario=usuario, nombre='Salario', tipo='ingreso'),
+            Categoria.objects.create(usuario=usuario, nombre='Compras', tipo='gasto'),
+        ]
+        cliente = cliente_para(usuario)
+        filas = filas_aleatorias(categorias, args.filas)
+
+        inicio = time.perf_counter()
+        for fila in filas:
+            r = cliente.post('/api/movimientos/', fila, format='json')
+            assert r.status_code == 201, r.content
+        por_fila = time.perf_counter() - inicio
+
+        Movimiento.objects.filter(usuario=usuario).delete()
+
+        inicio = time.perf_counter()
+        r = cliente.post('/api/movimientos/lote/', filas, format='json')
+        assert r.status_code == 200, r.content[:500]
+        en_lote = time.perf_counter() - inicio
+
+        print(f'{args.filas} movimientos')
+        print(f'  por fila: {por_fila:8.2f}s  {args.filas / por_fila:10.0f} filas/s')
+        print(f'  en lote:  {en_lote:8.2f}s  {args.filas / en_lote:10.0f} filas/s  (x{por_fila / en_lote:.1f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/paginacion.py
+"""
+Latencia por página del listado de movimientos: paginación numerada
+(COUNT + OFFSET) frente a ?paginacion=cursor (keyset), de la página 1 a
+la 10.000.
+
+    python -m benchmarks.paginacion --filas 100000 --page-size 10
+"""
+import argparse
+
+from benchmarks.comun import (
+    base_de_datos_temporal, cliente_para, crear_usuario, medir, resumen_tiempos, sembrar_movimientos,
+)
+from movimientos.models import Movimiento
+from movimientos.pagination import KeysetPagination
+
+
+def cursor_para_pagina(usuario, pagina, page_size):
+    """Cursor que apunta al inicio de `pagina` (la última fila de la anterior)."""
+    if pagina == 1:
+        return None
+    fila = (Movimiento.objects.filter(usuario=usuario)
+            .order_by('-fecha', '-id')[(pagina - 1) * page_size - 1])
+    paginador = KeysetPagination()
+    paginador.orden = [('fecha', True), ('id', True)]
+    return paginador.cursor_de(fila, reverso=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=100_000)
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--paginas', default='1,10,100,1000,10000')
+    args = parser.parse_args()
+
+    with base_de_datos_temporal():
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, args.filas)
+        cliente = cliente_para(usuario)
+
+        print(f'{args.filas} movimientos, page_size={args.page_size}')
+        print(f"{'página':>8} {'offset p50':>12} {'cursor p50':>12} {'offset p99':>12} {'cursor p99':>12}")
+        for pagina in [int(p) for p in args.paginas.split(',')]:
+            if (pagina - 1) * args.page_size >= args.filas:
+                break
+            cursor = cursor_para_pagina(usuario, pagina, args.page_size)
+
+            def por_offset():
+                r = cliente.get('/api/movimientos/', {'page': pagina, 'page_size': args.page_size})
+                assert r.status_code == 200, r.status_code
+
+            def por_cursor():
+                params = {'paginacion': 'cursor', 'page_size': args.page_size}
+                if cursor:
+                    params['cursor'] = cursor
+                r = cliente.get('/api/movimientos/', params)
+                assert r.status_code == 200, r.status_code
+
+            offset = resumen_tiempos(medir(por_offset, args.repeticiones))
+            keyset = resumen_tiempos(medir(por_cursor, args.repeticiones))
+            print(f"{pagina:>8} {offset['p50_ms']:>10.2f}ms {keyset['p50_ms']:>10.2f}ms "
+                  f"{offset['p99_ms']:>10.2f}ms {keyset['p99_ms']:>10.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/particiones.py
+"""
+Tabla de movimientos sin particionar frente a particionada por fecha
+(movimientos/particiones.py), sobre los mismos datos: varios usuarios con un
+histórico de años. Para cada consulta acotada por fechas da la latencia p50,
+las particiones recorridas y los bloques leídos (EXPLAIN ANALYZE BUFFERS), y
+además filas por segundo insertando movimientos del mes actual y el tiempo
+de la conversión.
+
+    python -m benchmarks.particiones --filas 200000 --usuarios 5 --granularidad mensual
+"""
+import argparse
+import json
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks.comun import (
+    base_de_datos_temporal, cliente_para, crear_usuario, medir, resumen_tiempos, sembrar_movimientos,
+)
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from movimientos import particiones
+from movimientos.models import Movimiento
+
+CONSULTAS = [
+    ('listado de un mes', '/api/movimientos/', {'date_from': '2024-03-01', 'date_to': '2024-03-31'}),
+    ('listado de un año', '/api/movimientos/', {'date_from': '2023-01-01', 'date_to': '2023-12-31'}),
+    ('resumen de 3 semanas', '/api/movimientos/resumen/', {'date_from': '2024-05-10', 'date_to': '2024-05-31'}),
+    ('saldo diario de un año', '/api/movimientos/saldo/', {'periodo': 'dia', 'date_from': '2022-01-01', 'date_to': '2022-12-31'}),
+]
+
+
+def plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql)
+        resultado = cursor.fetchone()[0]
+    return (json.loads(resultado) if isinstance(resultado, str) else resultado)[0]['Plan']
+
+
+def recorrido(plan):
+    """Tablas de movimientos recorridas y bloques leídos (en caché o disco)."""
+    tablas, pendientes = set(), [plan]
+    while pendientes:
+        nodo = pendientes.pop()
+        pendientes += nodo.get('Plans', [])
+        if nodo.get('Relation Name', '').startswith(particiones.TABLA):
+            tablas.add(nodo['Relation Name'])
+    return tablas, plan.get('Shared Hit Blocks', 0) + plan.get('Shared Read Blocks', 0)
+
+
+def medir_consultas(cliente):
+    for nombre, url, params in CONSULTAS:
+        with CaptureQueriesContext(connection) as ctx:
+            assert cliente.get(url, params).status_code == 200
+        tablas, bloques = set(), 0
+        for q in ctx.captured_queries:
+            if particiones.TABLA in q['sql']:
+                t, b = recorrido(plan(q['sql']))
+                tablas |= t
+                bloques += b
+        tiempos = medir(lambda: cliente.get(url, params))
+        print(f'  {nombre:<24} p50 {resumen_tiempos(tiempos)["p50_ms"]:8.2f} ms  '
+              f'{len(tablas):4d} tabla(s)  {bloques:8d} bloques')
+
+
+def medir_inserciones(usuario, categoria, filas):
+    hoy = date.today()
+    nuevos = [
+        Movimiento(usuario=usuario, categoria=categoria, descripcion=f'nuevo {i}',
+                   fecha=hoy - timedelta(days=i % 28), cantidad=Decimal('9.99'))
+        for i in range(filas)
+    ]
+    inicio = time.perf_counter()
+    Movimiento.objects.bulk_create(nuevos, batch_size=1000)
+    duracion = time.perf_counter() - inicio
+    Movimiento.objects.filter(descripcion__startswith='nuevo ').delete()
+    print(f'  {"inserción":<24} {filas / duracion:10.0f} filas/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=200000, help='movimientos por usuario')
+    parser.add_argument('--usuarios', type=int, default=5)
+    parser.add_argument('--anios', type=int, default=10)
+    parser.add_argument('--granularidad', choices=particiones.GRANULARIDADES, default='mensual')
+    parser.add_argument('--inserciones', type=int, default=20000)
+    args = parser.parse_args()
+
+    if connection.vendor != 'postgresql':
+        parser.error('Este benchmark necesita PostgreSQL.')
+
+    with base_de_datos_temporal():
+        for n in range(args.usuarios):
+            usuario = crear_usuario(f'bench{n}')
+            categorias = sembrar_movimientos(usuario, args.filas, anios=args.anios, semilla=n)
+        cliente = cliente_para(usuario)
+        print(f'{args.usuarios * args.filas} movimientos, {args.anios} años')
+
+        print('sin particionar:')
+        medir_consultas(cliente)
+        medir_inserciones(usuario, categorias[3], args.inserciones)
+
+        inicio = time.perf_counter()
+        particiones.particionar(connection, args.granularidad)
+        with connection.cursor() as cursor:
+            n_particiones = len(particiones.particiones(cursor))
+        print(f'conversión ({args.granularidad}, {n_particiones} particiones): {time.perf_counter() - inicio:.1f} s')
+
+        print('particionada:')
+        medir_consultas(cliente)
+        medir_inserciones(usuario, categorias[3], args.inserciones)
+
+
+if __name__ == '__main__':
+    main()
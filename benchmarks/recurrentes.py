@@ -0,0 +1,101 @@
+# benchmarks/recurrentes.py
+"""
+Materializar movimientos recurrentes: `materializar` (por lotes de reglas,
+movimientos/recurrentes.py) frente a lo inmediato, recorrer las reglas
+una a una y guardar cada ocurrencia con save() (un INSERT, las señales de
+los agregados y la caché por movimiento, y un UPDATE por regla).
+
+Cada usuario tiene --reglas reglas (mensuales y semanales) que empiezan el
+1 de enero; se materializan --meses meses de ocurrencias. Entre las dos
+medidas se borran los movimientos creados y se reprograman las reglas.
+
+    python -m benchmarks.recurrentes --usuarios 200 --reglas 5 --meses 3
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks.comun import base_de_datos_temporal, crear_usuario
+from django.db import connection, transaction
+
+from movimientos.agregados import recalcular
+from movimientos.models import Categoria, Movimiento, MovimientoRecurrente
+from movimientos.recurrentes import materializar, ocurrencias, programar, siguiente_tras
+
+INICIO = date(2025, 1, 1)
+
+
+def uno_a_uno(hasta):
+    for regla in MovimientoRecurrente.objects.filter(siguiente__lte=hasta).order_by('id'):
+        with transaction.atomic():
+            for fecha in ocurrencias(regla, regla.siguiente, hasta):
+                Movimiento.objects.create(
+                    usuario_id=regla.usuario_id, categoria_id=regla.categoria_id, recurrente=regla,
+                    descripcion=regla.descripcion, fecha=fecha, cantidad=regla.cantidad,
+                )
+            regla.siguiente = siguiente_tras(regla, hasta)
+            regla.save(update_fields=['siguiente'])
+
+
+def reiniciar(usuarios):
+    Movimiento.objects.all().delete()
+    MovimientoRecurrente.objects.update(siguiente=INICIO)
+    for usuario in usuarios:
+        recalcular(usuario)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=200)
+    parser.add_argument('--reglas', type=int, default=5, help='Reglas por usuario')
+    parser.add_argument('--meses', type=int, default=3)
+    parser.add_argument('--tam-lote', type=int, default=1000)
+    args = parser.parse_args()
+
+    with base_de_datos_temporal():
+        azar = random.Random(1)
+        usuarios = []
+        reglas = []
+        for i in range(args.usuarios):
+            usuario = crear_usuario(f'bench{i}')
+            usuarios.append(usuario)
+            gasto = Categoria.objects.create(usuario=usuario, nombre='Gastos fijos', tipo='gasto')
+            ingreso = Categoria.objects.create(usuario=usuario, nombre='Nómina', tipo='ingreso')
+            for j in range(args.reglas):
+                regla = MovimientoRecurrente(
+                    usuario=usuario, categoria=ingreso if j == 0 else gasto, descripcion=f'Regla {j}',
+                    cantidad=Decimal(azar.randint(100, 200000)) / 100,
+                    frecuencia=MovimientoRecurrente.SEMANAL if j % 2 else MovimientoRecurrente.MENSUAL,
+                    inicio=INICIO + timedelta(days=azar.randint(0, 27)),
+                )
+                programar(regla)
+                reglas.append(regla)
+        MovimientoRecurrente.objects.bulk_create(reglas)
+        MovimientoRecurrente.objects.update(siguiente=INICIO)
+        hasta = INICIO.replace(month=args.meses + 1) - timedelta(days=1)
+
+        print(f'{args.usuarios} usuarios x {args.reglas} reglas, ocurrencias hasta {hasta}')
+        for nombre, funcion in (
+            ('una a una', lambda: uno_a_uno(hasta)),
+            (f'por lotes de {args.tam_lote}', lambda: materializar(hasta, tam_lote=args.tam_lote)),
+        ):
+            reiniciar(usuarios)
+            consultas = [0]
+
+            def contar(execute, sql, params, many, context):
+                consultas[0] += 1
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(contar):
+                inicio = time.perf_counter()
+                funcion()
+                segundos = time.perf_counter() - inicio
+            creados = Movimiento.objects.count()
+            print(f'  {nombre:<20} {creados} movimientos en {segundos:7.2f} s '
+                  f'({creados / segundos:8.0f}/s), {consultas[0]} consultas')
+
+
+if __name__ == '__main__':
+    main()
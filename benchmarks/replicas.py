@@ -0,0 +1,92 @@
+# benchmarks/replicas.py
+"""
+Reparto de las consultas entre primario y réplica con una carga mixta de
+lecturas y escrituras (movimientos/replicas.py).
+
+La réplica se simula con un segundo alias sobre la misma base de datos de
+pruebas, así que no mide el alivio del primario en sí, sino qué parte de las
+consultas saldría de él y lo que cuesta el enrutado. Varios usuarios hacen
+peticiones al azar: listado, resumen y resumen-mensual, y con probabilidad
+--escrituras un POST de un movimiento. Tras escribir, las lecturas del
+usuario se quedan en el primario durante --ventana segundos.
+
+Da, sin réplicas y con réplica, la latencia por petición y el porcentaje de
+consultas (y de peticiones GET) que van a cada alias.
+
+    python -m benchmarks.replicas --usuarios 20 --peticiones 2000 --escrituras 0.05
+"""
+import argparse
+import random
+import time
+
+from benchmarks.comun import (
+    base_de_datos_temporal, cliente_para, crear_usuario, resumen_tiempos, sembrar_movimientos,
+)
+from django.core.cache import cache
+from django.db import connections
+from django.test.utils import override_settings
+
+LECTURAS = [('/api/movimientos/', {'page': 2}), ('/api/movimientos/resumen/', {}),
+            ('/api/movimientos/resumen-mensual/', {})]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--filas', type=int, default=2000, help='Movimientos por usuario')
+    parser.add_argument('--peticiones', type=int, default=2000)
+    parser.add_argument('--escrituras', type=float, default=0.05, help='Proporción de peticiones POST')
+    parser.add_argument('--ventana', type=float, default=1.0)
+    args = parser.parse_args()
+
+    with base_de_datos_temporal():
+        connections.settings['replica'] = {**connections['default'].settings_dict}
+        clientes = []
+        for i in range(args.usuarios):
+            usuario = crear_usuario(f'bench{i}')
+            categoria = sembrar_movimientos(usuario, args.filas, semilla=i)[0]
+            clientes.append((usuario, cliente_para(usuario), categoria))
+
+        consultas = {'default': 0, 'replica': 0}
+
+        def contar(alias):
+            def envoltorio(execute, sql, params, many, context):
+                consultas[alias] += 1
+                return execute(sql, params, many, context)
+            return envoltorio
+
+        print(f'{args.usuarios} usuarios x {args.filas} movimientos, {args.peticiones} peticiones, '
+              f'{args.escrituras:.0%} escrituras, ventana {args.ventana} s')
+        for nombre, alias in (('sin réplicas', []), ('con réplica', ['replica'])):
+            azar = random.Random(1)  # la misma secuencia de peticiones en los dos casos
+            consultas.update(default=0, replica=0)
+            lecturas = {'default': 0, 'replica': 0}
+            latencias = []
+            cache.clear()
+            with override_settings(MOVIMIENTOS_REPLICAS=alias, MOVIMIENTOS_REPLICAS_VENTANA=args.ventana), \
+                    connections['default'].execute_wrapper(contar('default')), \
+                    connections['replica'].execute_wrapper(contar('replica')):
+                for _ in range(args.peticiones):
+                    usuario, cliente, categoria = azar.choice(clientes)
+                    antes = consultas['replica']
+                    inicio = time.perf_counter()
+                    if azar.random() < args.escrituras:
+                        r = cliente.post('/api/movimientos/', {
+                            'categoria': categoria.pk, 'fecha': '2025-06-01', 'cantidad': '1.00',
+                        }, format='json')
+                        assert r.status_code == 201, r.content
+                    else:
+                        ruta, params = azar.choice(LECTURAS)
+                        assert cliente.get(ruta, params).status_code == 200
+                        lecturas['replica' if consultas['replica'] > antes else 'default'] += 1
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+            total = sum(consultas.values())
+            tiempos = resumen_tiempos(latencias)
+            print(f'  {nombre:<13} p50 {tiempos["p50_ms"]:7.2f} ms  p99 {tiempos["p99_ms"]:7.2f} ms  '
+                  f'consultas en réplica {consultas["replica"] / total:6.1%}  '
+                  f'GET en réplica {lecturas["replica"] / max(sum(lecturas.values()), 1):6.1%}')
+        connections['replica'].close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/saldo.py
+"""
+Saldo acumulado de varios años: /api/movimientos/saldo/ (ventana en la base
+de datos, respuesta en columnas) frente a lo que tendría que hacer el
+frontend sin él, recorrer el listado completo página a página y acumular.
+Da latencia y tamaño de la respuesta, y compara el JSON en columnas con el
+mismo contenido como un objeto por periodo.
+
+    python -m benchmarks.saldo --filas 100000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.comun import (
+    base_de_datos_temporal, cliente_para, crear_usuario, medir, resumen_tiempos, sembrar_movimientos,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=100000)
+    args = parser.parse_args()
+
+    with base_de_datos_temporal():
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, args.filas)
+        cliente = cliente_para(usuario)
+
+        for periodo in ('dia', 'semana', 'mes'):
+            respuesta = cliente.get('/api/movimientos/saldo/', {'periodo': periodo})
+            datos = respuesta.json()
+            por_fila = json.dumps([
+                {'periodo': p, 'ingresos': i, 'gastos': g, 'saldo': s}
+                for p, i, g, s in zip(datos['periodos'], datos['ingresos'], datos['gastos'], datos['saldo'])
+            ])
+            tiempos = medir(lambda: cliente.get('/api/movimientos/saldo/', {'periodo': periodo}))
+            print(f'saldo periodo={periodo:<6}: p50 {resumen_tiempos(tiempos)["p50_ms"]:8.2f} ms  '
+                  f'{len(datos["periodos"]):5d} periodos  {len(respuesta.content) / 1024:7.1f} KiB '
+                  f'(objeto por periodo: {len(por_fila) / 1024:7.1f} KiB)')
+
+        inicio = time.perf_counter()
+        paginas, url, total = 0, '/api/movimientos/?paginacion=cursor&page_size=100', 0
+        while url:
+            pagina = cliente.get(url).json()
+            total += len(pagina['results'])
+            paginas += 1
+            url = pagina['next']
+        print(f'listado completo por cursor: {(time.perf_counter() - inicio) * 1000:8.0f} ms  '
+              f'{paginas} peticiones  {total} movimientos')
+
+
+if __name__ == '__main__':
+    main()
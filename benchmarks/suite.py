@@ -0,0 +1,242 @@
+# benchmarks/suite.py
+"""
+Suite de benchmarks de la API sobre datos sintéticos (comando generar_datos).
+
+Genera los datos en una base de datos de pruebas y mide cada escenario
+(listado y paginación, filtros, búsqueda, resumen, resumen-mensual, saldo,
+CRUD de categorías y registro) con el cliente de pruebas de DRF, sin la
+caché de respuestas. Para cada uno da los percentiles de latencia, las consultas SQL
+por petición y, en PostgreSQL, las filas leídas (EXPLAIN ANALYZE de los
+SELECT de una petición: filas devueltas más filas descartadas por filtro en
+cada nodo de lectura de tabla).
+
+Con --salida se guarda el resultado en JSON (con el commit actual) y con
+--comparar se imprime la diferencia frente a un JSON anterior:
+
+    python -m benchmarks.suite --salida antes.json
+    git checkout otra-rama
+    python -m benchmarks.suite --comparar antes.json
+"""
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from benchmarks.comun import base_de_datos_temporal, cliente_para, medir, resumen_tiempos
+from movimientos.models import Categoria, Movimiento
+
+HASTA = date(2025, 12, 31)  # fecha fija: los mismos datos en cada ejecución
+# Escenarios que trabajan sobre lo que crea otro
+DEPENDENCIAS = {'categorias-editar': 'categorias-crear', 'categorias-borrar': 'categorias-crear'}
+NODOS_TABLA = {'Seq Scan', 'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan'}
+
+
+def filas_de_plan(nodo):
+    """Filas leídas por los nodos de lectura de tabla de un plan de EXPLAIN (ANALYZE, FORMAT JSON)."""
+    filas = 0
+    if nodo['Node Type'] in NODOS_TABLA:
+        leidas = nodo['Actual Rows'] + nodo.get('Rows Removed by Filter', 0) + nodo.get('Rows Removed by Index Recheck', 0)
+        filas += leidas * nodo['Actual Loops']
+    return filas + sum(filas_de_plan(hijo) for hijo in nodo.get('Plans', []))
+
+
+def filas_leidas(consultas):
+    if connection.vendor != 'postgresql':
+        return None
+    total = 0
+    with connection.cursor() as cursor:
+        for consulta in consultas:
+            sql = consulta['sql']
+            if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql)
+            plan = cursor.fetchone()[0]
+            total += filas_de_plan((json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan'])
+    return int(total)
+
+
+def comprobar(respuesta, esperado):
+    if respuesta.status_code != esperado:
+        raise AssertionError(f'{respuesta.status_code} != {esperado}: {respuesta.content[:300]!r}')
+    return respuesta
+
+
+def escenarios(cliente, usuario):
+    """Lista de (nombre, función(i) -> respuesta) en el orden en que se miden."""
+    get = lambda url, params=None: comprobar(cliente.get(url, params), 200)  # noqa: E731
+    supermercado = Categoria.objects.get(usuario=usuario, nombre='Supermercado').pk
+    n = Movimiento.objects.filter(usuario=usuario).count()
+
+    # Enlace de la página 20 con paginación por cursor
+    pagina_cursor = get('/api/movimientos/', {'paginacion': 'cursor'}).json()
+    for _ in range(19):
+        pagina_cursor = get(pagina_cursor['next']).json()
+
+    creadas = []
+
+    def crear(i):
+        respuesta = comprobar(cliente.post('/api/categorias/', {'nombre': f'Bench {i}', 'tipo': 'gasto'}), 201)
+        creadas.append(respuesta.json()['id'])
+        return respuesta
+
+    def editar(i):
+        pk = creadas[i % len(creadas)]
+        return comprobar(cliente.patch(f'/api/categorias/{pk}/', {'nombre': f'Bench editada {i}'}), 200)
+
+    def borrar(i):
+        return comprobar(cliente.delete(f'/api/categorias/{creadas.pop()}/'), 204)
+
+    def registrar(i):
+        clave = 'Clave-de-prueba-9'
+        return comprobar(cliente.post('/api/registro/', {
+            'username': f'registro{i}', 'password': clave, 'password2': clave,
+        }), 201)
+
+    hace_un_anio = HASTA - timedelta(days=365)
+    return [
+        ('listado', lambda i: get('/api/movimientos/')),
+        ('listado-pagina-profunda', lambda i: get('/api/movimientos/', {'page': max(1, n // 20)})),
+        ('listado-cursor', lambda i: get(pagina_cursor['next'])),
+        ('filtro-categoria', lambda i: get('/api/movimientos/', {'categoria': supermercado})),
+        ('filtro-tipo', lambda i: get('/api/movimientos/', {'tipo': 'ingreso'})),
+        ('filtro-fechas', lambda i: get('/api/movimientos/', {
+            'date_from': hace_un_anio.isoformat(), 'date_to': (hace_un_anio + timedelta(days=180)).isoformat(),
+        })),
+        ('busqueda', lambda i: get('/api/movimientos/', {'search': 'mercadona'})),
+        ('busqueda-prefijo', lambda i: get('/api/movimientos/', {'search': 'gasol'})),
+        ('resumen', lambda i: get('/api/movimientos/resumen/')),
+        ('resumen-rango', lambda i: get('/api/movimientos/resumen/', {'date_from': hace_un_anio.isoformat()})),
+        ('resumen-mensual', lambda i: get('/api/movimientos/resumen-mensual/', {
+            'date_from': f'{HASTA.year}-01-01', 'date_to': f'{HASTA.year}-12-31',
+        })),
+        ('resumen-mensual-rango', lambda i: get('/api/movimientos/resumen-mensual/', {
+            'date_from': hace_un_anio.isoformat(),
+        })),
+        ('saldo-dia', lambda i: get('/api/movimientos/saldo/', {'periodo': 'dia'})),
+        ('saldo-mes-inicial', lambda i: get('/api/movimientos/saldo/', {
+            'date_from': f'{HASTA.year}-01-01', 'saldo_inicial': 1,
+        })),
+        ('categorias-listado', lambda i: get('/api/categorias/')),
+        ('categorias-crear', crear),
+        ('categorias-editar', editar),
+        ('categorias-borrar', borrar),
+        ('registro', registrar),
+    ]
+
+
+def medir_escenario(funcion, repeticiones, calentamiento):
+    """Calienta, captura las consultas de una petición y mide `repeticiones` peticiones."""
+    indices = itertools.count()
+    for _ in range(calentamiento):
+        funcion(next(indices))
+    with CaptureQueriesContext(connection) as ctx:
+        funcion(next(indices))
+    # Copia: cada petición del cliente de pruebas vacía connection.queries
+    consultas = list(ctx.captured_queries)
+    filas = filas_leidas(consultas)
+    tiempos = medir(lambda: funcion(next(indices)), repeticiones=repeticiones, calentamiento=0)
+    return {
+        'peticiones': repeticiones,
+        **resumen_tiempos(tiempos),
+        'media_ms': round(sum(tiempos) / len(tiempos), 3),
+        'consultas': len(consultas),
+        'filas_leidas': filas,
+    }
+
+
+def commit_actual():
+    try:
+        salida = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent.parent, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return salida.stdout.strip()
+
+
+def imprimir(resultados, anterior=None):
+    print(f"{'escenario':>24} {'p50 ms':>9} {'p99 ms':>9} {'consultas':>9} {'filas':>9}"
+          + ('  p50 antes   cambio' if anterior else ''))
+    for nombre, r in resultados.items():
+        filas = '-' if r['filas_leidas'] is None else r['filas_leidas']
+        linea = f"{nombre:>24} {r['p50_ms']:9.2f} {r['p99_ms']:9.2f} {r['consultas']:9d} {filas:>9}"
+        previo = (anterior or {}).get(nombre)
+        if previo:
+            linea += f"  {previo['p50_ms']:9.2f}  {(r['p50_ms'] / previo['p50_ms'] - 1) * 100:+6.1f}%"
+        print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=5)
+    parser.add_argument('--anios', type=int, default=5)
+    parser.add_argument('--movimientos-por-mes', type=int, default=100)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    parser.add_argument('--calentamiento', type=int, default=3)
+    parser.add_argument('--escenarios', nargs='*', help='Solo los escenarios cuyo nombre contenga alguno de estos textos')
+    parser.add_argument('--salida', help='Fichero JSON donde guardar los resultados')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior con el que comparar')
+    args = parser.parse_args()
+
+    anterior = json.loads(Path(args.comparar).read_text(encoding='utf-8'))['escenarios'] if args.comparar else None
+
+    with base_de_datos_temporal():
+        call_command(
+            'generar_datos', usuarios=args.usuarios, anios=args.anios,
+            movimientos_por_mes=args.movimientos_por_mes, prefijo='bench', hasta=HASTA.isoformat(),
+            stdout=sys.stderr,
+        )
+        # Se mide con el primer usuario; el resto de datos hace de volumen de la tabla
+        usuario = get_user_model().objects.get(username='bench0001')
+        datos = {
+            'movimientos': Movimiento.objects.count(),
+            'movimientos_usuario': Movimiento.objects.filter(usuario=usuario).count(),
+        }
+        cliente = cliente_para(usuario)
+
+        lista = escenarios(cliente, usuario)
+        elegidos = {
+            nombre for nombre, _ in lista
+            if not args.escenarios or any(texto in nombre for texto in args.escenarios)
+        }
+        elegidos |= {DEPENDENCIAS[nombre] for nombre in elegidos if nombre in DEPENDENCIAS}
+
+        resultados = {}
+        for nombre, funcion in lista:
+            if nombre not in elegidos:
+                continue
+            resultados[nombre] = medir_escenario(funcion, args.repeticiones, args.calentamiento)
+            print(f'{nombre}: p50 {resultados[nombre]["p50_ms"]} ms', file=sys.stderr)
+
+        entorno = {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'base_de_datos': connection.vendor,
+            'version_base_de_datos': getattr(connection, 'pg_version', None),
+        }
+
+    imprimir(resultados, anterior)
+    if args.salida:
+        Path(args.salida).write_text(json.dumps({
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit_actual(),
+            'entorno': entorno,
+            'parametros': {k: v for k, v in vars(args).items() if k not in ('salida', 'comparar')},
+            'datos': datos,
+            'escenarios': resultados,
+        }, indent=2, ensure_ascii=False), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/tareas.py
+"""
+Trabajo pesado dentro de la petición frente a encargado como tarea:
+
+- Latencia de hacer en la petición un informe de todo el histórico (resumen,
+  resumen-mensual y saldo diario) y una exportación completa, frente a la de
+  encargarlos en /api/tareas/ (lo que ocupa al servidor web).
+- Tareas por segundo ejecutando una tanda de informes y exportaciones con
+  `procesar_tareas --una-vez` y distinto número de procesos.
+
+    python -m benchmarks.tareas --filas 200000 --tareas 40 --procesos 1 2 4
+"""
+import argparse
+import os
+import time
+from io import StringIO
+
+from benchmarks.comun import (
+    base_de_datos_temporal, cliente_para, crear_usuario, medir, resumen_tiempos, sembrar_movimientos,
+)
+from django.core.management import call_command
+from django.test.utils import override_settings
+
+from movimientos.models import Tarea
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=200000)
+    parser.add_argument('--tareas', type=int, default=40)
+    parser.add_argument('--procesos', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with base_de_datos_temporal(), override_settings(MEDIA_ROOT='/tmp/benchmark-tareas'):
+        usuario = crear_usuario()
+        sembrar_movimientos(usuario, args.filas, anios=10)
+        cliente = cliente_para(usuario)
+        print(f'{args.filas} movimientos, {os.cpu_count()} CPU')
+
+        def informe():
+            for url, params in (('resumen/', {}), ('resumen-mensual/', {}), ('saldo/', {'periodo': 'dia'})):
+                assert cliente.get(f'/api/movimientos/{url}', params).status_code == 200
+
+        def exportar():
+            r = cliente.get('/api/movimientos/exportar/')
+            assert r.status_code == 200
+            for _ in r.streaming_content:
+                pass
+
+        def encargar(tipo):
+            def hacer():
+                r = cliente.post('/api/tareas/', {'tipo': tipo}, format='json')
+                assert r.status_code == 202, r.content
+            return hacer
+
+        print('latencia de la petición:')
+        for nombre, funcion in (
+            ('informe en la petición', informe), ('informe como tarea', encargar('informe')),
+            ('exportar en la petición', exportar), ('exportar como tarea', encargar('exportar')),
+        ):
+            tiempos = medir(funcion, repeticiones=10, calentamiento=1)
+            print(f'  {nombre:<24} p50 {resumen_tiempos(tiempos)["p50_ms"]:9.2f} ms')
+        Tarea.objects.all().delete()
+
+        print(f'{args.tareas} tareas (mitad informes, mitad exportaciones):')
+        for procesos in args.procesos:
+            Tarea.objects.bulk_create([
+                Tarea(usuario=usuario, tipo='informe' if i % 2 else 'exportar') for i in range(args.tareas)
+            ])
+            inicio = time.perf_counter()
+            call_command('procesar_tareas', procesos=procesos, una_vez=True, stdout=StringIO())
+            duracion = time.perf_counter() - inicio
+            assert Tarea.objects.filter(estado=Tarea.TERMINADA).count() == args.tareas
+            print(f'  {procesos:2d} proceso(s): {duracion:7.2f} s  {args.tareas / duracion:6.2f} tareas/s')
+            for tarea in Tarea.objects.all():
+                tarea.salida.delete(save=False)
+            Tarea.objects.all().delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 // src/pages/CategoryList.jsx
 import React, { useEffect, useState } from 'react';
 import axios from 'axios';
+import { sincronizarCategorias } from '../services/sincronizacion';
 import {
   Container, Paper, Typography, Alert, Stack, TextField, Button,
   List, ListItem, ListItemText, IconButton, Chip, FormControl, InputLabel, Select, MenuItem
@@ -38,8 +39,8 @@ export default function CategoryList() {
   }, [error, info]);
 
   const fetchCategories = () => {
-    axios.get('/api/categorias/', { params: { ordering: 'nombre', page_size: 1000 } })
-      .then(r => setCategories(Array.isArray(r.data) ? r.data : (r.data.results || [])))
+    sincronizarCategorias()
+      .then(setCategories)
       .catch(() => setError('Error al cargar categorías'));
   };
 
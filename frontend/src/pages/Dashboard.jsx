@@ -49,13 +49,13 @@ export default function Dashboard() {
     if (desde) params.date_from = desde;
     if (hasta) params.date_to   = hasta;
 
-    Promise.all([
-      axios.get('/api/movimientos/resumen-mensual/', { params }),
-      axios.get('/api/movimientos/resumen/',        { params }),
-    ]).then(([m, r]) => {
-      setSeriesMensual(m.data?.series || []);
-      setCatsResumen(r.data?.por_categoria || []);
-    }).catch(() => setError('Error al cargar datos del dashboard'));
+    // Serie mensual y desglose por categoría en una sola petición
+    axios.get('/api/movimientos/dashboard/', { params })
+      .then(r => {
+        setSeriesMensual(r.data?.series || []);
+        setCatsResumen(r.data?.por_categoria || []);
+      })
+      .catch(() => setError('Error al cargar datos del dashboard'));
   }, [desde, hasta]);
 
   useEffect(() => { cargar(); }, [cargar]);
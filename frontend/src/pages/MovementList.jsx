@@ -1,6 +1,7 @@
 // src/pages/MovementList.jsx
 import React, { useState, useEffect, useCallback } from 'react';
 import axios from 'axios';
+import { sincronizarCategorias } from '../services/sincronizacion';
 import {
   Container, Paper, Typography, Alert, Grid, Stack, TextField, Select, MenuItem,
   IconButton, Button, List, ListItem, ListItemText, Chip, FormControl, InputLabel,
@@ -76,12 +77,8 @@ export default function MovementList() {
   }, [error]);
 
   const fetchCategories = () => {
-    axios.get('/api/categorias/', { params: { ordering: 'nombre', page_size: 1000 } })
-      .then(r => {
-        const data = r.data;
-        const list = Array.isArray(data) ? data : (data.results || []);
-        setCategories(list);
-      })
+    sincronizarCategorias()
+      .then(setCategories)
       .catch(() => setError('Error al cargar categorías'));
   };
 
@@ -98,30 +95,13 @@ export default function MovementList() {
     c => !filtroTipo || filtroTipo === '__all__' || c.tipo === filtroTipo
   );
 
-  // KPIs (totales) del backend con los mismos filtros (sin paginar)
-  const fetchResumen = useCallback(() => {
-    const params = {};
-    if (filtroCategoria && filtroCategoria !== '__all__') params.categoria = filtroCategoria;
-    if (filtroTipo && filtroTipo !== '__all__') params.tipo = filtroTipo;
-    if (desde) params.date_from = desde;
-    if (hasta) params.date_to = hasta;
-    if (search) params.search = search;
-
-    axios.get('/api/movimientos/resumen', { params })
-      .then(r => setKpis({
-        total_ingresos: r.data?.total_ingresos || 0,
-        total_gastos:   r.data?.total_gastos   || 0,
-        balance:        r.data?.balance        || 0,
-      }))
-      .catch(() => setError('Error al calcular totales'));
-  }, [filtroCategoria, filtroTipo, desde, hasta, search]);
-
-  // Lista paginada
+  // Lista paginada + KPIs (totales sin paginar con los mismos filtros) en una sola petición
   const fetchMovements = useCallback(() => {
     const params = {
       page,
       page_size: pageSize,
       ordering,
+      incluir_movimientos: 1,
     };
     if (filtroCategoria && filtroCategoria !== '__all__') params.categoria = filtroCategoria;
     if (filtroTipo && filtroTipo !== '__all__') params.tipo = filtroTipo;
@@ -129,23 +109,28 @@ export default function MovementList() {
     if (hasta) params.date_to = hasta;
     if (search) params.search = search;
 
-    axios.get('/api/movimientos/', { params })
+    axios.get('/api/movimientos/dashboard/', { params })
       .then(r => {
-        if (Array.isArray(r.data)) {
+        const lista = r.data?.movimientos;
+        if (Array.isArray(lista)) {
           // por si la paginación global no estuviera activa
-          setMovements(r.data);
-          setCount(r.data.length);
+          setMovements(lista);
+          setCount(lista.length);
         } else {
-          setMovements(r.data.results || []);
-          setCount(r.data.count || 0);
+          setMovements(lista?.results || []);
+          setCount(lista?.count || 0);
         }
+        setKpis({
+          total_ingresos: r.data?.total_ingresos || 0,
+          total_gastos:   r.data?.total_gastos   || 0,
+          balance:        r.data?.balance        || 0,
+        });
       })
       .catch(() => setError('Error al cargar movimientos'));
   }, [page, pageSize, ordering, filtroCategoria, filtroTipo, desde, hasta, search]);
 
   // Carga cuando cambian filtros, paginación u ordenación
   useEffect(() => { fetchMovements(); }, [fetchMovements]);
-  useEffect(() => { fetchResumen(); }, [fetchResumen]);
 
   // Si cambia cualquier filtro “de criterio”, resetea a página 1
   useEffect(() => { setPage(1); }, [filtroCategoria, filtroTipo, desde, hasta, search, pageSize, ordering]);
@@ -179,7 +164,6 @@ export default function MovementList() {
         setCantidad('');
         setDescripcion('');
         fetchMovements();
-        fetchResumen();
       })
       .catch((err) => {
         const msg = err.response?.data?.cantidad?.[0]
@@ -213,7 +197,7 @@ export default function MovementList() {
       fecha: editFecha,
       cantidad: val.toFixed(2),
       descripcion: editDescripcion
-    }).then(() => { cancelEdit(); fetchMovements(); fetchResumen(); })
+    }).then(() => { cancelEdit(); fetchMovements(); })
      .catch((err) => {
        const msg = err.response?.data?.cantidad?.[0]
          || err.response?.data?.detail
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { olvidarCopiaLocal } from './sincronizacion';
 
 const API_URL = '/api-token-auth/';
 
@@ -11,6 +12,7 @@ export function setToken(token) {
 // Elimina el token y la cabecera
 export function clearToken() {
   localStorage.removeItem('token');
+  olvidarCopiaLocal();
   delete axios.defaults.headers.common['Authorization'];
 }
 
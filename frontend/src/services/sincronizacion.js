@@ -0,0 +1,45 @@
+import axios from 'axios';
+
+// Copia local de las categorías en localStorage, al día con /api/cambios/:
+// cada visita solo pide lo creado, cambiado o borrado desde la anterior.
+const CLAVE = 'categorias';
+
+function leerCopia() {
+  try {
+    return JSON.parse(localStorage.getItem(CLAVE));
+  } catch {
+    return null;
+  }
+}
+
+// Al cerrar sesión: la copia es del usuario que la descargó
+export function olvidarCopiaLocal() {
+  localStorage.removeItem(CLAVE);
+}
+
+// Devuelve las categorías del usuario ordenadas por nombre
+export async function sincronizarCategorias() {
+  const copia = leerCopia();
+  const params = { modelos: 'categorias' };
+  if (copia?.token) params.since = copia.token;
+
+  let r;
+  try {
+    r = await axios.get('/api/cambios/', { params });
+  } catch (err) {
+    // 410: token caducado o demasiados cambios; se vuelve a cargar todo
+    if (err?.response?.status === 410 && copia) {
+      olvidarCopiaLocal();
+      return sincronizarCategorias();
+    }
+    throw err;
+  }
+
+  const { actualizados, borrados } = r.data.categorias;
+  const porId = new Map((copia?.categorias || []).map(c => [c.id, c]));
+  borrados.forEach(id => porId.delete(id));
+  actualizados.forEach(c => porId.set(c.id, c));
+  const categorias = [...porId.values()].sort((a, b) => a.nombre.localeCompare(b.nombre, 'es'));
+  localStorage.setItem(CLAVE, JSON.stringify({ token: r.data.token, categorias }));
+  return categorias;
+}
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Categoria, Movimiento
+from .models import Categoria, Movimiento, MovimientoRecurrente, Tarea
 
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
@@ -11,3 +11,13 @@ class MovimientoAdmin(admin.ModelAdmin):
     list_display = ('fecha', 'usuario', 'categoria', 'cantidad', 'descripcion')
     list_filter = ('categoria__tipo', 'fecha', 'usuario')
     date_hierarchy = 'fecha'
+
+@admin.register(MovimientoRecurrente)
+class MovimientoRecurrenteAdmin(admin.ModelAdmin):
+    list_display = ('descripcion', 'usuario', 'categoria', 'cantidad', 'frecuencia', 'intervalo', 'siguiente', 'fin')
+    list_filter = ('frecuencia',)
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'usuario', 'estado', 'intentos', 'trabajador', 'creada', 'terminada')
+    list_filter = ('estado', 'tipo')
@@ -0,0 +1,225 @@
+# movimientos/agregados.py
+"""
+Mantenimiento y lectura de la tabla AgregadoMensual.
+
+Las escrituras individuales (señales en movimientos/signals.py) aplican
+deltas incrementales; los procesos masivos o la reconstrucción completa
+usan `recalcular`, que vuelve a agregar desde los movimientos.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils.dateparse import parse_date
+
+from .models import AgregadoMensual, Movimiento
+
+
+def inicio_mes(fecha):
+    if isinstance(fecha, str):
+        fecha = parse_date(fecha)
+    return fecha.replace(day=1)
+
+
+def siguiente_mes(fecha):
+    fecha = inicio_mes(fecha)
+    return (fecha + timedelta(days=32)).replace(day=1)
+
+
+class Deltas:
+    """
+    Acumula variaciones (total, num) por (usuario, mes, categoría) y las
+    escribe de una vez con `aplicar()`.
+    """
+
+    def __init__(self):
+        self._deltas = defaultdict(lambda: [Decimal('0'), 0])
+
+    def acumular(self, usuario_id, fecha, categoria_id, total, num):
+        delta = self._deltas[(usuario_id, inicio_mes(fecha), categoria_id)]
+        delta[0] += Decimal(str(total))
+        delta[1] += num
+
+    def sumar(self, mov):
+        self.acumular(mov.usuario_id, mov.fecha, mov.categoria_id, mov.cantidad, 1)
+
+    def restar(self, mov):
+        self.acumular(mov.usuario_id, mov.fecha, mov.categoria_id, -Decimal(str(mov.cantidad)), -1)
+
+    def aplicar(self):
+        filas = [
+            (usuario_id, mes, categoria_id, total, num)
+            for (usuario_id, mes, categoria_id), (total, num) in self._deltas.items()
+            if total or num
+        ]
+        self._deltas.clear()
+        if len(filas) > 1 and connection.vendor == 'postgresql':
+            for i in range(0, len(filas), TAM_LOTE_DELTAS):
+                _aplicar_en_bloque(filas[i:i + TAM_LOTE_DELTAS])
+        else:
+            for fila in filas:
+                _aplicar_delta(*fila)
+
+
+TAM_LOTE_DELTAS = 1000
+
+
+def _aplicar_delta(usuario_id, mes, categoria_id, total, num):
+    filas = AgregadoMensual.objects.filter(usuario_id=usuario_id, mes=mes, categoria_id=categoria_id)
+    cambios = {'total': F('total') + total, 'num': F('num') + num}
+    if filas.update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            AgregadoMensual.objects.create(
+                usuario_id=usuario_id, mes=mes, categoria_id=categoria_id, total=total, num=num
+            )
+    except IntegrityError:
+        # Otra petición ha creado la fila entre el UPDATE y el INSERT
+        filas.update(**cambios)
+
+
+def _aplicar_en_bloque(filas):
+    """
+    Varios deltas con un solo INSERT ... ON CONFLICT DO UPDATE (PostgreSQL)
+    sobre la restricción única (usuario, mes, COALESCE(categoria, 0)), en
+    lugar de un UPDATE por fila: p. ej. al materializar los movimientos
+    recurrentes de miles de usuarios.
+    """
+    tabla = connection.ops.quote_name(AgregadoMensual._meta.db_table)
+    valores = ', '.join(['(%s, %s, %s, %s, %s)'] * len(filas))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {tabla} (usuario_id, mes, categoria_id, total, num) VALUES {valores} '
+            'ON CONFLICT (usuario_id, mes, (COALESCE(categoria_id, 0))) DO UPDATE '
+            f'SET total = {tabla}.total + EXCLUDED.total, num = {tabla}.num + EXCLUDED.num',
+            [valor for fila in filas for valor in fila],
+        )
+
+
+def mover_categoria(categoria_id, destino_id):
+    """
+    Traspasa los agregados de una categoría a otra (o a "sin categoría" si
+    destino_id es None), p. ej. antes de borrarla o al fusionarla.
+    """
+    origen = AgregadoMensual.objects.filter(categoria_id=categoria_id)
+    deltas = Deltas()
+    for fila in origen:
+        deltas.acumular(fila.usuario_id, fila.mes, destino_id, fila.total, fila.num)
+    origen.delete()
+    deltas.aplicar()
+
+
+def _agrupar(movimientos):
+    return (
+        movimientos.annotate(mes=TruncMonth('fecha'))
+                   .values('usuario_id', 'mes', 'categoria_id')
+                   .annotate(total=Sum('cantidad'), num=Count('id'))
+                   .order_by()
+    )
+
+
+def _acotar(movimientos, agregados, usuario_id, desde, hasta):
+    if usuario_id is not None:
+        movimientos = movimientos.filter(usuario_id=usuario_id)
+        agregados = agregados.filter(usuario_id=usuario_id)
+    if desde:
+        movimientos = movimientos.filter(fecha__gte=inicio_mes(desde))
+        agregados = agregados.filter(mes__gte=inicio_mes(desde))
+    if hasta:
+        movimientos = movimientos.filter(fecha__lt=siguiente_mes(hasta))
+        agregados = agregados.filter(mes__lte=inicio_mes(hasta))
+    return movimientos, agregados
+
+
+def recalcular(usuario_id=None, desde=None, hasta=None):
+    """
+    Reconstruye desde los movimientos los agregados del usuario (o de todos)
+    en los meses que cubren [desde, hasta]. Devuelve el nº de filas creadas.
+    """
+    movimientos, agregados = _acotar(
+        Movimiento.objects.all(), AgregadoMensual.objects.all(), usuario_id, desde, hasta
+    )
+    with transaction.atomic():
+        agregados.delete()
+        filas = [
+            AgregadoMensual(
+                usuario_id=row['usuario_id'], mes=row['mes'], categoria_id=row['categoria_id'],
+                total=row['total'], num=row['num'],
+            )
+            for row in _agrupar(movimientos).iterator()
+        ]
+        AgregadoMensual.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
+
+
+def verificar(usuario_id=None):
+    """
+    Compara los agregados con los movimientos. Devuelve una lista de
+    discrepancias (clave, esperado, guardado); vacía si todo cuadra.
+    """
+    movimientos, agregados = _acotar(
+        Movimiento.objects.all(), AgregadoMensual.objects.all(), usuario_id, None, None
+    )
+    # En una transacción: los cursores de iterator() no se declaran WITH HOLD
+    # (y funcionan tras PgBouncer en modo transaction pooling)
+    with transaction.atomic():
+        esperado = {
+            (row['usuario_id'], row['mes'], row['categoria_id']): (row['total'], row['num'])
+            for row in _agrupar(movimientos).iterator()
+        }
+        guardado = {
+            (usuario, mes, categoria): (total, num)
+            for usuario, mes, categoria, total, num in agregados.filter(num__gt=0)
+            .values_list('usuario_id', 'mes', 'categoria_id', 'total', 'num').iterator()
+        }
+    return [
+        (clave, esperado.get(clave), guardado.get(clave))
+        for clave in sorted(esperado.keys() | guardado.keys(), key=str)
+        if esperado.get(clave) != guardado.get(clave)
+    ]
+
+
+def agregados_para(usuario, params):
+    """
+    Devuelve los AgregadoMensual equivalentes a MovimientoViewSet.get_queryset
+    para estos filtros, o None si no se pueden usar (p. ej. fechas que no
+    coinciden con inicio/fin de mes).
+    """
+    if not getattr(settings, 'MOVIMIENTOS_USAR_AGREGADOS', True):
+        return None
+
+    qs = AgregadoMensual.objects.filter(usuario=usuario, num__gt=0)
+
+    categoria = params.get('categoria')
+    tipo = params.get('tipo')
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+
+    if categoria:
+        qs = qs.filter(categoria_id=categoria)
+
+    if tipo in ('ingreso', 'gasto'):
+        qs = qs.filter(categoria__tipo=tipo)
+
+    try:
+        desde = parse_date(date_from) if date_from else None
+        hasta = parse_date(date_to) if date_to else None
+    except ValueError:
+        return None
+
+    if date_from:
+        if desde is None or desde.day != 1:
+            return None
+        qs = qs.filter(mes__gte=desde)
+
+    if date_to:
+        if hasta is None or (hasta + timedelta(days=1)).day != 1:
+            return None
+        qs = qs.filter(mes__lte=hasta)
+
+    return qs
@@ -0,0 +1,212 @@
+# movimientos/autenticacion.py
+"""
+TokenAuthentication con caché de la resolución token -> usuario.
+
+La autenticación de DRF hace un SELECT de Token + User en cada petición.
+TokenAuthenticationCacheada guarda el resultado en una LRU acotada del
+proceso y, opcionalmente, en una caché compartida de Django (para que el
+resto de procesos no tenga que ir a la base de datos). Se configura con:
+
+    MOVIMIENTOS_TOKEN_CACHE_TAMANO     entradas de la LRU local (1024)
+    MOVIMIENTOS_TOKEN_CACHE_TTL        segundos de validez (60)
+    MOVIMIENTOS_TOKEN_CACHE_COMPARTIDA alias de CACHES, o None para no usarla
+
+Las entradas se invalidan al borrar el token y al guardar el usuario
+(desactivación, cambio de contraseña...) mediante señales. En otros procesos
+la LRU local solo se entera al caducar, así que el TTL acota ese retraso.
+Los cambios hechos con queryset.update() no disparan señales.
+
+Las vistas asíncronas (vistas_async.py) autentican con aauthenticate(), que
+resuelve los aciertos de la LRU local sin salir del bucle de eventos.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+from .instrumentacion import tramo
+
+
+class CacheLRU:
+    """Diccionario acotado, con caducidad por entrada y seguro entre hilos."""
+
+    def __init__(self, tamano, ttl):
+        self.tamano = tamano
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            caduca, valor = entrada
+            if caduca < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tamano:
+                self._datos.popitem(last=False)
+
+    def borrar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def borrar_si(self, condicion):
+        with self._lock:
+            for clave in [c for c, (_, valor) in self._datos.items() if condicion(valor)]:
+                del self._datos[clave]
+
+    def vaciar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+_local = None
+_local_lock = threading.Lock()
+
+
+def cache_local():
+    global _local
+    if _local is None:
+        with _local_lock:
+            if _local is None:
+                _local = CacheLRU(
+                    getattr(settings, 'MOVIMIENTOS_TOKEN_CACHE_TAMANO', 1024),
+                    getattr(settings, 'MOVIMIENTOS_TOKEN_CACHE_TTL', 60),
+                )
+    return _local
+
+
+def cache_compartida():
+    alias = getattr(settings, 'MOVIMIENTOS_TOKEN_CACHE_COMPARTIDA', None)
+    return caches[alias] if alias else None
+
+
+def _clave_token(key):
+    # No se guarda el token en claro como clave de caché
+    return 'movimientos:token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _clave_usuario(usuario_id):
+    return f'movimientos:token-usuario:{usuario_id}'
+
+
+def _borrar(clave):
+    cache_local().borrar(clave)
+    compartida = cache_compartida()
+    if compartida is not None:
+        compartida.delete(clave)
+
+
+def _en_commit(funcion):
+    """Ejecuta ya y, dentro de una transacción, otra vez al confirmarla."""
+    funcion()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(funcion)
+
+
+def invalidar_token(key):
+    _en_commit(lambda: _borrar(_clave_token(key)))
+
+
+def invalidar_usuario(usuario_id):
+    def invalidar():
+        cache_local().borrar_si(lambda entrada: entrada[0].pk == usuario_id)
+        compartida = cache_compartida()
+        if compartida is not None:
+            clave = compartida.get(_clave_usuario(usuario_id))
+            if clave is not None:
+                compartida.delete_many([clave, _clave_usuario(usuario_id)])
+    _en_commit(invalidar)
+
+
+def _copias(entrada):
+    # Copias: la petición puede modificar el usuario sin afectar a la caché
+    usuario, token = copy.copy(entrada[0]), copy.copy(entrada[1])
+    token.user = usuario
+    return usuario, token
+
+
+class TokenAuthenticationCacheada(TokenAuthentication):
+    """Sustituto directo de TokenAuthentication con caché token -> usuario."""
+
+    def authenticate(self, request):
+        with tramo('auth'):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        clave = _clave_token(key)
+        local = cache_local()
+        entrada = local.obtener(clave)
+
+        if entrada is None:
+            compartida = cache_compartida()
+            if compartida is not None:
+                entrada = compartida.get(clave)
+            if entrada is None:
+                # Valida igual que DRF (token inexistente, usuario inactivo)
+                usuario, token = super().authenticate_credentials(key)
+                entrada = (usuario, token)
+                if compartida is not None:
+                    compartida.set_many({clave: entrada, _clave_usuario(usuario.pk): clave}, timeout=local.ttl)
+            local.guardar(clave, entrada)
+
+        return _copias(entrada)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() para vistas asíncronas de Django (recibe el HttpRequest,
+        no un Request de DRF). Devuelve None si no hay cabecera Token.
+        """
+        with tramo('auth'):
+            return await self._aauthenticate(request)
+
+    async def _aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        elif len(auth) > 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain invalid characters.')
+            )
+
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        """
+        Un acierto en la LRU local no cambia de hilo; si no, se delega en
+        authenticate_credentials (caché compartida y base de datos) con sync_to_async.
+        """
+        entrada = cache_local().obtener(_clave_token(key))
+        if entrada is None:
+            return await sync_to_async(self.authenticate_credentials)(key)
+        return _copias(entrada)
@@ -0,0 +1,86 @@
+# movimientos/busqueda.py
+"""
+Búsqueda de movimientos por descripción.
+
+En PostgreSQL, ?search= usa la búsqueda de texto completo en español sobre
+Movimiento.descripcion_tsv (columna que mantiene un trigger, con índice GIN):
+cada término casa por raíz y como prefijo ("compras" encuentra "compra",
+"merca" encuentra "Mercadona"). Si el servidor tiene pg_trgm, la migración
+0006 crea además un índice de trigramas sobre UPPER(descripcion) y se acepta
+también la subcadena en cualquier posición, como SearchFilter ("dona"
+encuentra "Mercadona"); sin ese índice la subcadena obligaría a recorrer
+todas las filas del usuario, así que no se usa. Si no se pide ?ordering=,
+los resultados se ordenan por relevancia.
+
+En otras bases de datos se comporta exactamente como SearchFilter.
+"""
+import operator
+from functools import reduce
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections, models
+from django.db.models.functions import Cast
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+CONFIGURACION = 'spanish'
+
+_trigramas = {}
+
+
+def hay_trigramas(alias):
+    """Si la base de datos tiene pg_trgm (y por tanto el índice de trigramas)."""
+    if alias not in _trigramas:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigramas[alias] = cursor.fetchone() is not None
+    return _trigramas[alias]
+
+
+def consulta_prefijos(terminos):
+    """SearchQuery que exige todos los términos, cada uno por raíz y como prefijo."""
+    return reduce(operator.and_, (
+        SearchQuery("'%s':*" % termino.replace("'", "''").replace('\\', ''), config=CONFIGURACION, search_type='raw')
+        for termino in terminos
+    ))
+
+
+class BusquedaMovimientosFilter(SearchFilter):
+    """
+    SearchFilter con texto completo y orden por relevancia. La vista indica la
+    columna tsvector en `campo_texto_completo`. Debe ir después de
+    OrderingFilter en filter_backends para poder ordenar por rango.
+    """
+    campo_rango = 'rango_busqueda'
+
+    def filtrar(self, request, queryset, view):
+        """Aplica ?search= sin anotar ni reordenar (válido para consultas agregadas)."""
+        filtrado, _ = self._filtrar(request, queryset, view)
+        return filtrado
+
+    def filter_queryset(self, request, queryset, view):
+        queryset, consulta = self._filtrar(request, queryset, view)
+        if consulta is None or OrderingFilter.ordering_param in request.query_params:
+            return queryset
+        # ts_rank devuelve real; en double precision el valor vuelve exacto en los
+        # cursores de KeysetPagination, que comparan por igualdad
+        rango = Cast(SearchRank(models.F(view.campo_texto_completo), consulta), models.FloatField())
+        orden = list(queryset.query.order_by or queryset.model._meta.ordering)
+        return queryset.annotate(**{self.campo_rango: rango}).order_by('-' + self.campo_rango, *orden)
+
+    def _filtrar(self, request, queryset, view):
+        """Devuelve (queryset filtrado, SearchQuery o None si no se ha usado texto completo)."""
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        campo = getattr(view, 'campo_texto_completo', None)
+        if not (search_fields and search_terms and campo) or connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view), None
+
+        consulta = consulta_prefijos(search_terms)
+        condicion = models.Q(**{campo: consulta})
+        if hay_trigramas(queryset.db):
+            orm_lookups = [self.construct_search(str(c), queryset) for c in search_fields]
+            condicion |= reduce(operator.and_, (
+                reduce(operator.or_, (models.Q(**{lookup: termino}) for lookup in orm_lookups))
+                for termino in search_terms
+            ))
+        return queryset.filter(condicion), consulta
@@ -0,0 +1,150 @@
+# movimientos/cache_api.py
+"""
+Caché de respuestas de lectura por usuario.
+
+Cada usuario tiene una versión de datos en la caché de Django que cambia con
+cualquier escritura de sus categorías o movimientos (señales para las
+escrituras por el ORM y `datos_modificados` en los caminos masivos). Las
+respuestas se guardan bajo una clave con esa versión y los parámetros
+normalizados, así que nunca hace falta borrarlas: al cambiar la versión las
+antiguas dejan de consultarse y caducan solas (TIMEOUT / MAX_ENTRIES de CACHES).
+
+La misma clave da un ETag fuerte: si llega en If-None-Match se responde 304
+consultando solo la versión en caché, sin tocar la base de datos.
+
+La versión tiene que verla cambiar cualquier proceso que sirva al usuario,
+así que con una caché de cada proceso (LocMemCache) un worker seguiría
+dando respuestas viejas tras una escritura atendida por otro. Por eso, si
+MOVIMIENTOS_CACHEAR_RESPUESTAS no se fija, solo se cachea con una caché
+compartida (ver cachear_respuestas).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .replicas import marcar_escritura
+
+# Backends en los que cada proceso guarda sus propios datos
+CACHES_LOCALES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_compartida(alias='default'):
+    """True si todos los procesos ven los mismos datos en la caché `alias` (Redis, Memcached, BD, ficheros)."""
+    return settings.CACHES[alias]['BACKEND'] not in CACHES_LOCALES
+
+
+def cachear_respuestas():
+    """
+    MOVIMIENTOS_CACHEAR_RESPUESTAS si se ha fijado; si no (None), solo con
+    una caché compartida. True con LocMemCache vale para un único proceso
+    (runserver, tests).
+    """
+    activado = getattr(settings, 'MOVIMIENTOS_CACHEAR_RESPUESTAS', None)
+    return cache_compartida() if activado is None else activado
+
+
+def _clave_version(usuario_id):
+    return f'movimientos:version:{usuario_id}'
+
+
+def version_datos(usuario_id):
+    """
+    Versión actual de los datos del usuario. Se inicializa con la hora en ns,
+    de modo que si la clave se expulsa de la caché la nueva versión no puede
+    coincidir con una anterior.
+    """
+    clave = _clave_version(usuario_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, time.time_ns(), timeout=None)
+        version = cache.get(clave)
+    return version
+
+
+def _incrementar(usuario_id):
+    try:
+        cache.incr(_clave_version(usuario_id))
+    except ValueError:
+        # La clave no existe (nunca leída o expulsada)
+        cache.set(_clave_version(usuario_id), time.time_ns(), timeout=None)
+
+
+def _modificados(usuario_id):
+    _incrementar(usuario_id)
+    marcar_escritura(usuario_id)
+
+
+def datos_modificados(usuario_id):
+    """
+    Invalida las respuestas cacheadas del usuario y hace que sus lecturas vayan
+    al primario durante un rato (replicas.py). Dentro de una transacción se
+    repite al confirmarla: una lectura concurrente hecha entre la primera vez
+    y el COMMIT habría cacheado datos aún sin confirmar.
+    """
+    _modificados(usuario_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _modificados(usuario_id))
+
+
+def _parametros_normalizados(request):
+    """Query params ordenados, sin valores vacíos ni ?format (va en el renderer)."""
+    return sorted(
+        (clave, sorted(v for v in valores if v))
+        for clave, valores in request.query_params.lists()
+        if clave != 'format' and any(valores)
+    )
+
+
+def _coincide(etag, if_none_match):
+    etags = parse_etags(if_none_match)
+    return '*' in etags or any(e.removeprefix('W/') == etag for e in etags)
+
+
+def respuesta_cacheada(metodo):
+    """
+    Decorador para acciones GET de un ViewSet: cachea response.data de las
+    respuestas 200 y gestiona ETag / If-None-Match, si cachear_respuestas().
+    """
+    @wraps(metodo)
+    def envoltorio(self, request, *args, **kwargs):
+        if not cachear_respuestas():
+            return metodo(self, request, *args, **kwargs)
+
+        usuario_id = request.user.pk
+        version = version_datos(usuario_id)
+        huella = hashlib.sha1(repr((
+            self.basename, self.action, request.accepted_renderer.format,
+            request.get_host(), _parametros_normalizados(request),
+        )).encode('utf-8')).hexdigest()
+        clave = f'movimientos:respuesta:{usuario_id}:{version}:{huella}'
+        etag = '"%s"' % hashlib.sha1(clave.encode('utf-8')).hexdigest()
+
+        if _coincide(etag, request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(clave)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = metodo(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(clave, response.data)
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization', 'Accept'))
+        return response
+
+    return envoltorio
@@ -0,0 +1,133 @@
+# movimientos/cambios.py
+"""
+Sincronización incremental (/api/cambios/): las categorías y movimientos
+que el usuario ha creado, cambiado o borrado desde un token, para que los
+clientes mantengan una copia local sin volver a pedir listados enteros.
+
+Cada fila lleva `modificado` (la hora de su última escritura) y cada borrado
+deja una lápida en Borrado, así que los cambios desde un instante son las
+filas modificadas y las lápidas a partir de él. El token es ese instante,
+en microsegundos desde 1970 (para el cliente, opaco).
+
+El token de una respuesta no puede ser sin más la hora actual: una
+transacción que empezó antes y aún no ha confirmado (una importación, p.
+ej.) tiene filas con `modificado` anterior que esta lectura no ve y que la
+siguiente ya no pediría. En PostgreSQL el token es, por eso, el inicio de la
+transacción con escrituras abierta más antigua (pg_stat_activity) si es
+anterior, y siempre se restan MOVIMIENTOS_CAMBIOS_MARGEN segundos por la
+diferencia entre los relojes de los servidores. A cambio, algunas filas
+llegan dos veces: aplicar los cambios es idempotente.
+
+Las lápidas se purgan pasados MOVIMIENTOS_CAMBIOS_RETENCION días
+(`manage.py purgar_borrados`). Con un token más antiguo, o si hay más de
+MOVIMIENTOS_CAMBIOS_MAXIMO cambios, se lanza CambiosPerdidos y el cliente
+debe volver a cargarlo todo.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Borrado, Categoria, Movimiento
+
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Nombre en la API -> (modelo, Borrado.modelo)
+MODELOS = {
+    'categorias': (Categoria, Borrado.CATEGORIA),
+    'movimientos': (Movimiento, Borrado.MOVIMIENTO),
+}
+LAPIDAS = {modelo: tipo for modelo, tipo in MODELOS.values()}
+
+
+class CambiosPerdidos(Exception):
+    """No se pueden dar los cambios desde el token; `token` es desde dónde seguir tras recargarlo todo."""
+
+    def __init__(self, mensaje, token):
+        super().__init__(mensaje)
+        self.token = token
+
+
+def token(instante):
+    return str((instante - EPOCA) // timedelta(microseconds=1))
+
+
+def leer_token(valor):
+    try:
+        return EPOCA + timedelta(microseconds=int(valor))
+    except (TypeError, ValueError, OverflowError):
+        raise ValidationError({'since': 'Token no válido.'})
+
+
+def registrar_borrados(modelo, usuario_id, ids):
+    """Lápidas de los objetos `ids` de `modelo` (Categoria o Movimiento) recién borrados, con un INSERT."""
+    Borrado.objects.bulk_create([
+        Borrado(usuario_id=usuario_id, modelo=LAPIDAS[modelo], objeto_id=pk) for pk in ids
+    ])
+
+
+def _escritura_mas_antigua():
+    """Inicio de la transacción con escrituras abierta más antigua de la base de datos (solo PostgreSQL)."""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        # Dentro de una transacción pg_stat_activity se lee de una instantánea que se guarda hasta el final
+        cursor.execute(
+            'SELECT pg_stat_clear_snapshot(); SELECT min(xact_start) FROM pg_stat_activity '
+            'WHERE datname = current_database() AND backend_xid IS NOT NULL AND pid <> pg_backend_pid()'
+        )
+        return cursor.fetchone()[0]
+
+
+def corte():
+    """Instante desde el que pedir los cambios la próxima vez sin perder ninguno."""
+    instante = timezone.now()
+    abierta = _escritura_mas_antigua()
+    if abierta is not None:
+        instante = min(instante, abierta)
+    return instante - timedelta(seconds=getattr(settings, 'MOVIMIENTOS_CAMBIOS_MARGEN', 5))
+
+
+def cambios(usuario, modelos, desde=None):
+    """
+    {'token': ..., nombre: {'actualizados': [...], 'borrados': [ids]}} para
+    cada nombre de `modelos` ('categorias', 'movimientos'): las filas del
+    usuario modificadas desde `desde` (todas si es None) en orden de
+    modificación y los ids borrados. Se lee del primario (en `connection`).
+    """
+    siguiente = corte()  # antes de leer nada: lo que se escriba después llegará la próxima vez
+    retencion = timedelta(days=getattr(settings, 'MOVIMIENTOS_CAMBIOS_RETENCION', 30))
+    if desde is not None and desde < timezone.now() - retencion:
+        raise CambiosPerdidos(
+            f'El token tiene más de {retencion.days} días: vuelve a cargar los datos.', token(siguiente)
+        )
+    maximo = getattr(settings, 'MOVIMIENTOS_CAMBIOS_MAXIMO', 5000)
+
+    datos = {'token': token(siguiente)}
+    total = 0
+    for nombre in modelos:
+        modelo, lapida = MODELOS[nombre]
+        filas = modelo.objects.filter(usuario=usuario)
+        borrados = []
+        if desde is not None:
+            filas = filas.filter(modificado__gte=desde)
+            borrados = list(
+                Borrado.objects.filter(usuario=usuario, modelo=lapida, borrado__gte=desde)
+                .order_by('borrado', 'id').values_list('objeto_id', flat=True)[:maximo + 1]
+            )
+        filas = list(filas.order_by('modificado', 'id')[:maximo + 1])
+        total += len(filas) + len(borrados)
+        if total > maximo:
+            raise CambiosPerdidos(
+                f'Hay más de {maximo} cambios: vuelve a cargar los datos.', token(siguiente)
+            )
+        datos[nombre] = {'actualizados': filas, 'borrados': borrados}
+    return datos
+
+
+def purgar(antes):
+    """Borra las lápidas anteriores a `antes`. Devuelve cuántas."""
+    borradas, _ = Borrado.objects.filter(borrado__lt=antes).delete()
+    return borradas
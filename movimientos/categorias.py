@@ -0,0 +1,79 @@
+# movimientos/categorias.py
+"""
+Alta de categorías. La unicidad usuario + tipo + nombre (sin distinguir
+mayúsculas) la garantiza solo la restricción uniq_categoria_usuario_nombre_ci_tipo:
+se escribe directamente y un IntegrityError se traduce al error de la API,
+sin consultar antes si existe.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from .cache_api import datos_modificados
+from .models import Categoria
+
+DUPLICADA = 'Ya existe una categoría con ese nombre y tipo.'
+
+# Categorías con las que empieza cada usuario nuevo (MOVIMIENTOS_CATEGORIAS_INICIALES las sustituye)
+CATEGORIAS_INICIALES = [
+    ('Salario', 'ingreso'),
+    ('Rendimientos', 'ingreso'),
+    ('Otros ingresos', 'ingreso'),
+    ('Vivienda', 'gasto'),
+    ('Alimentación', 'gasto'),
+    ('Transporte', 'gasto'),
+    ('Ocio', 'gasto'),
+    ('Salud', 'gasto'),
+    ('Otros gastos', 'gasto'),
+]
+
+
+class CategoriasDuplicadas(Exception):
+    """`errores` va alineado con las filas: None o el mensaje de la fila duplicada."""
+
+    def __init__(self, errores):
+        super().__init__(DUPLICADA)
+        self.errores = errores
+
+
+def _clave(nombre, tipo):
+    return nombre.lower(), tipo
+
+
+def crear_categorias(usuario, filas):
+    """
+    Crea las categorías `filas` ([(nombre, tipo), ...]) de un usuario con un
+    único INSERT. Si alguna choca con otra de la lista o con una existente
+    lanza CategoriasDuplicadas y no se crea ninguna.
+    """
+    errores, vistas = [], set()
+    for nombre, tipo in filas:
+        clave = _clave(nombre, tipo)
+        errores.append(DUPLICADA if clave in vistas else None)
+        vistas.add(clave)
+    if any(errores):
+        raise CategoriasDuplicadas(errores)
+
+    try:
+        with transaction.atomic():
+            creadas = Categoria.objects.bulk_create([
+                Categoria(usuario=usuario, nombre=nombre, tipo=tipo) for nombre, tipo in filas
+            ])
+    except IntegrityError:
+        # Solo en el caso de error se consulta cuáles existían ya, para señalarlas
+        existentes = set(
+            Categoria.objects.filter(usuario=usuario, tipo__in={tipo for _, tipo in filas})
+            .annotate(nombre_min=Lower('nombre')).values_list('nombre_min', 'tipo')
+        )
+        errores = [DUPLICADA if _clave(n, t) in existentes else None for n, t in filas]
+        if not any(errores):
+            raise
+        raise CategoriasDuplicadas(errores)
+
+    # bulk_create no envía post_save: se invalida aquí la caché de respuestas
+    datos_modificados(usuario.pk)
+    return creadas
+
+
+def crear_categorias_iniciales(usuario):
+    return crear_categorias(usuario, getattr(settings, 'MOVIMIENTOS_CATEGORIAS_INICIALES', CATEGORIAS_INICIALES))
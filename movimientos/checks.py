@@ -0,0 +1,20 @@
+# movimientos/checks.py
+"""Comprobaciones de la configuración (`manage.py check`, y al arrancar el servidor)."""
+from django.conf import settings
+from django.core.checks import Error, register
+
+from .cache_api import cache_compartida
+from .replicas import replicas
+
+
+@register()
+def replicas_con_cache_compartida(app_configs, **kwargs):
+    # Con DEBUG se admite para simular una réplica en local con runserver (un solo proceso)
+    if not replicas() or settings.DEBUG or cache_compartida():
+        return []
+    return [Error(
+        'MOVIMIENTOS_REPLICAS necesita una caché compartida entre procesos (Redis o Memcached).',
+        hint='La marca de escritura reciente de cada usuario (movimientos/replicas.py) se guarda en '
+             "CACHES['default']; con LocMemCache los demás procesos no la ven y leen de una réplica retrasada.",
+        id='movimientos.E001',
+    )]
@@ -0,0 +1,89 @@
+# movimientos/columnas.py
+"""
+Representación en columnas de las respuestas de la API, opcional mediante
+`Accept` o `?format=`:
+
+- `application/vnd.movimientos.columnas+json` (`?format=columnas`)
+- `application/x-msgpack` (`?format=msgpack`), si está instalado msgpack
+
+Cada lista de objetos con las mismas claves ([{"id": 1, ...}, ...]) se
+convierte en un objeto con una lista por clave ({"id": [1, ...], ...}), y
+los importes van como números en lugar de cadenas. El listado de movimientos
+construye sus columnas directamente con `values_list`, sin serializer por
+fila (ver MovimientoViewSet.list).
+"""
+import json
+from datetime import date
+from decimal import Decimal
+
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import msgpack
+except ImportError:  # dependencia opcional
+    msgpack = None
+
+# Columnas del listado: nombre en la respuesta y campo de values_list
+CAMPOS_MOVIMIENTO = (
+    ('id', 'id'), ('usuario', 'usuario_id'), ('categoria', 'categoria_id'),
+    ('descripcion', 'descripcion'), ('fecha', 'fecha'), ('cantidad', 'cantidad'),
+)
+
+
+def columnas_movimientos(filas):
+    """
+    Columnas del listado a partir de filas de values_list(*CAMPOS_MOVIMIENTO);
+    los valores de más al final de cada fila (campos de orden) se descartan.
+    """
+    valores = list(zip(*filas))[:len(CAMPOS_MOVIMIENTO)] or [()] * len(CAMPOS_MOVIMIENTO)
+    return {nombre: list(columna) for (nombre, _), columna in zip(CAMPOS_MOVIMIENTO, valores)}
+
+
+def a_columnas(datos):
+    """Convierte las listas de objetos de `datos` en objetos de listas."""
+    if isinstance(datos, dict):
+        return {clave: a_columnas(valor) for clave, valor in datos.items()}
+    if isinstance(datos, list) and datos and isinstance(datos[0], dict):
+        return {clave: [fila.get(clave) for fila in datos] for clave in datos[0]}
+    return datos
+
+
+def _valor(valor):
+    # Solo se llama con lo que json/msgpack no saben codificar
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f'No se puede codificar {type(valor).__name__}')
+
+
+class ColumnasRenderer(BaseRenderer):
+    media_type = 'application/vnd.movimientos.columnas+json'
+    format = 'columnas'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(a_columnas(data), default=_valor, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class MsgpackRenderer(BaseRenderer):
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(a_columnas(data), default=_valor)
+
+
+RENDERERS = [ColumnasRenderer] + ([MsgpackRenderer] if msgpack is not None else [])
+FORMATOS = {renderer.format for renderer in RENDERERS}
+
+
+def es_columnar(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format in FORMATOS
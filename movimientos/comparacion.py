@@ -0,0 +1,187 @@
+# movimientos/comparacion.py
+"""
+Comparación de un periodo con otros (/api/movimientos/comparar/).
+
+El periodo base es [date_from, date_to] y ?comparar= indica con qué
+compararlo, separados por comas:
+
+- 'anterior': el periodo de la misma duración justo antes (si el base son
+  meses completos, los mismos meses inmediatamente anteriores)
+- 'anio_anterior': las mismas fechas un año antes
+- 'YYYY-MM-DD:YYYY-MM-DD': un rango cualquiera
+
+Todos los periodos salen de una sola consulta agrupada por mes y categoría,
+con una suma condicional por periodo (MovimientoViewSet.consulta_comparacion).
+Los meses completos de cada periodo se leen de AgregadoMensual y solo los
+días sueltos de los extremos de los movimientos, así que el coste apenas
+crece con el número de periodos. Aquí se calculan los periodos y se arma la
+respuesta a partir de esas filas.
+"""
+import calendar
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+COMPARACIONES_POR_DEFECTO = 'anterior,anio_anterior'
+MAX_COMPARACIONES = 12
+
+Periodo = namedtuple('Periodo', 'nombre desde hasta')
+
+
+def _ultimo_dia(anio, mes):
+    return calendar.monthrange(anio, mes)[1]
+
+
+def meses_completos(periodo):
+    """True si el periodo empieza el día 1 y acaba el último día de un mes."""
+    return periodo.desde.day == 1 and (periodo.hasta + timedelta(days=1)).day == 1
+
+
+def partes(periodo):
+    """
+    (meses, dias): el rango (desde, hasta) de los meses completos del periodo,
+    o None si no tiene ninguno, y la lista de rangos de días sueltos del
+    principio y el final que quedan fuera de ellos.
+    """
+    desde, hasta = periodo.desde, periodo.hasta
+    primero = desde if desde.day == 1 else restar_meses(desde.replace(day=1), -1)
+    ultimo = hasta if (hasta + timedelta(days=1)).day == 1 else hasta.replace(day=1) - timedelta(days=1)
+    if primero > ultimo:
+        return None, [(desde, hasta)]
+    dias = []
+    if desde < primero:
+        dias.append((desde, primero - timedelta(days=1)))
+    if ultimo < hasta:
+        dias.append((ultimo + timedelta(days=1), hasta))
+    return (primero, ultimo), dias
+
+
+def restar_meses(fecha, meses):
+    """La misma fecha `meses` meses antes; un fin de mes sigue siendo fin de mes."""
+    indice = fecha.year * 12 + fecha.month - 1 - meses
+    anio, mes = indice // 12, indice % 12 + 1
+    ultimo = _ultimo_dia(anio, mes)
+    if fecha.day == _ultimo_dia(fecha.year, fecha.month):
+        return date(anio, mes, ultimo)
+    return date(anio, mes, min(fecha.day, ultimo))
+
+
+def meses_entre(desde, hasta):
+    """Meses de diferencia entre los meses de dos fechas."""
+    return (hasta.year - desde.year) * 12 + hasta.month - desde.month
+
+
+def _fecha(valor, campo):
+    try:
+        fecha = parse_date(valor or '')
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise ValidationError({campo: 'Se requiere una fecha YYYY-MM-DD.'})
+    return fecha
+
+
+def _comparacion(nombre, base):
+    if nombre == 'anterior':
+        if meses_completos(base):
+            meses = meses_entre(base.desde, base.hasta) + 1
+            return Periodo(nombre, restar_meses(base.desde, meses), restar_meses(base.hasta, meses))
+        dias = base.hasta - base.desde + timedelta(days=1)
+        return Periodo(nombre, base.desde - dias, base.hasta - dias)
+    if nombre == 'anio_anterior':
+        return Periodo(nombre, restar_meses(base.desde, 12), restar_meses(base.hasta, 12))
+    desde, separador, hasta = nombre.partition(':')
+    if not separador:
+        raise ValidationError({'comparar': f"'{nombre}' no es 'anterior', 'anio_anterior' ni un rango desde:hasta."})
+    periodo = Periodo(nombre, _fecha(desde, 'comparar'), _fecha(hasta, 'comparar'))
+    if periodo.desde > periodo.hasta:
+        raise ValidationError({'comparar': f"En '{nombre}' la fecha inicial es posterior a la final."})
+    return periodo
+
+
+def periodos(params):
+    """[base, comparación, ...] a partir de date_from, date_to y comparar."""
+    base = Periodo('base', _fecha(params.get('date_from'), 'date_from'), _fecha(params.get('date_to'), 'date_to'))
+    if base.desde > base.hasta:
+        raise ValidationError({'date_to': 'Debe ser igual o posterior a date_from.'})
+    nombres = []
+    for nombre in (params.get('comparar') or COMPARACIONES_POR_DEFECTO).split(','):
+        nombre = nombre.strip()
+        if nombre and nombre not in nombres:
+            nombres.append(nombre)
+    if not nombres or len(nombres) > MAX_COMPARACIONES:
+        raise ValidationError({'comparar': f'Indica entre 1 y {MAX_COMPARACIONES} periodos con los que comparar.'})
+    return [base, *(_comparacion(nombre, base) for nombre in nombres)]
+
+
+def _comparar(valores, periodos):
+    """Valor del periodo base, el de cada comparación y la diferencia y variación (%) frente a cada una."""
+    base = valores[0]
+    datos = {'base': float(base), 'diferencia': {}, 'variacion': {}}
+    for periodo, valor in zip(periodos[1:], valores[1:]):
+        datos[periodo.nombre] = float(valor)
+        datos['diferencia'][periodo.nombre] = float(base - valor)
+        datos['variacion'][periodo.nombre] = round(float((base - valor) / abs(valor) * 100), 2) if valor else None
+    return datos
+
+
+def _metricas(por_tipo, periodos):
+    ingresos = [t['ingreso'] for t in por_tipo]
+    gastos = [t['gasto'] for t in por_tipo]
+    return {
+        'ingresos': _comparar(ingresos, periodos),
+        'gastos': _comparar(gastos, periodos),
+        'balance': _comparar([i - g for i, g in zip(ingresos, gastos)], periodos),
+    }
+
+
+def datos_comparacion(filas, periodos):
+    """
+    Respuesta de comparar a partir de filas {mes_grupo, categoria,
+    categoria__nombre, categoria__tipo, p0, p1, ...}, donde pN es la suma del
+    periodo N en ese mes (None si no tiene movimientos del periodo). Puede
+    haber varias filas del mismo mes y categoría: se suman. En `series`, cada
+    mes del periodo base se compara con el mes en la misma posición de cada
+    comparación (marzo con febrero frente al periodo anterior, por ejemplo).
+    """
+    n = len(periodos)
+    num_meses = meses_entre(periodos[0].desde, periodos[0].hasta) + 1
+    totales = [{'ingreso': 0, 'gasto': 0} for _ in periodos]
+    meses = [[{'ingreso': 0, 'gasto': 0} for _ in periodos] for _ in range(num_meses)]
+    categorias = {}
+
+    for row in filas:
+        tipo = row['categoria__tipo']
+        clave = (row['categoria'], row['categoria__nombre'], tipo)
+        por_periodo = categorias.setdefault(clave, [0] * n)
+        for i, periodo in enumerate(periodos):
+            valor = row[f'p{i}']
+            if valor is None:
+                continue
+            por_periodo[i] += valor
+            if tipo not in ('ingreso', 'gasto'):
+                continue  # sin categoría: no cuenta como ingreso ni gasto (como en resumen)
+            totales[i][tipo] += valor
+            posicion = meses_entre(periodo.desde, row['mes_grupo'])
+            if posicion < num_meses:
+                meses[posicion][i][tipo] += valor
+
+    inicio = periodos[0].desde
+    return {
+        'periodos': [{'nombre': p.nombre, 'desde': p.desde, 'hasta': p.hasta} for p in periodos],
+        **_metricas(totales, periodos),
+        'por_categoria': sorted(
+            (
+                {'categoria': cat, 'categoria__nombre': nombre, 'categoria__tipo': tipo,
+                 'total': _comparar(valores, periodos)}
+                for (cat, nombre, tipo), valores in categorias.items()
+            ),
+            key=lambda c: c['total']['base'], reverse=True,
+        ),
+        'series': [
+            {'month': restar_meses(inicio.replace(day=1), -k).strftime('%Y-%m'), **_metricas(meses[k], periodos)}
+            for k in range(num_meses)
+        ],
+    }
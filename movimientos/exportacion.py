@@ -0,0 +1,105 @@
+# movimientos/exportacion.py
+"""
+Exportación de movimientos en streaming (CSV y NDJSON).
+
+`generar` recorre el queryset con `values_list(*CAMPOS).iterator()` (en
+PostgreSQL, un cursor del lado del servidor) y produce el fichero en trozos
+de texto, sin instanciar modelos ni serializers. El CSV usa las mismas
+convenciones por defecto que el importador (separador ';' y coma decimal),
+así que se puede volver a importar.
+
+Con ASGI, Django 4.2 no envía en streaming un iterador síncrono: lo consume
+entero (en memoria) antes de mandar el primer byte. Para ASGI la vista
+envuelve el generador con `en_asincrono`.
+"""
+import csv
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+# Columnas exportadas, en el orden de values_list
+CAMPOS = ('id', 'fecha', 'descripcion', 'cantidad', 'categoria_id', 'categoria__nombre', 'categoria__tipo')
+CABECERA = ('id', 'fecha', 'descripcion', 'cantidad', 'categoria_id', 'categoria', 'tipo')
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def _trozos(lineas, filas_por_trozo):
+    """Agrupa las líneas en trozos para no emitir un write por fila."""
+    trozo = []
+    for linea in lineas:
+        trozo.append(linea)
+        if len(trozo) >= filas_por_trozo:
+            yield ''.join(trozo)
+            trozo = []
+    if trozo:
+        yield ''.join(trozo)
+
+
+def generar_csv(filas, separador=';', decimal=',', filas_por_trozo=500):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=separador, lineterminator='\n')
+
+    def linea(valores):
+        escritor.writerow(valores)
+        texto = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return texto
+
+    # La cabecera sale sola para que el cliente reciba el primer byte cuanto antes
+    yield linea(CABECERA)
+    yield from _trozos(
+        (
+            linea((
+                pk, fecha.isoformat(), descripcion, str(cantidad).replace('.', decimal),
+                categoria_id if categoria_id is not None else '', nombre or '', tipo or '',
+            ))
+            for pk, fecha, descripcion, cantidad, categoria_id, nombre, tipo in filas
+        ),
+        filas_por_trozo,
+    )
+
+
+def generar_ndjson(filas, filas_por_trozo=500):
+    yield from _trozos(
+        (
+            json.dumps(
+                dict(zip(CABECERA, (pk, fecha.isoformat(), descripcion, str(cantidad), categoria_id, nombre, tipo))),
+                ensure_ascii=False,
+            ) + '\n'
+            for pk, fecha, descripcion, cantidad, categoria_id, nombre, tipo in filas
+        ),
+        filas_por_trozo,
+    )
+
+
+def generar(queryset, formato, chunk_size=2000):
+    """
+    Genera la exportación del queryset en el formato pedido. Se recorre dentro
+    de una transacción: fuera de ella Django declara el cursor WITH HOLD y
+    PostgreSQL materializa el resultado entero antes de devolver la primera fila.
+    """
+    generador = generar_ndjson if formato == 'ndjson' else generar_csv
+    with transaction.atomic(using=queryset.db):
+        yield from generador(queryset.values_list(*CAMPOS).iterator(chunk_size=chunk_size))
+
+
+async def en_asincrono(trozos):
+    """
+    Los trozos de `generar` como iterador asíncrono, para servirlos con ASGI.
+    Cada uno se produce con sync_to_async en el hilo de la petición, el mismo
+    para todos: el cursor y la transacción son de la conexión de ese hilo.
+    """
+    siguiente = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (trozo := await siguiente(trozos, None)) is not None:
+            yield trozo
+    finally:
+        # Si el cliente corta la descarga, cierra el cursor y la transacción en su hilo
+        await sync_to_async(trozos.close, thread_sensitive=True)()
@@ -0,0 +1,144 @@
+# movimientos/generador.py
+"""
+Generador de datos sintéticos para pruebas de carga y benchmarks.
+
+`generar` da de alta usuarios (con token), un catálogo de categorías por
+usuario y años de movimientos con un patrón parecido al real: ingresos y
+gastos fijos una vez al mes (nómina, alquiler, suscripciones...) y gastos
+variables repartidos por el mes con importes de distribución log-uniforme.
+Todo se inserta con bulk_create por lotes y después se recalculan los
+agregados mensuales. Con la misma semilla los datos son los mismos.
+"""
+import math
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from rest_framework.authtoken.models import Token
+
+from .agregados import recalcular, siguiente_mes
+from .models import Categoria, Movimiento
+
+# nombre, tipo, veces al mes (None = fijo, una vez al mes), importe mínimo y máximo, descripciones
+CATALOGO = [
+    ('Nómina', 'ingreso', None, (1400, 3200), ['Nómina {mes}', 'Transferencia nómina {mes}']),
+    ('Freelance', 'ingreso', 0.3, (150, 900), ['Factura {n}', 'Transferencia cliente factura {n}']),
+    ('Intereses', 'ingreso', None, (0.5, 25), ['Intereses cuenta remunerada']),
+    ('Alquiler', 'gasto', None, (550, 1100), ['Alquiler piso {mes}']),
+    ('Suministros', 'gasto', 2.5, (20, 130), [
+        'Recibo luz Iberdrola', 'Recibo luz Endesa', 'Recibo agua', 'Fibra y móvil Movistar',
+        'Fibra y móvil Orange', 'Recibo gas Naturgy',
+    ]),
+    ('Suscripciones', 'gasto', None, (4, 18), ['Netflix', 'Spotify', 'Amazon Prime', 'HBO Max', 'iCloud']),
+    ('Supermercado', 'gasto', 8, (6, 140), [
+        'Compra Mercadona', 'Compra Carrefour', 'Compra Lidl', 'Compra Alcampo', 'Compra Dia',
+        'Compra Eroski', 'Frutería del barrio', 'Panadería',
+    ]),
+    ('Restaurantes', 'gasto', 4, (3, 80), [
+        'Cena restaurante', 'Menú del día', 'Café y tostada', 'Comida con compañeros', 'Pizzería',
+        'Hamburguesería', 'Tapas',
+    ]),
+    ('Transporte', 'gasto', 5, (1.5, 75), [
+        'Gasolina Repsol', 'Gasolina Cepsa', 'Bono bus', 'Taxi', 'Parking', 'Recarga tarjeta metro',
+    ]),
+    ('Ocio', 'gasto', 3, (5, 90), ['Cine', 'Entradas concierto', 'Libro', 'Videojuego', 'Gimnasio', 'Museo']),
+    ('Salud', 'gasto', 0.8, (6, 150), ['Farmacia', 'Dentista', 'Óptica', 'Fisioterapeuta']),
+    ('Ropa', 'gasto', 1, (12, 160), ['Zara', 'Decathlon', 'Primark', 'Zapatería']),
+    ('Viajes', 'gasto', 0.2, (60, 900), ['Vuelo a {ciudad}', 'Hotel en {ciudad}', 'Tren a {ciudad}']),
+]
+CIUDADES = ['Madrid', 'Barcelona', 'Sevilla', 'Valencia', 'Bilbao', 'Lisboa', 'París', 'Roma']
+# Día del mes de los movimientos fijos
+DIAS_FIJOS = {'Nómina': 28, 'Intereses': 30, 'Alquiler': 1, 'Suscripciones': 15}
+
+
+def _importe(rnd, minimo, maximo):
+    """Importe log-uniforme entre minimo y maximo: hay más gastos pequeños que grandes."""
+    valor = math.exp(rnd.uniform(math.log(minimo), math.log(maximo)))
+    return Decimal(round(valor * 100)) / 100
+
+
+def _descripcion(rnd, plantillas, mes):
+    return rnd.choice(plantillas).format(mes=mes.strftime('%m/%Y'), n=rnd.randint(1, 999), ciudad=rnd.choice(CIUDADES))
+
+
+def movimientos_de(usuario_id, categorias, rnd, desde, hasta, por_mes):
+    """
+    Genera (sin guardar) los movimientos de un usuario entre desde y hasta.
+    `categorias` es {nombre: Categoria}; `por_mes` es la media de movimientos al mes.
+    """
+    fijos = [c for c in CATALOGO if c[2] is None]
+    variables = [c for c in CATALOGO if c[2] is not None]
+    pesos = [c[2] for c in variables]
+    # Importe propio de cada fijo para el usuario (la nómina o el alquiler no cambian cada mes)
+    bases = {nombre: _importe(rnd, *rango) for nombre, _, _, rango, _ in fijos}
+    media_variables = max(0, por_mes - len(fijos))
+
+    mes = desde.replace(day=1)
+    while mes <= hasta:
+        dias = (siguiente_mes(mes) - mes).days
+        for nombre, _, _, rango, plantillas in fijos:
+            fecha = mes.replace(day=min(DIAS_FIJOS[nombre], dias))
+            if desde <= fecha <= hasta:
+                cantidad = bases[nombre] if nombre != 'Intereses' else _importe(rnd, *rango)
+                yield Movimiento(
+                    usuario_id=usuario_id, categoria=categorias[nombre], fecha=fecha,
+                    cantidad=cantidad, descripcion=_descripcion(rnd, plantillas, mes),
+                )
+
+        n = max(0, round(rnd.gauss(media_variables, media_variables * 0.15)))
+        for nombre, _, _, rango, plantillas in rnd.choices(variables, weights=pesos, k=n):
+            fecha = mes + timedelta(days=rnd.randrange(dias))
+            if desde <= fecha <= hasta:
+                yield Movimiento(
+                    # Una pequeña parte queda sin categoría, como pasa con los importados
+                    usuario_id=usuario_id, categoria=categorias[nombre] if rnd.random() > 0.01 else None,
+                    fecha=fecha, cantidad=_importe(rnd, *rango), descripcion=_descripcion(rnd, plantillas, mes),
+                )
+        mes = siguiente_mes(mes)
+
+
+def generar(usuarios=10, anios=3, por_mes=60, prefijo='demo', password='demo12345',
+            semilla=1, hasta=None, tam_lote=5000):
+    """
+    Crea `usuarios` usuarios ({prefijo}0001, ...) con token, categorías y
+    `anios` años de movimientos hasta `hasta` (hoy por defecto).
+    Devuelve el número de usuarios, categorías y movimientos creados.
+    """
+    rnd = random.Random(semilla)
+    hasta = hasta or date.today()
+    desde = date(hasta.year - anios, hasta.month, 1)
+    User = get_user_model()
+    # El hash de la contraseña es lento a propósito: se calcula una vez para todos
+    hash_password = make_password(password)
+
+    with transaction.atomic():
+        creados = User.objects.bulk_create([
+            User(username=f'{prefijo}{i:04d}', password=hash_password) for i in range(1, usuarios + 1)
+        ])
+        Token.objects.bulk_create([Token(user=u, key=Token.generate_key()) for u in creados])
+        categorias = Categoria.objects.bulk_create([
+            Categoria(usuario=u, nombre=nombre, tipo=tipo) for u in creados for nombre, tipo, *_ in CATALOGO
+        ])
+
+    por_usuario = {}
+    for categoria in categorias:
+        por_usuario.setdefault(categoria.usuario_id, {})[categoria.nombre] = categoria
+
+    total = 0
+    for usuario in creados:
+        filas = movimientos_de(usuario.pk, por_usuario[usuario.pk], rnd, desde, hasta, por_mes)
+        with transaction.atomic():
+            while lote := list(islice(filas, tam_lote)):
+                Movimiento.objects.bulk_create(lote)
+                total += len(lote)
+            recalcular(usuario.pk)
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE movimientos_movimiento, movimientos_agregadomensual, movimientos_categoria')
+
+    return {'usuarios': len(creados), 'categorias': len(categorias), 'movimientos': total}
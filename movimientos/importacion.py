@@ -0,0 +1,241 @@
+# movimientos/importacion.py
+"""
+Importación de extractos bancarios (CSV y OFX) en streaming.
+
+Es una cadena de generadores: `leer_csv` / `leer_ofx` producen una
+FilaImportada por movimiento sin cargar el fichero entero, e `importar`
+las consume insertando en trozos de tamaño fijo con bulk_create. La memoria
+usada no depende del número de filas del fichero.
+"""
+import csv
+import html
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+
+from .agregados import Deltas
+from .cache_api import datos_modificados
+from .models import Categoria, Movimiento
+from .signals import en_lote
+
+FilaImportada = namedtuple('FilaImportada', 'linea fecha cantidad descripcion categoria tipo')
+
+# Columnas por defecto del CSV (campo -> cabecera); se pueden redefinir con `columnas`
+COLUMNAS_CSV = {
+    'fecha': 'fecha',
+    'cantidad': 'cantidad',
+    'descripcion': 'descripcion',
+    'categoria': 'categoria',
+    'tipo': 'tipo',
+}
+
+
+class ErrorImportacion(ValueError):
+    pass
+
+# Movimiento.cantidad tiene max_digits=10 y 2 decimales
+CANTIDAD_MAXIMA = Decimal(10) ** 8
+CENTIMO = Decimal('0.01')
+
+
+def _cantidad(texto, decimal=','):
+    """'-1.234,56' -> Decimal('-1234.56') (o con punto decimal si decimal='.')."""
+    texto = texto.strip().replace(' ', '').replace('€', '')
+    if decimal == ',':
+        texto = texto.replace('.', '').replace(',', '.')
+    else:
+        texto = texto.replace(',', '')
+    cantidad = Decimal(texto)
+    # Decimal acepta 'NaN' e 'Infinity', y lo que no cabe en la columna haría fallar el INSERT del lote
+    if not cantidad.is_finite():
+        raise ValueError(f"cantidad no válida '{texto}'")
+    if cantidad.adjusted() >= 8 or abs(cantidad.quantize(CENTIMO)) >= CANTIDAD_MAXIMA:
+        raise ValueError(f"cantidad '{texto}' demasiado grande (como mucho 99999999.99)")
+    return cantidad
+
+
+def _fecha(texto, formatos):
+    texto = texto.strip()
+    for formato in formatos:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"fecha no reconocida '{texto}'")
+
+
+def _fila(linea, fecha, cantidad, descripcion, categoria, tipo):
+    """Normaliza signo y tipo: las cantidades negativas son gastos."""
+    # Se redondea antes de comprobarla: 0,004 se guardaría como 0.00
+    cantidad = cantidad.quantize(CENTIMO)
+    if cantidad == 0:
+        raise ErrorImportacion(f'Línea {linea}: la cantidad no puede ser 0 (redondeada a céntimos).')
+    tipo = (tipo or '').strip().lower() or ('gasto' if cantidad < 0 else 'ingreso')
+    if tipo not in ('ingreso', 'gasto'):
+        raise ErrorImportacion(f"Línea {linea}: tipo '{tipo}' no válido (ingreso o gasto).")
+    return FilaImportada(
+        linea=linea,
+        fecha=fecha,
+        cantidad=abs(cantidad),
+        descripcion=(descripcion or '').strip()[:200],
+        categoria=(categoria or '').strip()[:50] or None,
+        tipo=tipo,
+    )
+
+
+def leer_csv(texto, columnas=None, separador=';', decimal=',', formato_fecha='%d/%m/%Y'):
+    """
+    Lee un CSV con cabecera desde un fichero de texto abierto y genera
+    FilaImportada. `columnas` traduce campo -> nombre de columna en el CSV;
+    solo fecha y cantidad son obligatorias.
+    """
+    mapeo = {**COLUMNAS_CSV, **(columnas or {})}
+    formatos = [formato_fecha, '%Y-%m-%d']
+    lector = csv.DictReader(texto, delimiter=separador)
+    # csv.Error (un campo enorme, un salto de línea suelto...) es un fichero mal formado, no un error del servidor
+    try:
+        cabecera = lector.fieldnames or []
+    except csv.Error as exc:
+        raise ErrorImportacion(f'Cabecera: {exc}') from exc
+    for campo in ('fecha', 'cantidad'):
+        if mapeo[campo] not in cabecera:
+            raise ErrorImportacion(f"Falta la columna '{mapeo[campo]}' (campo {campo}).")
+
+    while True:
+        try:
+            registro = next(lector, None)
+        except csv.Error as exc:
+            # line_num aún no cuenta la línea que no se ha podido leer
+            raise ErrorImportacion(f'Línea {lector.line_num + 1}: {exc}') from exc
+        if registro is None:
+            break
+        linea = lector.line_num
+        try:
+            fecha = _fecha(registro[mapeo['fecha']] or '', formatos)
+            cantidad = _cantidad(registro[mapeo['cantidad']] or '', decimal)
+        except (ValueError, InvalidOperation) as exc:
+            raise ErrorImportacion(f'Línea {linea}: {exc}') from exc
+        yield _fila(
+            linea, fecha, cantidad,
+            registro.get(mapeo['descripcion']),
+            registro.get(mapeo['categoria']),
+            registro.get(mapeo['tipo']),
+        )
+
+
+def _etiquetas_ofx(texto, tam_bloque=64 * 1024):
+    """
+    Genera (ETIQUETA, valor) recorriendo el OFX por bloques. Sirve tanto para
+    OFX 1.x (SGML, sin etiquetas de cierre) como para OFX 2.x (XML).
+    """
+    resto = ''
+    while True:
+        bloque = texto.read(tam_bloque)
+        if not bloque:
+            break
+        partes = (resto + bloque).split('<')
+        resto = partes.pop()  # puede estar cortada al final del bloque
+        for parte in partes:
+            if '>' in parte:
+                etiqueta, valor = parte.split('>', 1)
+                yield etiqueta.strip().upper(), html.unescape(valor.strip())
+    if '>' in resto:
+        etiqueta, valor = resto.split('>', 1)
+        yield etiqueta.strip().upper(), html.unescape(valor.strip())
+
+
+def leer_ofx(texto):
+    """
+    Genera una FilaImportada por cada <STMTTRN> del extracto OFX. El OFX no
+    trae categorías: `importar` les asigna la categoría por defecto.
+    """
+    transaccion = None
+    n = 0
+    for etiqueta, valor in _etiquetas_ofx(texto):
+        if etiqueta == 'STMTTRN':
+            transaccion = {}
+        elif etiqueta == '/STMTTRN' and transaccion is not None:
+            n += 1
+            try:
+                fecha = datetime.strptime(transaccion.get('DTPOSTED', '')[:8], '%Y%m%d').date()
+                importe = transaccion.get('TRNAMT', '')
+                # El estándar usa punto decimal, pero algunos bancos exportan con coma
+                cantidad = _cantidad(importe, ',' if ',' in importe and '.' not in importe else '.')
+            except (ValueError, InvalidOperation) as exc:
+                raise ErrorImportacion(f'Transacción {n}: {exc}') from exc
+            descripcion = ' - '.join(v for v in (transaccion.get('NAME'), transaccion.get('MEMO')) if v)
+            yield _fila(n, fecha, cantidad, descripcion, None, None)
+            transaccion = None
+        elif transaccion is not None and not etiqueta.startswith('/'):
+            transaccion[etiqueta] = valor
+
+
+class MapaCategorias:
+    """
+    Resuelve (nombre, tipo) -> id de Categoria del usuario con un diccionario en
+    memoria, siguiendo la misma regla que uniq_categoria_usuario_nombre_ci_tipo
+    (nombre sin distinguir mayúsculas). Crea las que falten.
+    """
+
+    def __init__(self, usuario):
+        self.usuario = usuario
+        self.ids = {
+            (nombre.lower(), tipo): pk
+            for pk, nombre, tipo in Categoria.objects.filter(usuario=usuario).values_list('id', 'nombre', 'tipo')
+        }
+        self.creadas = 0
+
+    def id_para(self, nombre, tipo):
+        clave = (nombre.lower(), tipo)
+        if clave not in self.ids:
+            try:
+                with transaction.atomic():
+                    pk = Categoria.objects.create(usuario=self.usuario, nombre=nombre, tipo=tipo).pk
+                self.creadas += 1
+            except IntegrityError:
+                # Creada mientras tanto por otra petición
+                pk = Categoria.objects.get(usuario=self.usuario, tipo=tipo, nombre__iexact=nombre).pk
+            self.ids[clave] = pk
+        return self.ids[clave]
+
+
+def leer(texto, formato, **opciones_csv):
+    """Elige el lector según el formato ('csv' u 'ofx')."""
+    if formato == 'ofx':
+        return leer_ofx(texto)
+    if formato == 'csv':
+        return leer_csv(texto, **opciones_csv)
+    raise ErrorImportacion(f"Formato '{formato}' no soportado (csv u ofx).")
+
+
+def importar(usuario, filas, tam_lote=1000, categoria_por_defecto='Importados'):
+    """
+    Inserta las filas en trozos de `tam_lote` dentro de una transacción: si
+    alguna fila falla no se importa nada. Devuelve un resumen con los totales.
+    """
+    categorias = MapaCategorias(usuario)
+    deltas = Deltas()
+    lote = []
+    n = 0
+    with transaction.atomic(), en_lote():
+        for fila in filas:
+            mov = Movimiento(
+                usuario=usuario,
+                categoria_id=categorias.id_para(fila.categoria or categoria_por_defecto, fila.tipo),
+                descripcion=fila.descripcion,
+                fecha=fila.fecha,
+                cantidad=fila.cantidad,
+            )
+            deltas.sumar(mov)
+            lote.append(mov)
+            if len(lote) >= tam_lote:
+                Movimiento.objects.bulk_create(lote)
+                n += len(lote)
+                lote = []
+        Movimiento.objects.bulk_create(lote)
+        n += len(lote)
+        deltas.aplicar()
+        datos_modificados(usuario.pk)
+    return {'importados': n, 'categorias_creadas': categorias.creadas}
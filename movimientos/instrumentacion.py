@@ -0,0 +1,215 @@
+# movimientos/instrumentacion.py
+"""
+Instrumentación por petición: consultas SQL, tiempo de base de datos y
+tramos de código (autenticación, serialización).
+
+InstrumentacionMiddleware abre una Medicion por petición en una variable de
+contexto (válida en hilos y en vistas asíncronas). Todas las conexiones
+llevan un execute_wrapper (se instala al conectarse, ver signals.py) que,
+si hay una medición activa, cuenta la consulta y su duración; `tramo()`
+acumula el tiempo de un bloque de código. Al terminar la petición:
+
+- Se añade la cabecera Server-Timing (total, db, auth, serializer...),
+  salvo con MOVIMIENTOS_SERVER_TIMING = False.
+- En una fracción MOVIMIENTOS_INSTRUMENTACION_MUESTREO de las peticiones
+  (0.1, la de settings.py) se calculan además huellas de las consultas para
+  detectar repetidas (mismo SQL y parámetros) y similares (mismo SQL con
+  otros parámetros, típico de N+1), y se registra una línea JSON en el
+  logger movimientos.instrumentacion con nivel INFO.
+- Las peticiones de más de MOVIMIENTOS_PETICION_LENTA_MS (500) se
+  registran siempre, con nivel WARNING.
+
+En las respuestas en streaming (exportar) se mide hasta que se devuelve la
+respuesta, no el envío del cuerpo.
+
+Sin muestreo el coste por consulta es leer la variable de contexto y dos
+llamadas a perf_counter.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+logger = logging.getLogger('movimientos.instrumentacion')
+
+_actual = ContextVar('movimientos_medicion', default=None)
+
+# Listas de parámetros de longitud variable (IN, VALUES de bulk_create) cuentan como la misma consulta
+_LISTAS = re.compile(r'\((?:%s, )+%s\)')
+_SIMILARES_REGISTRADAS = 5
+
+
+def huella(sql):
+    return hashlib.sha1(_LISTAS.sub('(...)', sql).encode('utf-8')).hexdigest()[:12]
+
+
+class Medicion:
+    """Lo que se ha medido durante una petición (o un bloque `medir()`)."""
+
+    def __init__(self, detallada=False):
+        self.detallada = detallada
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.db = 0.0
+        self.tramos = defaultdict(float)
+        self.exactas = Counter()
+        self.plantillas = Counter()
+        self.ejemplos = {}
+        # Las vistas asíncronas pueden consultar desde varios hilos a la vez
+        self._lock = threading.Lock()
+
+    def anotar_consulta(self, sql, params, duracion):
+        with self._lock:
+            self.consultas += 1
+            self.db += duracion
+            if self.detallada:
+                clave = huella(sql)
+                self.plantillas[clave] += 1
+                self.exactas[(sql, repr(params))] += 1
+                self.ejemplos.setdefault(clave, sql)
+
+    def anotar_tramo(self, nombre, duracion):
+        with self._lock:
+            self.tramos[nombre] += duracion
+
+    @property
+    def repetidas(self):
+        """Ejecuciones que repiten exactamente una consulta anterior (mismo SQL y parámetros)."""
+        return sum(veces - 1 for veces in self.exactas.values())
+
+    @property
+    def similares(self):
+        """Consultas con la misma forma ejecutadas varias veces, de más a menos."""
+        return [
+            {'huella': clave, 'veces': veces, 'sql': self.ejemplos[clave][:200]}
+            for clave, veces in self.plantillas.most_common(_SIMILARES_REGISTRADAS) if veces > 1
+        ]
+
+    def server_timing(self, total):
+        partes = [f'total;dur={total * 1000:.1f}', f'db;dur={self.db * 1000:.1f};desc="{self.consultas} consultas"']
+        partes += [f'{nombre};dur={duracion * 1000:.1f}' for nombre, duracion in self.tramos.items()]
+        if self.detallada and self.repetidas:
+            partes.append(f'dup;desc="{self.repetidas} repetidas"')
+        return ', '.join(partes)
+
+
+def medicion_actual():
+    return _actual.get()
+
+
+@contextmanager
+def medir(detallada=True):
+    """Mide las consultas y tramos de un bloque (p. ej. en un comando o en los tests)."""
+    medicion = Medicion(detallada)
+    token = _actual.set(medicion)
+    try:
+        yield medicion
+    finally:
+        _actual.reset(token)
+
+
+@contextmanager
+def tramo(nombre):
+    """Acumula en la medición activa el tiempo del bloque (incluidas sus consultas)."""
+    medicion = _actual.get()
+    if medicion is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicion.anotar_tramo(nombre, time.perf_counter() - inicio)
+
+
+def _envoltorio(execute, sql, params, many, context):
+    medicion = _actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.anotar_consulta(sql, params, time.perf_counter() - inicio)
+
+
+def instalar(connection):
+    """Añade el execute_wrapper a una conexión (una sola vez aunque se reconecte)."""
+    if _envoltorio not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_envoltorio)
+
+
+class InstrumentacionMiddleware:
+    """Debe ir el primero de MIDDLEWARE para que el total cubra toda la petición."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion, token = self._iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            _actual.reset(token)
+        return self._terminar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion, token = self._iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _actual.reset(token)
+        return self._terminar(request, response, medicion)
+
+    def _iniciar(self):
+        muestreo = getattr(settings, 'MOVIMIENTOS_INSTRUMENTACION_MUESTREO', 0.1)
+        medicion = Medicion(detallada=muestreo > 0 and random.random() < muestreo)
+        return medicion, _actual.set(medicion)
+
+    def _terminar(self, request, response, medicion):
+        total = time.perf_counter() - medicion.inicio
+        if getattr(settings, 'MOVIMIENTOS_SERVER_TIMING', True):
+            response['Server-Timing'] = medicion.server_timing(total)
+
+        lenta = total * 1000 >= getattr(settings, 'MOVIMIENTOS_PETICION_LENTA_MS', 500)
+        nivel = logging.WARNING if lenta else logging.INFO
+        if (lenta or medicion.detallada) and logger.isEnabledFor(nivel):
+            datos = self._datos(request, response, medicion, total, lenta)
+            logger.log(nivel, json.dumps(datos, ensure_ascii=False), extra={'instrumentacion': datos})
+        return response
+
+    def _datos(self, request, response, medicion, total, lenta):
+        # Solo el usuario ya resuelto (DRF lo deja en la petición): evaluar el
+        # perezoso de AuthenticationMiddleware consultaría la sesión
+        usuario = request.__dict__.get('user')
+        datos = {
+            'metodo': request.method,
+            'ruta': request.path,
+            'estado': response.status_code,
+            'usuario': None if usuario is None or isinstance(usuario, SimpleLazyObject) else usuario.pk,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(medicion.db * 1000, 2),
+            'consultas': medicion.consultas,
+            **{f'{nombre}_ms': round(duracion * 1000, 2) for nombre, duracion in medicion.tramos.items()},
+            'lenta': lenta,
+        }
+        if medicion.detallada:
+            datos['repetidas'] = medicion.repetidas
+            datos['similares'] = medicion.similares
+        return datos
@@ -0,0 +1,45 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from movimientos.generador import generar
+
+
+class Command(BaseCommand):
+    help = 'Genera usuarios, categorías y movimientos sintéticos para pruebas de carga.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=10)
+        parser.add_argument('--anios', type=int, default=3, help='Años de histórico por usuario')
+        parser.add_argument('--movimientos-por-mes', type=int, default=60, help='Media por usuario y mes')
+        parser.add_argument('--prefijo', default='demo', help='Los usuarios se llaman <prefijo>0001, <prefijo>0002...')
+        parser.add_argument('--password', default='demo12345', help='Contraseña de todos los usuarios')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--hasta', help='Última fecha (YYYY-MM-DD); por defecto, hoy')
+        parser.add_argument('--tam-lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        hasta = None
+        if options['hasta']:
+            try:
+                hasta = parse_date(options['hasta'])
+            except ValueError:
+                hasta = None
+            if hasta is None:
+                raise CommandError(f"Fecha no válida: '{options['hasta']}'.")
+
+        if get_user_model().objects.filter(username__startswith=options['prefijo']).exists():
+            raise CommandError(f"Ya hay usuarios con el prefijo '{options['prefijo']}'; usa otro con --prefijo.")
+
+        inicio = time.perf_counter()
+        resultado = generar(
+            usuarios=options['usuarios'], anios=options['anios'], por_mes=options['movimientos_por_mes'],
+            prefijo=options['prefijo'], password=options['password'], semilla=options['semilla'],
+            hasta=hasta, tam_lote=options['tam_lote'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['usuarios']} usuario(s), {resultado['categorias']} categoría(s) y "
+            f"{resultado['movimientos']} movimiento(s) en {time.perf_counter() - inicio:.1f} s."
+        ))
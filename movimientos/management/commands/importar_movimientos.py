@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from movimientos import importacion
+
+
+class Command(BaseCommand):
+    help = 'Importa un extracto bancario (CSV u OFX) en streaming para un usuario.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usuario', help='Nombre de usuario')
+        parser.add_argument('fichero', help='Ruta del CSV u OFX')
+        parser.add_argument('--formato', choices=['csv', 'ofx'], help='Por defecto, según la extensión')
+        parser.add_argument('--codificacion', default='utf-8-sig')
+        parser.add_argument('--categoria', default='Importados', help='Categoría para las filas que no traen una')
+        parser.add_argument('--separador', default=';')
+        parser.add_argument('--decimal', default=',', choices=[',', '.'])
+        parser.add_argument('--formato-fecha', default='%d/%m/%Y')
+        parser.add_argument(
+            '--columna', action='append', default=[], metavar='CAMPO=CABECERA',
+            help='Nombre de la columna del CSV para un campo (fecha, cantidad, descripcion, categoria, tipo)'
+        )
+        parser.add_argument('--tam-lote', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe el usuario '{options['usuario']}'.")
+
+        formato = options['formato'] or ('ofx' if options['fichero'].lower().endswith(('.ofx', '.qfx')) else 'csv')
+        opciones = {}
+        if formato == 'csv':
+            columnas = {}
+            for par in options['columna']:
+                campo, sep, cabecera = par.partition('=')
+                if not sep:
+                    raise CommandError(f"--columna espera CAMPO=CABECERA, no '{par}'.")
+                columnas[campo] = cabecera
+            opciones = {
+                'columnas': columnas,
+                'separador': options['separador'],
+                'decimal': options['decimal'],
+                'formato_fecha': options['formato_fecha'],
+            }
+
+        try:
+            with open(options['fichero'], encoding=options['codificacion'], newline='') as texto:
+                resultado = importacion.importar(
+                    usuario, importacion.leer(texto, formato, **opciones),
+                    tam_lote=options['tam_lote'], categoria_por_defecto=options['categoria'],
+                )
+        except (OSError, UnicodeDecodeError, importacion.ErrorImportacion) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['importados']} movimiento(s) importado(s), "
+            f"{resultado['categorias_creadas']} categoría(s) nueva(s)."
+        ))
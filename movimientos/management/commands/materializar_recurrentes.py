@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from movimientos.recurrentes import materializar
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea los movimientos de las ocurrencias vencidas de los movimientos recurrentes de todos los '
+        'usuarios, por lotes de reglas. Se puede repetir sin duplicar nada; conviene lanzarlo a diario (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasta', help='Crea las ocurrencias hasta esta fecha (YYYY-MM-DD); por defecto, hoy')
+        parser.add_argument('--tam-lote', type=int, default=1000, help='Reglas por lote (una transacción cada uno)')
+
+    def handle(self, *args, **options):
+        hasta = timezone.localdate()
+        if options['hasta']:
+            try:
+                hasta = parse_date(options['hasta'])
+            except ValueError:
+                hasta = None
+            if hasta is None:
+                raise CommandError('--hasta debe ser una fecha YYYY-MM-DD.')
+        resultado = materializar(hasta, tam_lote=options['tam_lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['movimientos']} movimiento(s) creado(s) de {resultado['reglas']} regla(s) recurrente(s)."
+        ))
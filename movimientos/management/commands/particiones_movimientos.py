@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_date
+
+from movimientos import particiones
+
+
+class Command(BaseCommand):
+    help = (
+        'Mantiene las particiones por fecha de los movimientos (PostgreSQL con MOVIMIENTOS_PARTICIONES): '
+        'crea las de los próximos periodos y archiva las antiguas. Pensado para lanzarse periódicamente (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--adelantar', type=int, default=particiones.ADELANTAR,
+            help=f'Periodos futuros que deben tener ya su partición (por defecto {particiones.ADELANTAR})'
+        )
+        parser.add_argument(
+            '--archivar-antes', metavar='FECHA',
+            help='Archiva las particiones que terminan en esa fecha (YYYY-MM-DD) o antes'
+        )
+        parser.add_argument('--esquema-archivo', default='archivo', help='Esquema al que se mueven las archivadas')
+        parser.add_argument('--borrar', action='store_true', help='Borra las particiones archivadas en lugar de moverlas')
+        parser.add_argument(
+            '--convertir', choices=particiones.GRANULARIDADES, nargs='?', const='',
+            help='Convierte la tabla en particionada (por defecto con MOVIMIENTOS_PARTICIONES)'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El particionado de movimientos solo está disponible en PostgreSQL.')
+
+        with transaction.atomic():
+            if options['convertir'] is not None:
+                granularidad = options['convertir'] or particiones.granularidad_configurada()
+                if not granularidad:
+                    raise CommandError("Indica la granularidad ('anual' o 'mensual') o configura MOVIMIENTOS_PARTICIONES.")
+                if particiones.particionar(connection, granularidad, options['adelantar']):
+                    self.stdout.write(self.style.SUCCESS(f'Tabla de movimientos particionada ({granularidad}).'))
+
+            with connection.cursor() as cursor:
+                if not particiones.esta_particionada(cursor):
+                    raise CommandError(
+                        'La tabla de movimientos no está particionada: configura MOVIMIENTOS_PARTICIONES '
+                        'y ejecuta este comando con --convertir.'
+                    )
+
+            for nombre in particiones.crear_particiones(connection, options['adelantar']):
+                self.stdout.write(f'Creada {nombre}')
+
+            if options['archivar_antes']:
+                antes = parse_date(options['archivar_antes'])
+                if antes is None:
+                    raise CommandError('--archivar-antes debe ser una fecha YYYY-MM-DD.')
+                for nombre in particiones.archivar(connection, antes, options['esquema_archivo'], options['borrar']):
+                    destino = 'borrada' if options['borrar'] else f"movida a {options['esquema_archivo']}"
+                    self.stdout.write(f'Archivada {nombre} ({destino})')
+
+            with connection.cursor() as cursor:
+                lista = particiones.particiones(cursor)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(lista)} partición(es); la última cubre hasta {max((h for _, _, h in lista if h), default="-")}.'
+        ))
@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import signal
+from datetime import timedelta
+from multiprocessing.connection import wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from movimientos import tareas
+
+
+def trabajar(parar, espera, hasta_vaciar):
+    """
+    Ejecuta tareas hasta que se pida parar (o, con hasta_vaciar, hasta que no
+    queden pendientes). Termina la tarea en curso antes de salir.
+    """
+    while not parar.is_set():
+        # Como en una petición: descarta la conexión si ha caducado (CONN_MAX_AGE) o falló
+        close_old_connections()
+        if tareas.procesar(maximo=1):
+            continue
+        if hasta_vaciar:
+            break
+        parar.wait(espera)
+    connections.close_all()
+
+
+def proceso_trabajador(parar, espera, hasta_vaciar):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C lo gestiona el proceso principal
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    trabajar(parar, espera, hasta_vaciar)
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta las tareas en segundo plano encargadas desde /api/tareas/ con un grupo de procesos '
+        'que toman tareas de la cola (SELECT ... FOR UPDATE SKIP LOCKED).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos', type=int, default=os.cpu_count() or 1,
+            help='Procesos trabajadores (por defecto, uno por núcleo). Con 0 se ejecutan en este proceso'
+        )
+        parser.add_argument('--espera', type=float, default=1.0, help='Segundos entre consultas con la cola vacía')
+        parser.add_argument('--una-vez', action='store_true', help='Sale cuando no quedan tareas pendientes')
+        parser.add_argument(
+            '--tiempo-maximo', type=int,
+            default=getattr(settings, 'MOVIMIENTOS_TAREAS_TIEMPO_MAXIMO', 3600),
+            help='Segundos tras los que una tarea en curso se da por abandonada y vuelve a la cola'
+        )
+
+    def recuperar(self, tiempo_maximo):
+        reintentadas, fallidas = tareas.recuperar_abandonadas(tiempo_maximo)
+        if reintentadas or fallidas:
+            self.stdout.write(f'Tareas abandonadas: {reintentadas} a la cola, {fallidas} fallidas.')
+
+    def handle(self, *args, **options):
+        tiempo_maximo = timedelta(seconds=options['tiempo_maximo'])
+        self.recuperar(tiempo_maximo)
+        if options['procesos'] == 0 and options['una_vez']:
+            n = tareas.procesar()
+            self.stdout.write(self.style.SUCCESS(f'{n} tarea(s) ejecutada(s).'))
+            return
+
+        parar = multiprocessing.Event()
+        anterior_int = signal.signal(signal.SIGINT, lambda *_: parar.set())
+        anterior_term = signal.signal(signal.SIGTERM, lambda *_: parar.set())
+        try:
+            if options['procesos'] == 0:
+                trabajar(parar, options['espera'], options['una_vez'])
+            else:
+                self.grupo(parar, options, tiempo_maximo)
+        finally:
+            signal.signal(signal.SIGINT, anterior_int)
+            signal.signal(signal.SIGTERM, anterior_term)
+        self.stdout.write(self.style.SUCCESS('Trabajadores detenidos.'))
+
+    def grupo(self, parar, options, tiempo_maximo):
+        contexto = multiprocessing.get_context('fork')
+
+        def nuevo():
+            # Cada proceso abre sus conexiones: una conexión no se puede compartir tras fork, y
+            # este proceso vuelve a abrir la suya en cada recuperar() antes de sustituir uno caído
+            connections.close_all()
+            proceso = contexto.Process(target=proceso_trabajador, args=(parar, options['espera'], options['una_vez']))
+            proceso.start()
+            return proceso
+
+        procesos = [nuevo() for _ in range(options['procesos'])]
+        self.stdout.write(f"{len(procesos)} proceso(s) trabajando (pid {', '.join(str(p.pid) for p in procesos)}).")
+        while any(p.is_alive() for p in procesos):
+            # Despierta cuando termina algún proceso (o para recuperar abandonadas cada cierto tiempo)
+            wait([p.sentinel for p in procesos if p.is_alive()], timeout=min(options['espera'] * 10, 60))
+            if parar.is_set():
+                break
+            close_old_connections()
+            self.recuperar(tiempo_maximo)
+            if not options['una_vez']:
+                # Un proceso que muere (p. ej. por falta de memoria) se sustituye
+                procesos = [p if p.is_alive() else nuevo() for p in procesos]
+        for proceso in procesos:
+            proceso.join()
+        connections.close_all()
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from movimientos.cambios import purgar
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra las lápidas de categorías y movimientos eliminados (las usa /api/cambios/) con más de '
+        'MOVIMIENTOS_CAMBIOS_RETENCION días; los clientes con un token anterior recargan todo. '
+        'Conviene lanzarlo a diario (cron).'
+    )
+
+    def handle(self, *args, **options):
+        dias = getattr(settings, 'MOVIMIENTOS_CAMBIOS_RETENCION', 30)
+        borradas = purgar(timezone.now() - timedelta(days=dias))
+        self.stdout.write(self.style.SUCCESS(f'{borradas} lápida(s) de más de {dias} días borrada(s).'))
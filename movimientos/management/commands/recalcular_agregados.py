@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from movimientos.agregados import recalcular, verificar
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye (o solo verifica) los agregados mensuales a partir de los movimientos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', help='Nombre de usuario; por defecto, todos')
+        parser.add_argument('--desde', help='Primer mes a reconstruir (YYYY-MM-DD)')
+        parser.add_argument('--hasta', help='Último mes a reconstruir (YYYY-MM-DD)')
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help='No modifica nada: compara agregados y movimientos y falla si no cuadran'
+        )
+
+    def handle(self, *args, **options):
+        usuario_id = None
+        if options['usuario']:
+            User = get_user_model()
+            try:
+                usuario_id = User.objects.get(username=options['usuario']).pk
+            except User.DoesNotExist:
+                raise CommandError(f"No existe el usuario '{options['usuario']}'.")
+
+        if options['verificar']:
+            errores = verificar(usuario_id)
+            for (usuario, mes, categoria), esperado, guardado in errores:
+                self.stdout.write(
+                    f'usuario={usuario} mes={mes:%Y-%m} categoria={categoria}: '
+                    f'esperado={esperado} guardado={guardado}'
+                )
+            if errores:
+                raise CommandError(f'{len(errores)} agregado(s) no coinciden con los movimientos.')
+            self.stdout.write(self.style.SUCCESS('Los agregados coinciden con los movimientos.'))
+            return
+
+        n = recalcular(usuario_id, options['desde'], options['hasta'])
+        self.stdout.write(self.style.SUCCESS(f'{n} agregado(s) reconstruido(s).'))
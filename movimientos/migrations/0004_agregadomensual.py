@@ -0,0 +1,53 @@
+# Generated by Django 4.2.20 on 2026-10-18 03:00
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.comparison
+
+
+def poblar_agregados(apps, schema_editor):
+    # Carga inicial a partir de los movimientos ya existentes
+    from django.db.models import Count, Sum
+    from django.db.models.functions import TruncMonth
+
+    Movimiento = apps.get_model('movimientos', 'Movimiento')
+    AgregadoMensual = apps.get_model('movimientos', 'AgregadoMensual')
+    filas = (
+        Movimiento.objects.annotate(mes=TruncMonth('fecha'))
+                          .values('usuario_id', 'mes', 'categoria_id')
+                          .annotate(total=Sum('cantidad'), num=Count('id'))
+                          .order_by()
+    )
+    AgregadoMensual.objects.bulk_create(
+        (AgregadoMensual(**row) for row in filas.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('movimientos', '0003_alter_movimiento_cantidad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgregadoMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('num', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='agregados_mensuales', to='movimientos.categoria')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agregados_mensuales', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='agregadomensual',
+            constraint=models.UniqueConstraint(models.F('usuario'), models.F('mes'), django.db.models.functions.comparison.Coalesce('categoria', 0), name='uniq_agregado_usuario_mes_categoria'),
+        ),
+        migrations.RunPython(poblar_agregados, migrations.RunPython.noop),
+    ]
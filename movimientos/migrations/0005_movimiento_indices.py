@@ -0,0 +1,29 @@
+# Generated by Django 4.2.20 on 2026-10-18 03:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('movimientos', '0004_agregadomensual'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimiento',
+            name='usuario',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['usuario', '-fecha', '-id'], include=('categoria', 'cantidad'), name='mov_usuario_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['usuario', 'categoria', '-fecha', '-id'], name='mov_usuario_cat_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Solo en PostgreSQL: en otras bases de datos descripcion_tsv queda a NULL y la
+# búsqueda sigue siendo un LIKE (ver movimientos/busqueda.py).
+
+CREAR_TRIGGER = """
+    CREATE TRIGGER movimientos_movimiento_tsv
+    BEFORE INSERT OR UPDATE OF descripcion, descripcion_tsv ON movimientos_movimiento
+    FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(descripcion_tsv, 'pg_catalog.spanish', descripcion)
+"""
+
+
+def trigramas_disponibles(cursor):
+    cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    return cursor.fetchone() is not None
+
+
+def crear_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREAR_TRIGGER)
+        cursor.execute("UPDATE movimientos_movimiento SET descripcion_tsv = to_tsvector('pg_catalog.spanish', descripcion)")
+        cursor.execute('CREATE INDEX mov_descripcion_tsv_idx ON movimientos_movimiento USING gin (descripcion_tsv)')
+        # Índice para icontains (UPPER(descripcion) LIKE ...). pg_trgm viene en
+        # contrib; si el servidor no lo trae la subcadena funciona igual, sin índice
+        if trigramas_disponibles(cursor):
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(
+                'CREATE INDEX mov_descripcion_trgm_idx ON movimientos_movimiento '
+                'USING gin (UPPER(descripcion) gin_trgm_ops)'
+            )
+
+
+def borrar_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX IF EXISTS mov_descripcion_trgm_idx')
+        cursor.execute('DROP INDEX IF EXISTS mov_descripcion_tsv_idx')
+        cursor.execute('DROP TRIGGER IF EXISTS movimientos_movimiento_tsv ON movimientos_movimiento')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimientos', '0005_movimiento_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimiento',
+            name='descripcion_tsv',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(crear_busqueda, borrar_busqueda),
+    ]
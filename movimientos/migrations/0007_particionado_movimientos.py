@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from movimientos import particiones
+
+# Solo en PostgreSQL y si MOVIMIENTOS_PARTICIONES está configurado: el modelo
+# no cambia, solo cómo guarda PostgreSQL la tabla (ver movimientos/particiones.py).
+# Si se configura después de migrar, la tabla se convierte con
+# `manage.py particiones_movimientos --convertir`.
+
+
+def particionar(apps, schema_editor):
+    granularidad = particiones.granularidad_configurada()
+    if schema_editor.connection.vendor != 'postgresql' or not granularidad:
+        return
+    particiones.particionar(schema_editor.connection, granularidad)
+
+
+def desparticionar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    particiones.desparticionar(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimientos', '0006_busqueda_descripcion'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, desparticionar),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.20 on 2026-10-18 05:28
+
+from decimal import Decimal
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('movimientos', '0008_tarea'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoRecurrente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descripcion', models.CharField(blank=True, max_length=200)),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('frecuencia', models.CharField(choices=[('semanal', 'Semanal'), ('mensual', 'Mensual'), ('anual', 'Anual')], max_length=7)),
+                ('intervalo', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)])),
+                ('inicio', models.DateField()),
+                ('fin', models.DateField(blank=True, null=True)),
+                ('siguiente', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='movimientorecurrente',
+            name='categoria',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recurrentes', to='movimientos.categoria'),
+        ),
+        migrations.AddField(
+            model_name='movimientorecurrente',
+            name='usuario',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recurrentes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='movimiento',
+            name='recurrente',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='movimientos.movimientorecurrente'),
+        ),
+        migrations.AddConstraint(
+            model_name='movimiento',
+            constraint=models.UniqueConstraint(fields=('recurrente', 'fecha'), name='uniq_movimiento_recurrente_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientorecurrente',
+            index=models.Index(fields=['usuario', 'id'], name='recurrente_usuario_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientorecurrente',
+            index=models.Index(condition=models.Q(('siguiente__isnull', False)), fields=['siguiente'], name='recurrente_siguiente_idx'),
+        ),
+    ]
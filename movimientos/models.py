@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
-from django.db.models.functions import Lower
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Coalesce, Lower
 from decimal import Decimal
 from django.core.validators import MinValueValidator
 
@@ -16,11 +17,16 @@ class Categoria(models.Model):
     )
     nombre = models.CharField(max_length=50)
     tipo = models.CharField(max_length=7, choices=TIPO_CHOICES)
+    # Última escritura, para /api/cambios/ (ver movimientos/cambios.py)
+    modificado = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.nombre} ({self.get_tipo_display()})"
 
     class Meta:
+        indexes = [
+            models.Index(fields=['usuario', 'modificado'], name='categoria_usuario_mod_idx'),
+        ]
         # Unicidad por usuario+tipo+nombre, sin distinguir mayúsculas/minúsculas (requiere PostgreSQL)
         constraints = [
             models.UniqueConstraint(
@@ -33,7 +39,8 @@ class Movimiento(models.Model):
     usuario = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name='movimientos'
+        related_name='movimientos',
+        db_index=False,  # cubierto por los índices compuestos de Meta, que empiezan por usuario
     )
     categoria = models.ForeignKey(
         Categoria,
@@ -44,7 +51,210 @@ class Movimiento(models.Model):
     descripcion = models.CharField(max_length=200, blank=True)
     fecha = models.DateField()
     cantidad = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    # Regla que lo generó (ver movimientos/recurrentes.py); NULL en los introducidos a mano
+    recurrente = models.ForeignKey(
+        'MovimientoRecurrente',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movimientos',
+        db_index=False,  # cubierto por uniq_movimiento_recurrente_fecha
+    )
+    # Última escritura, para /api/cambios/. Las escrituras con update() o
+    # bulk_update() tienen que ponerlo a mano (auto_now solo actúa en save())
+    modificado = models.DateTimeField(auto_now=True)
+    # tsvector en español de la descripción para la búsqueda de texto completo. En
+    # PostgreSQL lo rellena un trigger (migración 0006); en otras BD queda a NULL.
+    descripcion_tsv = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         signo = '+' if self.categoria and self.categoria.tipo == 'ingreso' else '-'
         return f"{signo}{self.cantidad} — {self.descripcion or 'Sin descripción'}"
+
+    class Meta:
+        # Todas las consultas de MovimientoViewSet filtran por usuario y ordenan por (-fecha, -id)
+        indexes = [
+            # Listado por defecto y rangos de fechas; incluye categoria/cantidad para que
+            # resumen y resumen-mensual puedan resolverse solo con el índice (PostgreSQL)
+            models.Index(
+                fields=['usuario', '-fecha', '-id'],
+                include=['categoria', 'cantidad'],
+                name='mov_usuario_fecha_id_idx',
+            ),
+            # Filtro ?categoria= (y ?tipo=, que se resuelve por las categorías del tipo)
+            models.Index(
+                fields=['usuario', 'categoria', '-fecha', '-id'],
+                name='mov_usuario_cat_fecha_id_idx',
+            ),
+            # Cambios desde un token (/api/cambios/)
+            models.Index(fields=['usuario', 'modificado'], name='mov_usuario_modificado_idx'),
+        ]
+        constraints = [
+            # Una ocurrencia por regla y fecha: materializar dos veces no duplica movimientos.
+            # Incluye fecha, así que vale también con la tabla particionada
+            models.UniqueConstraint(fields=['recurrente', 'fecha'], name='uniq_movimiento_recurrente_fecha'),
+        ]
+
+
+class MovimientoRecurrente(models.Model):
+    """
+    Movimiento que se repite (alquiler, nómina, suscripciones): cada
+    `intervalo` semanas, meses o años desde `inicio` hasta `fin` (o sin fin).
+    `manage.py materializar_recurrentes` crea los Movimiento de las
+    ocurrencias ya vencidas; `siguiente` es la primera aún no creada (NULL
+    cuando la regla ha terminado). Ver movimientos/recurrentes.py.
+    """
+    SEMANAL, MENSUAL, ANUAL = 'semanal', 'mensual', 'anual'
+    FRECUENCIA_CHOICES = [
+        (SEMANAL, 'Semanal'),
+        (MENSUAL, 'Mensual'),
+        (ANUAL, 'Anual'),
+    ]
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='recurrentes',
+        db_index=False,  # cubierto por recurrente_usuario_id_idx
+    )
+    categoria = models.ForeignKey(
+        Categoria,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='recurrentes'
+    )
+    descripcion = models.CharField(max_length=200, blank=True)
+    cantidad = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    frecuencia = models.CharField(max_length=7, choices=FRECUENCIA_CHOICES)
+    intervalo = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+    inicio = models.DateField()
+    fin = models.DateField(null=True, blank=True)
+    siguiente = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.cantidad} cada {self.intervalo} ({self.get_frecuencia_display()}) — {self.descripcion or 'Sin descripción'}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', 'id'], name='recurrente_usuario_id_idx'),
+            # Las reglas con ocurrencias pendientes de materializar, por fecha
+            models.Index(
+                fields=['siguiente'], condition=models.Q(siguiente__isnull=False), name='recurrente_siguiente_idx',
+            ),
+        ]
+
+
+class Borrado(models.Model):
+    """
+    Lápida de una categoría o un movimiento borrado: /api/cambios/ la usa para
+    decir a los clientes qué quitar de su copia local. Se guardan
+    MOVIMIENTOS_CAMBIOS_RETENCION días (`manage.py purgar_borrados`).
+    """
+    CATEGORIA, MOVIMIENTO = 'categoria', 'movimiento'
+    MODELO_CHOICES = [
+        (CATEGORIA, 'Categoría'),
+        (MOVIMIENTO, 'Movimiento'),
+    ]
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='borrados',
+        db_index=False,  # cubierto por borrado_usuario_fecha_idx
+    )
+    modelo = models.CharField(max_length=10, choices=MODELO_CHOICES)
+    objeto_id = models.BigIntegerField()
+    borrado = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} ({self.borrado:%Y-%m-%d %H:%M})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', 'borrado'], name='borrado_usuario_fecha_idx'),
+        ]
+
+
+class AgregadoMensual(models.Model):
+    """
+    Totales precalculados por usuario, mes y categoría.
+
+    Se mantiene de forma incremental (ver movimientos/agregados.py) para que
+    resumen y resumen-mensual no tengan que recorrer todo el histórico.
+    El tipo (ingreso/gasto) no se guarda aquí: se obtiene de la categoría,
+    así que cambiar el tipo de una categoría no obliga a recalcular nada.
+    """
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='agregados_mensuales'
+    )
+    categoria = models.ForeignKey(
+        Categoria,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='agregados_mensuales'
+    )
+    mes = models.DateField()  # siempre el día 1 del mes
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    num = models.IntegerField(default=0)  # nº de movimientos agregados
+
+    def __str__(self):
+        return f"{self.usuario_id} {self.mes:%Y-%m} {self.categoria_id}: {self.total} ({self.num})"
+
+    class Meta:
+        # Una fila por usuario+mes+categoría; Coalesce para que "sin categoría" (NULL) también sea única
+        constraints = [
+            models.UniqueConstraint(
+                'usuario', 'mes', Coalesce('categoria', 0),
+                name='uniq_agregado_usuario_mes_categoria'
+            )
+        ]
+
+
+class Tarea(models.Model):
+    """
+    Trabajo pesado encargado desde la API (/api/tareas/) que se ejecuta fuera
+    de la petición, en `manage.py procesar_tareas` (ver movimientos/tareas.py).
+    La propia tabla es la cola: cada trabajador reserva la tarea pendiente más
+    antigua con SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+    PENDIENTE, EN_CURSO, TERMINADA, FALLIDA = 'pendiente', 'en_curso', 'terminada', 'fallida'
+    ESTADO_CHOICES = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (TERMINADA, 'Terminada'),
+        (FALLIDA, 'Fallida'),
+    ]
+    TIPO_CHOICES = [
+        ('informe', 'Informe'),
+        ('recalcular_agregados', 'Recalcular agregados'),
+        ('importar', 'Importar extracto'),
+        ('exportar', 'Exportar movimientos'),
+    ]
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='tareas',
+        db_index=False,  # cubierto por tarea_usuario_id_idx
+    )
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default=PENDIENTE)
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    entrada = models.FileField(upload_to='tareas/entrada/', blank=True)  # fichero a importar
+    salida = models.FileField(upload_to='tareas/salida/', blank=True)  # fichero exportado
+    intentos = models.PositiveSmallIntegerField(default=0)
+    trabajador = models.CharField(max_length=100, blank=True)  # host:pid del último que la tomó
+    creada = models.DateTimeField(auto_now_add=True)
+    iniciada = models.DateTimeField(null=True, blank=True)
+    terminada = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.estado})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', '-id'], name='tarea_usuario_id_idx'),
+            # La cola: solo las pendientes, en orden de llegada
+            models.Index(fields=['id'], condition=models.Q(estado='pendiente'), name='tarea_pendiente_idx'),
+        ]
@@ -1,7 +1,156 @@
 # movimientos/pagination.py
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10                     # tamaño por defecto
     page_size_query_param = 'page_size'  # permite ?page_size=5,20,...
     max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por clave (keyset/cursor): cada página continúa a partir de los
+    valores de ordenación de la última fila vista, en lugar de usar OFFSET.
+    No hace COUNT(*), así que el coste por página no depende de lo lejos que
+    esté la página. El orden del queryset (p. ej. '-fecha', '-id') se completa
+    con 'id' como desempate para que la clave sea única.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.orden = self.get_orden(queryset)
+
+        cursor = self.decode_cursor(request)
+        self.reverso = bool(cursor and cursor['r'])
+        if cursor is not None:
+            queryset = queryset.filter(self.condicion(cursor['v'], self.reverso))
+        queryset = queryset.order_by(*self.campos_orden(invertir=self.reverso))
+
+        filas = list(queryset[:self.page_size + 1])
+        hay_mas = len(filas) > self.page_size
+        filas = filas[:self.page_size]
+        if self.reverso:
+            filas.reverse()
+
+        self.hay_siguiente = hay_mas if not self.reverso else cursor is not None
+        self.hay_anterior = cursor is not None if not self.reverso else hay_mas
+        self.primera = filas[0] if filas else None
+        self.ultima = filas[-1] if filas else None
+        return filas
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    # --- Orden y condición de continuación ---
+
+    def get_orden(self, queryset):
+        """Lista de (campo, descendente) con 'id' al final como desempate."""
+        orden = []
+        for campo in queryset.query.order_by or queryset.model._meta.ordering:
+            if not isinstance(campo, str):
+                raise ImproperlyConfigured('KeysetPagination solo admite ordenaciones por nombre de campo.')
+            descendente = campo.startswith('-')
+            nombre = campo.lstrip('-')
+            orden.append(('id' if nombre == 'pk' else nombre, descendente))
+        if not any(nombre == 'id' for nombre, _ in orden):
+            orden.append(('id', orden[-1][1] if orden else True))
+        return orden
+
+    def campos_orden(self, invertir=False):
+        return [('-' if descendente != invertir else '') + nombre for nombre, descendente in self.orden]
+
+    def condicion(self, valores, reverso):
+        """
+        Filas estrictamente posteriores a `valores` en el orden actual
+        (o anteriores si `reverso`): comparación lexicográfica campo a campo.
+        """
+        condicion = Q()
+        iguales = {}
+        for (nombre, descendente), valor in zip(self.orden, valores):
+            operador = 'lt' if descendente != reverso else 'gt'
+            condicion |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+            iguales[nombre] = valor
+        # Cota sobre el primer campo para que el índice acote el rango recorrido
+        nombre, descendente = self.orden[0]
+        operador = 'lte' if descendente != reverso else 'gte'
+        return Q(**{f'{nombre}__{operador}': valores[0]}) & condicion
+
+    # --- Cursores ---
+
+    def valores_de(self, fila):
+        return [getattr(fila, nombre) for nombre, _ in self.orden]
+
+    def cursor_de(self, fila, reverso):
+        datos = {'o': self.campos_orden(), 'v': self.valores_de(fila), 'r': int(reverso)}
+        texto = json.dumps(datos, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii')
+
+    def encode_cursor(self, fila, reverso):
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, self.cursor_de(fila, reverso))
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+            valido = (
+                datos['o'] == self.campos_orden()
+                and isinstance(datos['v'], list) and len(datos['v']) == len(self.orden)
+            )
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            valido = False
+        if not valido:
+            raise NotFound(self.invalid_cursor_message)
+        return datos
+
+    def get_next_link(self):
+        if not self.hay_siguiente or self.ultima is None:
+            return None
+        return self.encode_cursor(self.ultima, reverso=False)
+
+    def get_previous_link(self):
+        if not self.hay_anterior or self.primera is None:
+            return None
+        return self.encode_cursor(self.primera, reverso=True)
@@ -0,0 +1,267 @@
+# movimientos/particiones.py
+"""
+Particionado de movimientos_movimiento por rango de `fecha` (solo PostgreSQL,
+opcional).
+
+Con MOVIMIENTOS_PARTICIONES = 'anual' o 'mensual' la migración 0007 convierte
+la tabla en una tabla particionada (particionado declarativo) con una
+partición por año o por mes y una partición por defecto para las fechas que
+todavía no tienen la suya. Como todas las consultas de la API acotan por
+fecha, con date_from/date_to PostgreSQL solo recorre las particiones del
+rango (partition pruning) y cada índice es del tamaño de una partición.
+
+Diferencias con la tabla sin particionar:
+
+- La clave primaria es (id, fecha), porque PostgreSQL exige que incluya la
+  clave de particionado. El id sigue saliendo de una sola secuencia y Django
+  lo sigue tratando como clave primaria; buscar un movimiento solo por id
+  consulta el índice de cada partición.
+- Cambiar la fecha de un movimiento a otro periodo lo mueve de partición.
+
+La conversión reescribe la tabla con un bloqueo exclusivo: en una base de
+datos grande hay que hacerla en una ventana de mantenimiento. Las particiones
+futuras y el archivado de las antiguas se gestionan con
+`manage.py particiones_movimientos` (ver el comando).
+"""
+import re
+from datetime import date
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .agregados import Deltas
+from .cache_api import datos_modificados
+
+TABLA = 'movimientos_movimiento'
+BORRADOS = 'movimientos_borrado'  # lápidas de /api/cambios/ (modelo Borrado)
+DEFECTO = f'{TABLA}_pdefecto'
+GRANULARIDADES = ('anual', 'mensual')
+# Periodos futuros que se crean por adelantado si no se indica otra cosa
+ADELANTAR = 3
+
+_LIMITES = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+def granularidad_configurada():
+    granularidad = getattr(settings, 'MOVIMIENTOS_PARTICIONES', None)
+    if granularidad not in (None, *GRANULARIDADES):
+        raise ImproperlyConfigured(
+            f"MOVIMIENTOS_PARTICIONES debe ser None, 'anual' o 'mensual', no '{granularidad}'."
+        )
+    return granularidad
+
+
+def inicio_periodo(fecha, granularidad):
+    return fecha.replace(month=1, day=1) if granularidad == 'anual' else fecha.replace(day=1)
+
+
+def avanzar(inicio, granularidad, n=1):
+    """Inicio del periodo `n` periodos después del que empieza en `inicio`."""
+    meses = inicio.year * 12 + inicio.month - 1 + (12 * n if granularidad == 'anual' else n)
+    return date(meses // 12, meses % 12 + 1, 1)
+
+
+def nombre_particion(inicio, granularidad):
+    return f'{TABLA}_p{inicio:%Y}' if granularidad == 'anual' else f'{TABLA}_p{inicio:%Y_%m}'
+
+
+def esta_particionada(cursor):
+    cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLA])
+    return cursor.fetchone() is not None
+
+
+def particiones(cursor):
+    """[(nombre, desde, hasta)] de las particiones; en la de defecto desde y hasta son None."""
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+    """, [TABLA])
+    resultado = []
+    for nombre, limites in cursor.fetchall():
+        encontrado = _LIMITES.search(limites)
+        desde, hasta = (date.fromisoformat(f) for f in encontrado.groups()) if encontrado else (None, None)
+        resultado.append((nombre, desde, hasta))
+    return resultado
+
+
+def granularidad_actual(cursor):
+    """Granularidad de las particiones existentes (la configurada si solo está la de defecto)."""
+    for _, desde, hasta in particiones(cursor):
+        if desde is not None:
+            return 'anual' if avanzar(desde, 'anual') == hasta else 'mensual'
+    return granularidad_configurada() or 'anual'
+
+
+def _definiciones(cursor):
+    """Índices, restricciones y triggers de la tabla, para volver a crearlos tras reescribirla."""
+    # Los índices de las restricciones UNIQUE se crean con la propia restricción
+    cursor.execute(
+        'SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary '
+        "AND indexrelid NOT IN (SELECT conindid FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'u')",
+        [TABLA, TABLA],
+    )
+    # En una tabla particionada la definición es "ON ONLY tabla": solo el índice del padre
+    sentencias = [fila[0].replace(' ON ONLY ', ' ON ') for fila in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('f', 'c', 'u')",
+        [TABLA],
+    )
+    sentencias += [f'ALTER TABLE {TABLA} ADD CONSTRAINT "{nombre}" {definicion}' for nombre, definicion in cursor.fetchall()]
+    cursor.execute('SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal', [TABLA])
+    sentencias += [fila[0] for fila in cursor.fetchall()]
+    return sentencias
+
+
+def _reescribir(cursor, crear_tabla, clave_primaria, crear_particiones=()):
+    """
+    Sustituye la tabla por la que crea `crear_tabla` con los mismos datos,
+    índices, claves ajenas y triggers. Los índices se crean después de copiar
+    las filas, que es más rápido que mantenerlos fila a fila.
+    """
+    sentencias = _definiciones(cursor)
+    anterior = f'{TABLA}_anterior'
+    cursor.execute(f'ALTER TABLE {TABLA} RENAME TO {anterior}')
+    cursor.execute(crear_tabla.format(tabla=TABLA, anterior=anterior))
+    for sentencia, parametros in crear_particiones:
+        cursor.execute(sentencia, parametros)
+    cursor.execute(f'INSERT INTO {TABLA} SELECT * FROM {anterior}')
+    cursor.execute(f'DROP TABLE {anterior}')
+    cursor.execute(f'ALTER TABLE {TABLA} ADD PRIMARY KEY ({clave_primaria})')
+    for sentencia in sentencias:
+        cursor.execute(sentencia)
+    # La columna identity nueva tiene su propia secuencia: que siga por donde iba la anterior
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLA])
+    secuencia = cursor.fetchone()[0]
+    cursor.execute(f'SELECT setval(%s, COALESCE(MAX(id), 0) + 1, false) FROM {TABLA}', [secuencia])
+    if secuencia.split('.')[-1].strip('"') != f'{TABLA}_id_seq':
+        cursor.execute(f'ALTER SEQUENCE {secuencia} RENAME TO {TABLA}_id_seq')
+    cursor.execute(f'ANALYZE {TABLA}')
+
+
+def particionar(connection, granularidad, adelantar=ADELANTAR):
+    """
+    Convierte la tabla en particionada por `granularidad`, con particiones
+    desde el periodo del movimiento más antiguo hasta `adelantar` periodos
+    después del actual (o del movimiento más reciente, si es posterior).
+    """
+    with connection.cursor() as cursor:
+        if esta_particionada(cursor):
+            return False
+        cursor.execute(f'SELECT MIN(fecha), MAX(fecha) FROM {TABLA}')
+        minima, maxima = cursor.fetchone()
+        hoy = date.today()
+        inicio = inicio_periodo(minima or hoy, granularidad)
+        ultimo = max(avanzar(inicio_periodo(hoy, granularidad), granularidad, adelantar),
+                     inicio_periodo(maxima or hoy, granularidad))
+        crear = [(f'CREATE TABLE {DEFECTO} PARTITION OF {TABLA} DEFAULT', [])]
+        while inicio <= ultimo:
+            siguiente = avanzar(inicio, granularidad)
+            crear.append((
+                f'CREATE TABLE {nombre_particion(inicio, granularidad)} PARTITION OF {TABLA} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [inicio, siguiente],
+            ))
+            inicio = siguiente
+        _reescribir(
+            cursor,
+            'CREATE TABLE {tabla} (LIKE {anterior} INCLUDING DEFAULTS INCLUDING IDENTITY) PARTITION BY RANGE (fecha)',
+            'id, fecha',
+            crear,
+        )
+    return True
+
+
+def desparticionar(connection):
+    """Vuelve a una tabla sin particionar (migración inversa)."""
+    with connection.cursor() as cursor:
+        if not esta_particionada(cursor):
+            return False
+        _reescribir(cursor, 'CREATE TABLE {tabla} (LIKE {anterior} INCLUDING DEFAULTS INCLUDING IDENTITY)', 'id')
+    return True
+
+
+def crear_particiones(connection, adelantar=ADELANTAR):
+    """
+    Crea las particiones que falten desde el periodo actual hasta `adelantar`
+    periodos después, y las de los periodos que tengan filas en la partición
+    por defecto (p. ej. un histórico importado después de particionar); esas
+    filas se pasan a su partición. Devuelve los nombres creados.
+
+    Cada partición se crea como tabla aparte y se engancha con ATTACH
+    PARTITION, que solo bloquea las escrituras de la tabla padre, no las lecturas.
+    """
+    creadas = []
+    with connection.cursor() as cursor:
+        granularidad = granularidad_actual(cursor)
+        existentes = {nombre for nombre, _, _ in particiones(cursor)}
+        actual = inicio_periodo(date.today(), granularidad)
+        inicios = {avanzar(actual, granularidad, n) for n in range(adelantar + 1)}
+        cursor.execute(f'SELECT DISTINCT fecha FROM {DEFECTO}')
+        inicios.update(inicio_periodo(fecha, granularidad) for (fecha,) in cursor.fetchall())
+        for inicio in sorted(inicios):
+            siguiente = avanzar(inicio, granularidad)
+            nombre = nombre_particion(inicio, granularidad)
+            if nombre not in existentes:
+                cursor.execute(f'CREATE TABLE {nombre} (LIKE {TABLA} INCLUDING DEFAULTS)')
+                cursor.execute(
+                    f'WITH movidas AS (DELETE FROM {DEFECTO} WHERE fecha >= %s AND fecha < %s RETURNING *) '
+                    f'INSERT INTO {nombre} SELECT * FROM movidas',
+                    [inicio, siguiente],
+                )
+                cursor.execute(
+                    f'ALTER TABLE {TABLA} ATTACH PARTITION {nombre} FOR VALUES FROM (%s) TO (%s)',
+                    [inicio, siguiente],
+                )
+                creadas.append(nombre)
+    return creadas
+
+
+def archivar(connection, antes, esquema='archivo', borrar=False):
+    """
+    Separa de la tabla las particiones que terminan en `antes` o antes y las
+    pasa al esquema `esquema` (o las borra). Una partición archivada es una
+    tabla normal, sin claves ajenas, que se puede consultar o volcar con
+    pg_dump; sus movimientos dejan de estar en la API (y quedan como
+    borrados en /api/cambios/), se descuentan de los agregados mensuales y
+    se invalidan las respuestas cacheadas de sus usuarios. Hay que llamarla
+    dentro de una transacción. Devuelve los nombres.
+    """
+    archivadas = []
+    deltas = Deltas()
+    usuarios = set()
+    with connection.cursor() as cursor:
+        for nombre, _, hasta in particiones(cursor):
+            if hasta is None or hasta > antes:
+                continue
+            # Se restan antes de separarla: los DELETE de las señales no pasan por aquí
+            cursor.execute(
+                f"SELECT usuario_id, date_trunc('month', fecha)::date, categoria_id, SUM(cantidad), COUNT(*) "
+                f"FROM {nombre} GROUP BY 1, 2, 3"
+            )
+            for usuario_id, mes, categoria_id, total, num in cursor.fetchall():
+                deltas.acumular(usuario_id, mes, categoria_id, -total, -num)
+                usuarios.add(usuario_id)
+            # Sin CONCURRENTLY: no se admite si hay partición por defecto
+            cursor.execute(f'ALTER TABLE {TABLA} DETACH PARTITION {nombre}')
+            cursor.execute(
+                f"INSERT INTO {BORRADOS} (usuario_id, modelo, objeto_id, borrado) "
+                f"SELECT usuario_id, 'movimiento', id, now() FROM {nombre}"
+            )
+            if borrar:
+                cursor.execute(f'DROP TABLE {nombre}')
+            else:
+                cursor.execute(
+                    "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [nombre]
+                )
+                for (restriccion,) in cursor.fetchall():
+                    cursor.execute(f'ALTER TABLE {nombre} DROP CONSTRAINT "{restriccion}"')
+                cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{esquema}"')
+                cursor.execute(f'ALTER TABLE {nombre} SET SCHEMA "{esquema}"')
+            archivadas.append(nombre)
+    deltas.aplicar()
+    for usuario_id in usuarios:
+        datos_modificados(usuario_id)
+    return archivadas
@@ -0,0 +1,194 @@
+# movimientos/recurrentes.py
+"""
+Movimientos recurrentes: ocurrencias de cada MovimientoRecurrente,
+materialización por lotes y proyección del saldo.
+
+Las ocurrencias se calculan siempre desde `inicio` (la n-ésima es inicio
+más n intervalos), así que una regla mensual del día 31 cae el 28 o 29 en
+febrero y vuelve al 31 en marzo.
+
+`materializar` (comando materializar_recurrentes, p. ej. cada día desde
+cron) crea los movimientos vencidos de todos los usuarios por lotes de
+reglas: en cada lote, una consulta para reservar las reglas (FOR UPDATE
+SKIP LOCKED, así que varios procesos no se pisan), un bulk_create de todas
+sus ocurrencias, un bulk_update de `siguiente` y un solo upsert de los
+agregados mensuales. Las ocurrencias que ya tienen movimiento se saltan,
+así que repetirlo no duplica nada; la restricción única (recurrente, fecha)
+de Movimiento lo garantiza: si aun así salta, se deshace el lote entero.
+
+`proyeccion` no guarda nada: recorre las ocurrencias futuras con
+generadores y solo acumula los totales por periodo.
+"""
+import calendar
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from .agregados import Deltas, inicio_mes
+from .cache_api import datos_modificados
+from .comparacion import meses_entre
+from .models import AgregadoMensual, Movimiento, MovimientoRecurrente
+
+MESES = {MovimientoRecurrente.MENSUAL: 1, MovimientoRecurrente.ANUAL: 12}
+
+
+def _sumar_meses(fecha, meses):
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    anio, mes = indice // 12, indice % 12 + 1
+    return fecha.replace(year=anio, month=mes, day=min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+def fecha_ocurrencia(regla, n):
+    """Fecha de la ocurrencia n (la 0 es `inicio`)."""
+    if regla.frecuencia == MovimientoRecurrente.SEMANAL:
+        return regla.inicio + timedelta(weeks=regla.intervalo * n)
+    return _sumar_meses(regla.inicio, MESES[regla.frecuencia] * regla.intervalo * n)
+
+
+def primera_desde(regla, fecha):
+    """Número de la primera ocurrencia en `fecha` o después."""
+    if fecha <= regla.inicio:
+        return 0
+    if regla.frecuencia == MovimientoRecurrente.SEMANAL:
+        n = (fecha - regla.inicio).days // (7 * regla.intervalo)
+    else:
+        n = meses_entre(regla.inicio, fecha) // (MESES[regla.frecuencia] * regla.intervalo)
+    while fecha_ocurrencia(regla, n) < fecha:
+        n += 1
+    return n
+
+
+def ocurrencias(regla, desde, hasta):
+    """Fechas de las ocurrencias en [desde, hasta], sin pasar de `fin`, según se van pidiendo."""
+    if regla.fin is not None:
+        hasta = min(hasta, regla.fin)
+    n = primera_desde(regla, desde)
+    fecha = fecha_ocurrencia(regla, n)
+    while fecha <= hasta:
+        yield fecha
+        n += 1
+        fecha = fecha_ocurrencia(regla, n)
+
+
+def siguiente_tras(regla, fecha):
+    """Primera ocurrencia posterior a `fecha`, o None si ya no hay más."""
+    siguiente = fecha_ocurrencia(regla, primera_desde(regla, fecha + timedelta(days=1)))
+    return None if regla.fin is not None and siguiente > regla.fin else siguiente
+
+
+def programar(regla):
+    """
+    Calcula `siguiente` tras crear o cambiar la regla: la primera ocurrencia
+    posterior al último movimiento que ya generó (o la primera de todas).
+    """
+    ultima = regla.movimientos.order_by('-fecha').values_list('fecha', flat=True).first() if regla.pk else None
+    if ultima is None:
+        regla.siguiente = None if regla.fin is not None and regla.inicio > regla.fin else regla.inicio
+    else:
+        regla.siguiente = siguiente_tras(regla, max(ultima, regla.inicio - timedelta(days=1)))
+
+
+def _materializar_lote(hasta, tam_lote):
+    """Materializa las ocurrencias vencidas de hasta `tam_lote` reglas. Devuelve (reglas, movimientos)."""
+    with transaction.atomic():
+        reglas = list(
+            MovimientoRecurrente.objects.select_for_update(skip_locked=True)
+            .filter(siguiente__lte=hasta)
+            .order_by('siguiente', 'id')[:tam_lote]
+        )
+        if not reglas:
+            return 0, 0
+        # Las que ya existan (p. ej. si se cambió la regla) no se vuelven a crear
+        existentes = set(
+            Movimiento.objects.filter(
+                recurrente__in=reglas, fecha__gte=min(r.siguiente for r in reglas), fecha__lte=hasta,
+            ).values_list('recurrente_id', 'fecha')
+        )
+        deltas = Deltas()
+        nuevos = []
+        for regla in reglas:
+            for fecha in ocurrencias(regla, regla.siguiente, hasta):
+                if (regla.pk, fecha) in existentes:
+                    continue
+                movimiento = Movimiento(
+                    usuario_id=regla.usuario_id, categoria_id=regla.categoria_id, recurrente=regla,
+                    descripcion=regla.descripcion, fecha=fecha, cantidad=regla.cantidad,
+                )
+                deltas.sumar(movimiento)
+                nuevos.append(movimiento)
+            regla.siguiente = siguiente_tras(regla, hasta)
+        # Sin señales: los agregados se actualizan de una vez y la caché por usuario. Sin
+        # ignore_conflicts: las filas omitidas seguirían sumando en los deltas
+        Movimiento.objects.bulk_create(nuevos)
+        MovimientoRecurrente.objects.bulk_update(reglas, ['siguiente'])
+        deltas.aplicar()
+        for usuario_id in {regla.usuario_id for regla in reglas}:
+            datos_modificados(usuario_id)
+    return len(reglas), len(nuevos)
+
+
+def materializar(hasta, tam_lote=1000):
+    """Crea los movimientos de todas las ocurrencias hasta `hasta`. Devuelve {'reglas', 'movimientos'}."""
+    total_reglas = total_movimientos = 0
+    while True:
+        reglas, movimientos = _materializar_lote(hasta, tam_lote)
+        if not reglas:
+            break
+        total_reglas += reglas
+        total_movimientos += movimientos
+    return {'reglas': total_reglas, 'movimientos': total_movimientos}
+
+
+def saldo_actual(usuario):
+    """Ingresos - gastos de todos los movimientos del usuario (de los agregados mensuales si se usan)."""
+    if getattr(settings, 'MOVIMIENTOS_USAR_AGREGADOS', True):
+        qs, campo = AgregadoMensual.objects.filter(usuario=usuario, num__gt=0), 'total'
+    else:
+        qs, campo = Movimiento.objects.filter(usuario=usuario), 'cantidad'
+    totales = dict(qs.values_list('categoria__tipo').annotate(total=Sum(campo)).order_by())
+    return totales.get('ingreso', 0) - totales.get('gasto', 0)
+
+
+def inicio_periodo(fecha, periodo):
+    if periodo == 'mes':
+        return inicio_mes(fecha)
+    if periodo == 'semana':
+        return fecha - timedelta(days=fecha.weekday())
+    return fecha
+
+
+def _importes(regla, hasta):
+    """(fecha, tipo, cantidad) de las ocurrencias pendientes de la regla hasta `hasta`."""
+    tipo = regla.categoria.tipo
+    for fecha in ocurrencias(regla, regla.siguiente, hasta):
+        yield fecha, tipo, regla.cantidad
+
+
+def proyeccion(usuario, hasta, periodo):
+    """
+    Filas {periodo, ingresos, gastos, saldo} (como las de consulta_saldo) con
+    las ocurrencias futuras de las reglas del usuario hasta `hasta`: las que
+    aún no son movimientos, desde `siguiente`. El saldo es el acumulado de la
+    proyección; se le suma el actual al responder.
+    """
+    reglas = (
+        MovimientoRecurrente.objects.filter(usuario=usuario, siguiente__isnull=False, siguiente__lte=hasta)
+        .exclude(categoria=None)
+        .select_related('categoria')
+    )
+    # Un generador por regla mezclados en orden de fecha: nada se guarda por ocurrencia
+    fechas = heapq.merge(*(_importes(regla, hasta) for regla in reglas))
+    filas = []
+    saldo = 0
+    for fecha, tipo, cantidad in fechas:
+        clave = inicio_periodo(fecha, periodo)
+        if not filas or filas[-1]['periodo'] != clave:
+            filas.append({'periodo': clave, 'ingresos': 0, 'gastos': 0, 'saldo': saldo})
+        fila = filas[-1]
+        fila['ingresos' if tipo == 'ingreso' else 'gastos'] += cantidad
+        saldo += cantidad if tipo == 'ingreso' else -cantidad
+        fila['saldo'] = saldo
+    return filas
@@ -0,0 +1,112 @@
+# movimientos/replicas.py
+"""
+Lecturas en réplicas de la base de datos.
+
+MOVIMIENTOS_REPLICAS es la lista de alias de DATABASES que son réplicas de
+lectura de 'default' (vacía por defecto: todo va al primario). RouterReplicas
+(DATABASE_ROUTERS) manda las lecturas hechas dentro de `lecturas_en_replica()`
+a una réplica elegida al azar para todo el bloque, así que las consultas de
+una petición (p. ej. COUNT y página del listado) ven el mismo estado. Todo lo
+demás va a 'default': escrituras, migraciones y cualquier lectura fuera de
+un bloque. Abren ese bloque las acciones GET de CategoriaViewSet y
+MovimientoViewSet (LecturaEnReplicaMixin), las vistas asíncronas y las
+tareas de solo lectura (informe, exportar).
+
+Leer lo que uno acaba de escribir: una réplica va con algo de retraso, así
+que tras una escritura de un usuario (cache_api.datos_modificados, que se
+llama en todas) sus lecturas siguen yendo al primario durante
+MOVIMIENTOS_REPLICAS_VENTANA segundos (5), que debe superar el retraso de
+replicación. La marca se guarda en la caché de Django: con varios procesos
+o servidores tiene que ser compartida (Redis); con una caché de cada proceso
+la siguiente petición llegaría a otro que no la ve. El check
+movimientos.E001 lo exige fuera de DEBUG.
+
+En local se puede simular una réplica con un segundo alias que apunte a la
+misma base de datos (ver README).
+"""
+import random
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+_replica = ContextVar('movimientos_replica', default=None)
+
+
+def replicas():
+    return getattr(settings, 'MOVIMIENTOS_REPLICAS', [])
+
+
+def _clave(usuario_id):
+    return f'movimientos:escritura:{usuario_id}'
+
+
+def marcar_escritura(usuario_id):
+    """El usuario acaba de escribir: durante la ventana sus lecturas van al primario."""
+    if replicas():
+        cache.set(_clave(usuario_id), True, timeout=getattr(settings, 'MOVIMIENTOS_REPLICAS_VENTANA', 5))
+
+
+def escritura_reciente(usuario_id):
+    return cache.get(_clave(usuario_id)) is not None
+
+
+@contextmanager
+def lecturas_en_replica(alias=None):
+    """Las lecturas del bloque van a la réplica `alias` (por defecto, una al azar)."""
+    token = _replica.set(alias or random.choice(replicas()))
+    try:
+        yield _replica.get()
+    finally:
+        _replica.reset(token)
+
+
+def lecturas_para(usuario_id):
+    """lecturas_en_replica() si hay réplicas y el usuario no ha escrito hace poco; si no, no hace nada."""
+    if not replicas() or escritura_reciente(usuario_id):
+        return nullcontext()
+    return lecturas_en_replica()
+
+
+class RouterReplicas:
+    def db_for_read(self, model, **hints):
+        # Explícito también fuera de un bloque: si no, Django leería los objetos
+        # relacionados de un modelo cargado de una réplica en esa réplica
+        return _replica.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas y primario tienen los mismos datos
+        bases = {'default', *replicas()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por la replicación
+        return False if db in replicas() else None
+
+
+class LecturaEnReplicaMixin:
+    """
+    Para ViewSets: las peticiones GET/HEAD leen de una réplica (ver
+    lecturas_para). Se decide en initial(), ya autenticado el usuario; la
+    autenticación en sí lee del primario.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            self._lecturas = lecturas_para(request.user.pk)
+            self._lecturas.__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        lecturas = getattr(self, '_lecturas', None)
+        if lecturas is not None:
+            self._lecturas = None
+            lecturas.__exit__(None, None, None)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,43 +1,68 @@
 from rest_framework import serializers
-from django.db import IntegrityError
-from .models import Categoria, Movimiento
+from rest_framework.reverse import reverse
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date
+from .exportacion import FORMATOS as FORMATOS_EXPORTACION
+from .categorias import DUPLICADA, CategoriasDuplicadas, crear_categorias
+from .instrumentacion import tramo
+from .models import Categoria, Movimiento, MovimientoRecurrente, Tarea
+from .recurrentes import programar
 
-class CategoriaSerializer(serializers.ModelSerializer):
+
+class SerializacionMedida:
+    """Mide el cálculo de .data en el tramo 'serializer' de la instrumentación."""
+
+    @property
+    def data(self):
+        with tramo('serializer'):
+            return super().data
+
+
+class ListaMedida(SerializacionMedida, serializers.ListSerializer):
+    pass
+
+
+class CategoriaListSerializer(ListaMedida):
+    def create(self, validated_data):
+        """Alta de varias categorías con un solo INSERT (ver categorias.crear_categorias)."""
+        filas = [(datos['nombre'], datos['tipo']) for datos in validated_data]
+        try:
+            return crear_categorias(self.context['request'].user, filas)
+        except CategoriasDuplicadas as exc:
+            raise serializers.ValidationError([{'nombre': error} if error else {} for error in exc.errores])
+
+
+class CategoriaSerializer(SerializacionMedida, serializers.ModelSerializer):
     class Meta:
         model = Categoria
+        list_serializer_class = CategoriaListSerializer
         # Incluimos el id, el usuario (clave foránea), nombre y tipo
         fields = ['id', 'usuario', 'nombre', 'tipo']
         read_only_fields = ['usuario']
 
-    def validate(self, attrs):
-        user = self.context['request'].user
-        nombre = attrs.get('nombre') if 'nombre' in attrs else (self.instance and self.instance.nombre)
-        tipo = attrs.get('tipo') if 'tipo' in attrs else (self.instance and self.instance.tipo)
-
-        if nombre and tipo:
-            qs = Categoria.objects.filter(usuario=user, tipo=tipo, nombre__iexact=str(nombre).strip())
-            if self.instance:
-                qs = qs.exclude(pk=self.instance.pk)
-            if qs.exists():
-                raise serializers.ValidationError({'nombre': 'Ya existe una categoría con ese nombre y tipo.'})
-        return attrs
+    # Los duplicados (usuario + tipo + nombre sin distinguir mayúsculas) los
+    # detecta la restricción única al escribir, sin consultar antes: el
+    # savepoint deja usable la transacción de fuera si el INSERT/UPDATE falla
 
     def create(self, validated_data):
         validated_data['usuario'] = self.context['request'].user
         try:
-            return super().create(validated_data)
+            with transaction.atomic():
+                return super().create(validated_data)
         except IntegrityError:
-            raise serializers.ValidationError({'nombre': 'Ya existe una categoría con ese nombre y tipo.'})
+            raise serializers.ValidationError({'nombre': DUPLICADA})
 
     def update(self, instance, validated_data):
         try:
-            return super().update(instance, validated_data)
+            with transaction.atomic():
+                return super().update(instance, validated_data)
         except IntegrityError:
-            raise serializers.ValidationError({'nombre': 'Ya existe una categoría con ese nombre y tipo.'})
+            raise serializers.ValidationError({'nombre': DUPLICADA})
 
-class MovimientoSerializer(serializers.ModelSerializer):
+class MovimientoSerializer(SerializacionMedida, serializers.ModelSerializer):
     class Meta:
         model = Movimiento
+        list_serializer_class = ListaMedida
         fields = ['id', 'usuario', 'categoria', 'descripcion', 'fecha', 'cantidad']
         read_only_fields = ['usuario']
     
@@ -45,3 +70,102 @@ class MovimientoSerializer(serializers.ModelSerializer):
         if value <= 0:
             raise serializers.ValidationError('La cantidad debe ser positiva (mayor que 0).')
         return value
+
+
+class MovimientoLoteSerializer(MovimientoSerializer):
+    """
+    Variante para escrituras en lote: la categoría llega como id sin consultarla
+    fila a fila; MovimientoViewSet.lote comprueba de una vez que todas las del
+    lote pertenecen al usuario.
+    """
+    categoria = serializers.IntegerField(source='categoria_id', allow_null=True, required=False)
+
+    class Meta(MovimientoSerializer.Meta):
+        pass
+
+
+class MovimientoRecurrenteSerializer(serializers.ModelSerializer):
+    """
+    Regla de movimiento recurrente. `siguiente` (la próxima ocurrencia aún
+    sin crear) se calcula al guardarla y cada vez que cambia su calendario.
+    """
+    CALENDARIO = ('frecuencia', 'intervalo', 'inicio', 'fin')
+
+    class Meta:
+        model = MovimientoRecurrente
+        fields = [
+            'id', 'categoria', 'descripcion', 'cantidad', 'frecuencia', 'intervalo', 'inicio', 'fin', 'siguiente',
+        ]
+        read_only_fields = ['siguiente']
+
+    def validate_categoria(self, value):
+        if value is not None and value.usuario_id != self.context['request'].user.pk:
+            raise serializers.ValidationError('La categoría no existe o no pertenece al usuario.')
+        return value
+
+    def validate(self, attrs):
+        inicio = attrs.get('inicio', getattr(self.instance, 'inicio', None))
+        fin = attrs.get('fin', getattr(self.instance, 'fin', None))
+        if fin is not None and inicio is not None and fin < inicio:
+            raise serializers.ValidationError({'fin': 'Debe ser igual o posterior a inicio.'})
+        return attrs
+
+    def create(self, validated_data):
+        regla = MovimientoRecurrente(usuario=self.context['request'].user, **validated_data)
+        programar(regla)
+        regla.save()
+        return regla
+
+    def update(self, instance, validated_data):
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        if any(campo in validated_data for campo in self.CALENDARIO):
+            programar(instance)
+        instance.save()
+        return instance
+
+
+class TareaSerializer(serializers.ModelSerializer):
+    """
+    Alta y consulta de tareas en segundo plano. Al crearla solo se indican
+    tipo y parametros; el resto lo rellena el trabajador que la ejecuta.
+    """
+    # Parámetros admitidos por tipo: los filtros de las acciones equivalentes de MovimientoViewSet
+    PARAMETROS = {
+        'informe': {'categoria', 'tipo', 'date_from', 'date_to'},
+        'exportar': {'categoria', 'tipo', 'date_from', 'date_to', 'search', 'ordering', 'formato'},
+        'recalcular_agregados': {'desde', 'hasta'},
+        'importar': {'formato', 'codificacion', 'categoria', 'opciones'},
+    }
+    FECHAS = {'date_from', 'date_to', 'desde', 'hasta'}
+
+    descarga = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Tarea
+        fields = [
+            'id', 'tipo', 'parametros', 'estado', 'resultado', 'error', 'descarga',
+            'intentos', 'creada', 'iniciada', 'terminada',
+        ]
+        read_only_fields = ['estado', 'resultado', 'error', 'intentos', 'creada', 'iniciada', 'terminada']
+
+    def get_descarga(self, tarea):
+        if not tarea.salida:
+            return None
+        return reverse('tarea-descarga', args=[tarea.pk], request=self.context.get('request'))
+
+    def validate(self, attrs):
+        parametros = attrs.get('parametros') or {}
+        if not isinstance(parametros, dict):
+            raise serializers.ValidationError({'parametros': 'Debe ser un objeto.'})
+        desconocidos = set(parametros) - self.PARAMETROS[attrs['tipo']]
+        if desconocidos:
+            raise serializers.ValidationError(
+                {'parametros': f"Parámetros no admitidos: {', '.join(sorted(desconocidos))}."}
+            )
+        for campo in self.FECHAS & set(parametros):
+            if not isinstance(parametros[campo], str) or parse_date(parametros[campo]) is None:
+                raise serializers.ValidationError({'parametros': f"'{campo}' debe ser una fecha YYYY-MM-DD."})
+        if attrs['tipo'] == 'exportar' and parametros.get('formato', 'csv') not in FORMATOS_EXPORTACION:
+            raise serializers.ValidationError({'parametros': "'formato' debe ser 'csv' o 'ndjson'."})
+        return attrs
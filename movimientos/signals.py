@@ -0,0 +1,142 @@
+# movimientos/signals.py
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .agregados import Deltas, mover_categoria
+from .autenticacion import invalidar_token, invalidar_usuario
+from .cambios import registrar_borrados
+from .cache_api import datos_modificados
+from .instrumentacion import instalar as instrumentar_conexion
+from .models import Categoria, Movimiento, MovimientoRecurrente
+
+
+_estado = threading.local()
+
+
+@contextmanager
+def en_lote():
+    """
+    Desactiva el mantenimiento fila a fila que hacen estas señales. Quien lo
+    use (escrituras masivas) debe actualizar los agregados por su cuenta,
+    p. ej. acumulando con agregados.Deltas y aplicando al final, y llamar a
+    cache_api.datos_modificados.
+    """
+    anterior = getattr(_estado, 'lote', False)
+    _estado.lote = True
+    try:
+        yield
+    finally:
+        _estado.lote = anterior
+
+
+def _en_lote():
+    return getattr(_estado, 'lote', False)
+
+
+def _borrado_de_usuario(origin):
+    # Al borrar un usuario, sus agregados caen en cascada: no hay nada que mantener
+    return isinstance(origin, get_user_model())
+
+
+@receiver(pre_save, sender=Movimiento)
+def guardar_estado_previo(sender, instance, raw=False, **kwargs):
+    """
+    Antes de un UPDATE, recuerda los valores en BD para poder restarlos
+    de los agregados en post_save.
+    """
+    instance._previo = None
+    if raw or _en_lote() or instance._state.adding or instance.pk is None:
+        return
+    instance._previo = Movimiento.objects.filter(pk=instance.pk).only(
+        'usuario', 'categoria', 'fecha', 'cantidad'
+    ).first()
+
+
+@receiver(post_save, sender=Movimiento)
+def actualizar_agregados_al_guardar(sender, instance, created, raw=False, **kwargs):
+    if raw or _en_lote():
+        return
+    deltas = Deltas()
+    previo = getattr(instance, '_previo', None)
+    if previo is not None:
+        deltas.restar(previo)
+    deltas.sumar(instance)
+    deltas.aplicar()
+    instance._previo = None
+
+
+@receiver(post_delete, sender=Movimiento)
+def actualizar_agregados_al_borrar(sender, instance, origin=None, **kwargs):
+    if _en_lote() or _borrado_de_usuario(origin):
+        return
+    deltas = Deltas()
+    deltas.restar(instance)
+    deltas.aplicar()
+
+
+@receiver(pre_delete, sender=Categoria)
+def traspasar_agregados_de_categoria(sender, instance, origin=None, **kwargs):
+    """
+    Al borrar una categoría sus movimientos quedan sin categoría (SET_NULL),
+    así que sus agregados pasan al grupo "sin categoría".
+    """
+    if _en_lote() or _borrado_de_usuario(origin):
+        return
+    mover_categoria(instance.pk, None)
+
+
+@receiver(pre_delete, sender=Categoria)
+def marcar_movimientos_de_categoria(sender, instance, origin=None, **kwargs):
+    """Sus movimientos se quedan sin categoría con un UPDATE sin auto_now: cuentan como cambiados."""
+    if _en_lote() or _borrado_de_usuario(origin):
+        return
+    Movimiento.objects.filter(usuario_id=instance.usuario_id, categoria=instance).update(modificado=timezone.now())
+
+
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Movimiento)
+def registrar_borrado(sender, instance, origin=None, **kwargs):
+    """Lápida para /api/cambios/ (en lote, la deja quien borra con cambios.registrar_borrados)."""
+    if not _en_lote() and not _borrado_de_usuario(origin):
+        registrar_borrados(sender, instance.usuario_id, [instance.pk])
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Movimiento)
+@receiver(post_save, sender=MovimientoRecurrente)
+def invalidar_cache_al_guardar(sender, instance, raw=False, **kwargs):
+    if not raw and not _en_lote():
+        datos_modificados(instance.usuario_id)
+
+
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Movimiento)
+@receiver(post_delete, sender=MovimientoRecurrente)
+def invalidar_cache_al_borrar(sender, instance, origin=None, **kwargs):
+    if not _en_lote() and not _borrado_de_usuario(origin):
+        datos_modificados(instance.usuario_id)
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_token_borrado(sender, instance, **kwargs):
+    invalidar_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidar_tokens_de_usuario(sender, instance, raw=False, **kwargs):
+    """Desactivación, cambio de contraseña, etc.: se vuelve a validar en BD."""
+    if not raw:
+        invalidar_usuario(instance.pk)
+
+
+@receiver(connection_created)
+def instrumentar(sender, connection, **kwargs):
+    # execute_wrapper de la instrumentación por petición (movimientos/instrumentacion.py)
+    instrumentar_conexion(connection)
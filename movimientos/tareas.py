@@ -0,0 +1,193 @@
+# movimientos/tareas.py
+"""
+Tareas en segundo plano con la propia base de datos como cola.
+
+La API (/api/tareas/) guarda una Tarea pendiente y responde enseguida con
+202; el trabajo lo hacen los procesos de `manage.py procesar_tareas`. Cada
+proceso reserva la tarea pendiente más antigua con SELECT ... FOR UPDATE
+SKIP LOCKED (las filas bloqueadas por otro proceso se saltan, así que los
+trabajadores ni se pisan ni se esperan), la marca en curso en esa misma
+transacción corta y la ejecuta fuera de ella. Si un proceso muere a medias,
+la tarea queda en curso hasta que `recuperar_abandonadas` la devuelve a la
+cola, o la da por fallida tras MAX_INTENTOS.
+
+Cada tipo de Tarea.TIPO_CHOICES es una función registrada con @tipo_tarea
+que recibe la tarea y devuelve su resultado, que se guarda como JSON con la
+misma representación que las respuestas de la API.
+"""
+import io
+import json
+import logging
+import os
+import socket
+import tempfile
+
+from django.core.files import File
+from django.db import transaction
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import exportacion, importacion
+from .agregados import recalcular
+from .cache_api import datos_modificados
+from .models import Tarea
+from .replicas import lecturas_para
+from .views import MovimientoViewSet, datos_resumen, serie_mensual, serie_saldo
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 3
+TIPOS = {}
+
+
+class ErrorTarea(Exception):
+    """Error esperado (p. ej. un fichero mal formado): su mensaje se guarda en Tarea.error."""
+
+
+def tipo_tarea(nombre):
+    def registrar(funcion):
+        TIPOS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def encolar(usuario, tipo, parametros=None, entrada=None):
+    """Crea una tarea pendiente; `entrada` es el fichero subido, si la tarea lo necesita."""
+    tarea = Tarea(usuario=usuario, tipo=tipo, parametros=parametros or {})
+    if entrada is not None:
+        tarea.entrada.save(entrada.name, entrada, save=False)
+    tarea.save()
+    return tarea
+
+
+def tomar():
+    """Reserva la tarea pendiente más antigua y la marca en curso; None si no hay ninguna libre."""
+    with transaction.atomic():
+        tarea = (
+            Tarea.objects.select_for_update(skip_locked=True)
+            .filter(estado=Tarea.PENDIENTE)
+            .order_by('id')
+            .first()
+        )
+        if tarea is None:
+            return None
+        tarea.estado = Tarea.EN_CURSO
+        tarea.iniciada = timezone.now()
+        tarea.intentos += 1
+        tarea.trabajador = f'{socket.gethostname()}:{os.getpid()}'
+        tarea.save(update_fields=['estado', 'iniciada', 'intentos', 'trabajador'])
+    return tarea
+
+
+def ejecutar(tarea):
+    """Ejecuta una tarea reservada con tomar() y guarda cómo ha terminado."""
+    try:
+        # Ida y vuelta por el codificador de DRF: importes y fechas como en la API
+        resultado = json.loads(json.dumps(TIPOS[tarea.tipo](tarea), cls=JSONEncoder))
+    except ErrorTarea as exc:
+        tarea.estado, tarea.error = Tarea.FALLIDA, str(exc)
+    except Exception:
+        logger.exception('La tarea %s (%s) ha fallado', tarea.pk, tarea.tipo)
+        tarea.estado, tarea.error = Tarea.FALLIDA, 'Error interno al ejecutar la tarea.'
+    else:
+        tarea.estado, tarea.resultado = Tarea.TERMINADA, resultado
+    tarea.terminada = timezone.now()
+    tarea.save(update_fields=['estado', 'resultado', 'error', 'entrada', 'salida', 'terminada'])
+    return tarea
+
+
+def procesar(maximo=None):
+    """Ejecuta tareas pendientes hasta vaciar la cola (o hasta `maximo`). Devuelve cuántas."""
+    n = 0
+    while maximo is None or n < maximo:
+        tarea = tomar()
+        if tarea is None:
+            break
+        ejecutar(tarea)
+        n += 1
+    return n
+
+
+def recuperar_abandonadas(tiempo_maximo):
+    """
+    Las tareas en curso desde hace más de `tiempo_maximo` (timedelta) son de un
+    trabajador que ha muerto: vuelven a la cola o, si ya se han intentado
+    MAX_INTENTOS veces, se dan por fallidas. Devuelve (reintentadas, fallidas).
+    """
+    ahora = timezone.now()
+    abandonadas = Tarea.objects.filter(estado=Tarea.EN_CURSO, iniciada__lt=ahora - tiempo_maximo)
+    fallidas = abandonadas.filter(intentos__gte=MAX_INTENTOS).update(
+        estado=Tarea.FALLIDA, error='El trabajador que la ejecutaba no terminó.', terminada=ahora,
+    )
+    return abandonadas.update(estado=Tarea.PENDIENTE), fallidas
+
+
+def _vista(tarea, accion):
+    """MovimientoViewSet con los parámetros de la tarea como query params, como en una petición."""
+    peticion = HttpRequest()
+    peticion.GET = QueryDict(mutable=True)
+    for clave, valor in tarea.parametros.items():
+        peticion.GET[clave] = str(valor)
+    request = Request(peticion)
+    request.user = tarea.usuario
+    return MovimientoViewSet(request=request, action=accion, format_kwarg=None, args=(), kwargs={})
+
+
+@tipo_tarea('informe')
+def informe(tarea):
+    """resumen, resumen-mensual y saldo mensual con los mismos filtros, p. ej. de varios años."""
+    vista = _vista(tarea, 'resumen')
+    with lecturas_para(tarea.usuario_id):
+        return {
+            **datos_resumen(list(vista.consulta_resumen())),
+            'series': serie_mensual(vista.consulta_resumen_mensual()),
+            'saldo': serie_saldo(vista.consulta_saldo('mes'), 'mes', 0),
+        }
+
+
+@tipo_tarea('recalcular_agregados')
+def recalcular_agregados(tarea):
+    n = recalcular(tarea.usuario_id, tarea.parametros.get('desde'), tarea.parametros.get('hasta'))
+    datos_modificados(tarea.usuario_id)
+    return {'agregados': n}
+
+
+@tipo_tarea('importar')
+def importar(tarea):
+    """Como /api/movimientos/importar/, leyendo el fichero guardado en la tarea."""
+    parametros = tarea.parametros
+    try:
+        with tarea.entrada.open('rb') as fichero:
+            texto = io.TextIOWrapper(fichero, encoding=parametros.get('codificacion') or 'utf-8-sig', newline='')
+            return importacion.importar(
+                tarea.usuario,
+                importacion.leer(texto, parametros['formato'], **parametros.get('opciones', {})),
+                categoria_por_defecto=parametros.get('categoria') or 'Importados',
+            )
+    except LookupError:
+        raise ErrorTarea('Codificación desconocida.')
+    except UnicodeDecodeError:
+        raise ErrorTarea('El fichero no está en la codificación indicada.')
+    except importacion.ErrorImportacion as exc:
+        raise ErrorTarea(str(exc))
+    finally:
+        tarea.entrada.delete(save=False)
+
+
+@tipo_tarea('exportar')
+def exportar(tarea):
+    """Como /api/movimientos/exportar/, escribiendo el fichero en la tarea para descargarlo después."""
+    formato = tarea.parametros.get('formato', 'csv')
+    _, extension = exportacion.FORMATOS[formato]
+    vista = _vista(tarea, 'exportar')
+    with tempfile.TemporaryFile() as temporal, lecturas_para(tarea.usuario_id):
+        contenido = exportacion.generar(
+            vista.filter_queryset(vista.get_queryset()), formato, chunk_size=vista.exportar_chunk_size
+        )
+        for trozo in contenido:
+            temporal.write(trozo.encode('utf-8'))
+        temporal.seek(0)
+        tarea.salida.save(f'movimientos-{tarea.pk}.{extension}', File(temporal), save=False)
+    return {'formato': formato, 'bytes': tarea.salida.size}
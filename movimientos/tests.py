@@ -1,10 +1,44 @@
 # movimientos/tests.py
-from django.test import TestCase
+import csv
+import json
+import os
+import runpy
+import shutil
+import tempfile
+import threading
+import warnings
+from unittest import mock, skipUnless
+
+from django.contrib.postgres.search import SearchQuery
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.utils import load_backend
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from rest_framework.authtoken.models import Token
-from .models import Categoria, Movimiento
+from .agregados import recalcular, verificar
+from .autenticacion import cache_local
+from .busqueda import CONFIGURACION
+from .categorias import CATEGORIAS_INICIALES
+from .columnas import msgpack
+from .generador import CATALOGO
+from .importacion import ErrorImportacion, importar as importar_movimientos, leer_csv, leer_ofx
+from .instrumentacion import medir
+from .models import AgregadoMensual, Borrado, Categoria, Movimiento, MovimientoRecurrente, Tarea
+from . import tareas
+from . import cambios, checks, particiones, recurrentes, replicas
+from .serializers import MovimientoSerializer
 from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
 class MovimientosApiTests(TestCase):
     def setUp(self):
@@ -73,3 +107,1994 @@ class MovimientosApiTests(TestCase):
         self.assertEqual(mayo['ingresos'], 2000.0)
         self.assertEqual(mayo['gastos'], 500.0)
         self.assertEqual(mayo['balance'], 1500.0)
+
+
+class AgregadosMensualesTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='agregados', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.cat_ing = Categoria.objects.create(usuario=self.u, nombre='Salario', tipo='ingreso')
+        self.cat_gas = Categoria.objects.create(usuario=self.u, nombre='Alquiler', tipo='gasto')
+
+        self.m1 = Movimiento.objects.create(usuario=self.u, categoria=self.cat_ing,
+                                            descripcion='Nómina', fecha=date(2025,5,1), cantidad='2000.00')
+        self.m2 = Movimiento.objects.create(usuario=self.u, categoria=self.cat_gas,
+                                            descripcion='Piso', fecha=date(2025,5,3), cantidad='500.00')
+        self.m3 = Movimiento.objects.create(usuario=self.u, categoria=self.cat_gas,
+                                            descripcion='Piso', fecha=date(2025,6,3), cantidad='500.00')
+
+    def test_se_mantienen_al_crear_editar_y_borrar(self):
+        self.assertEqual(verificar(self.u.id), [])
+
+        self.m2.cantidad = Decimal('650.00')
+        self.m2.fecha = date(2025, 7, 1)
+        self.m2.save()
+        self.assertEqual(verificar(self.u.id), [])
+
+        self.m3.categoria = self.cat_ing
+        self.m3.save()
+        self.assertEqual(verificar(self.u.id), [])
+
+        self.m1.delete()
+        self.assertEqual(verificar(self.u.id), [])
+        self.assertFalse(AgregadoMensual.objects.filter(mes=date(2025, 5, 1), num__gt=0).exists())
+
+    def test_borrar_categoria_pasa_a_sin_categoria(self):
+        self.cat_ing.delete()
+        self.assertEqual(verificar(self.u.id), [])
+        fila = AgregadoMensual.objects.get(usuario=self.u, mes=date(2025, 5, 1), categoria=None)
+        self.assertEqual(fila.total, Decimal('2000.00'))
+
+    def test_cambio_de_tipo_de_categoria(self):
+        params = {'date_from': '2025-05-01', 'date_to': '2025-06-30'}
+        self.cat_gas.tipo = 'ingreso'
+        self.cat_gas.save()
+        j = self.c.get('/api/movimientos/resumen/', params).json()
+        self.assertEqual(float(j['total_ingresos']), 3000.0)
+        self.assertEqual(float(j['total_gastos']), 0.0)
+
+    def test_resumenes_iguales_con_y_sin_agregados(self):
+        casos = [
+            {},
+            {'date_from': '2025-05-01', 'date_to': '2025-05-31'},
+            {'date_from': '2025-05-02'},
+            {'tipo': 'gasto'},
+            {'categoria': self.cat_gas.id, 'date_to': '2025-06-30'},
+        ]
+        for params in casos:
+            for url in ('/api/movimientos/resumen/', '/api/movimientos/resumen-mensual/'):
+                con = self.c.get(url, params).json()
+                with self.settings(MOVIMIENTOS_USAR_AGREGADOS=False):
+                    sin = self.c.get(url, params).json()
+                self.assertEqual(con, sin, f'{url} {params}')
+
+    def test_comando_verificar_y_reconstruir(self):
+        call_command('recalcular_agregados', '--verificar', stdout=StringIO())
+
+        AgregadoMensual.objects.filter(usuario=self.u, mes=date(2025, 6, 1)).update(total=Decimal('1.00'))
+        with self.assertRaises(CommandError):
+            call_command('recalcular_agregados', '--verificar', stdout=StringIO())
+
+        call_command('recalcular_agregados', '--usuario', 'agregados', stdout=StringIO())
+        self.assertEqual(verificar(self.u.id), [])
+
+
+class PaginacionCursorTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='cursor', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.cat_ing = Categoria.objects.create(usuario=self.u, nombre='Salario', tipo='ingreso')
+        self.cat_gas = Categoria.objects.create(usuario=self.u, nombre='Compras', tipo='gasto')
+        # Varias filas por día para que el desempate por id sea necesario
+        for i in range(23):
+            Movimiento.objects.create(
+                usuario=self.u, categoria=self.cat_gas if i % 3 else self.cat_ing,
+                descripcion=f'mov {i}', fecha=date(2025, 1, 1) + timedelta(days=i // 4),
+                cantidad=Decimal(10 + i % 5),
+            )
+
+    def recorrer(self, params):
+        ids = []
+        r = self.c.get('/api/movimientos/', {**params, 'paginacion': 'cursor', 'page_size': 5})
+        while True:
+            self.assertEqual(r.status_code, 200)
+            j = r.json()
+            self.assertNotIn('count', j)
+            ids += [m['id'] for m in j['results']]
+            if not j['next']:
+                return ids
+            r = self.c.get(j['next'])
+
+    def test_recorre_todo_en_el_orden_por_defecto(self):
+        esperado = list(Movimiento.objects.filter(usuario=self.u).order_by('-fecha', '-id').values_list('id', flat=True))
+        self.assertEqual(self.recorrer({}), esperado)
+
+    def test_otras_ordenaciones_y_filtros(self):
+        casos = [
+            ({'ordering': 'cantidad'}, Movimiento.objects.order_by('cantidad', 'id')),
+            ({'ordering': '-cantidad,fecha'}, Movimiento.objects.order_by('-cantidad', 'fecha', 'id')),
+            ({'tipo': 'gasto', 'date_from': '2025-01-03'},
+             Movimiento.objects.filter(categoria__tipo='gasto', fecha__gte='2025-01-03').order_by('-fecha', '-id')),
+        ]
+        for params, qs in casos:
+            self.assertEqual(self.recorrer(params), list(qs.values_list('id', flat=True)), params)
+
+        # La búsqueda (con o sin orden por relevancia) da lo mismo que la paginación numerada
+        for params in ({'search': '1'}, {'search': '1', 'ordering': '-fecha,-id'}):
+            numerada = self.c.get('/api/movimientos/', {**params, 'page_size': 100}).json()['results']
+            self.assertTrue(numerada)
+            self.assertEqual(self.recorrer(params), [m['id'] for m in numerada], params)
+
+    def test_enlace_anterior(self):
+        p1 = self.c.get('/api/movimientos/', {'paginacion': 'cursor', 'page_size': 5}).json()
+        self.assertIsNone(p1['previous'])
+        p2 = self.c.get(p1['next']).json()
+        vuelta = self.c.get(p2['previous']).json()
+        self.assertEqual([m['id'] for m in vuelta['results']], [m['id'] for m in p1['results']])
+        self.assertIsNone(vuelta['previous'])
+
+    def test_cursor_invalido(self):
+        r = self.c.get('/api/movimientos/', {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(r.status_code, 404)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Los planes de consulta solo se comprueban en PostgreSQL')
+class PlanesConsultaTests(TestCase):
+    """
+    Siembra un volumen de datos realista y comprueba con EXPLAIN que ninguna
+    consulta de los endpoints principales recorre secuencialmente las tablas
+    de movimientos o agregados.
+    """
+    TABLAS = ('movimientos_movimiento', 'movimientos_agregadomensual')
+    USUARIOS = 40
+    POR_USUARIO = 1500
+
+    @classmethod
+    def setUpTestData(cls):
+        movimientos = []
+        usuarios = User.objects.bulk_create([User(username=f'plan{n}') for n in range(cls.USUARIOS)])
+        for u in usuarios:
+            cats = Categoria.objects.bulk_create([
+                Categoria(usuario=u, nombre=f'Cat {i}', tipo='ingreso' if i < 2 else 'gasto') for i in range(6)
+            ])
+            for i in range(cls.POR_USUARIO):
+                movimientos.append(Movimiento(
+                    usuario=u, categoria=cats[i % 6], descripcion=f'mov {i}',
+                    fecha=date(2020, 1, 1) + timedelta(days=(i * 7) % 2000), cantidad=Decimal(1 + i % 300),
+                ))
+        Movimiento.objects.bulk_create(movimientos, batch_size=5000)
+        recalcular()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.u = u
+        cls.cat = cats[3]
+
+    def setUp(self):
+        cache.clear()  # las respuestas cacheadas no llegarían a consultar la BD
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def nodos(self, plan):
+        yield plan
+        for hijo in plan.get('Plans', []):
+            yield from self.nodos(hijo)
+
+    def comprobar_sin_seq_scan(self, url, params):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.c.get(url, params)
+        self.assertEqual(r.status_code, 200)
+        consultas = [q['sql'] for q in ctx.captured_queries if any(t in q['sql'] for t in self.TABLAS)]
+        self.assertTrue(consultas, f'{url} {params}: no se ha consultado ninguna tabla de movimientos')
+        for sql in consultas:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            for nodo in self.nodos(plan[0]['Plan']):
+                self.assertFalse(
+                    nodo['Node Type'] == 'Seq Scan' and nodo.get('Relation Name') in self.TABLAS,
+                    f'{url} {params}: Seq Scan sobre {nodo.get("Relation Name")}\n{sql}',
+                )
+
+    def test_listado(self):
+        casos = [
+            {},
+            {'page': 50},
+            {'paginacion': 'cursor'},
+            {'categoria': self.cat.id},
+            {'tipo': 'ingreso'},
+            {'date_from': '2023-01-01', 'date_to': '2023-03-31'},
+        ]
+        for params in casos:
+            self.comprobar_sin_seq_scan('/api/movimientos/', params)
+
+    def test_resumenes(self):
+        casos = [
+            {},
+            {'date_from': '2023-01-01', 'date_to': '2023-12-31'},  # agregados mensuales
+            {'date_from': '2023-01-15', 'date_to': '2023-06-10'},  # movimientos
+            {'date_from': '2023-01-15', 'tipo': 'gasto'},
+            {'date_from': '2023-01-15', 'categoria': self.cat.id},
+        ]
+        for url in ('/api/movimientos/resumen/', '/api/movimientos/resumen-mensual/'):
+            for params in casos:
+                self.comprobar_sin_seq_scan(url, params)
+
+
+class ResumenConsultasTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='consultas', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        cat_ing = Categoria.objects.create(usuario=self.u, nombre='Salario', tipo='ingreso')
+        cat_gas = Categoria.objects.create(usuario=self.u, nombre='Alquiler', tipo='gasto')
+        cat_ocio = Categoria.objects.create(usuario=self.u, nombre='Ocio', tipo='gasto')
+        for cat, cantidad in [(cat_ing, '2000.00'), (cat_gas, '500.00'), (cat_ocio, '80.50'), (None, '10.00')]:
+            Movimiento.objects.create(usuario=self.u, categoria=cat, descripcion='x',
+                                      fecha=date(2025, 5, 10), cantidad=cantidad)
+
+    def consultas_a_movimientos(self, url, params):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.c.get(url, params)
+        self.assertEqual(r.status_code, 200)
+        return r.json(), [q for q in ctx.captured_queries if 'movimientos_' in q['sql']]
+
+    def test_resumen_en_una_consulta(self):
+        # Rango de meses completos (agregados) y rango arbitrario (movimientos)
+        for params in ({'date_from': '2025-05-01', 'date_to': '2025-05-31'}, {'date_from': '2025-05-02'}):
+            j, consultas = self.consultas_a_movimientos('/api/movimientos/resumen/', params)
+            self.assertEqual(len(consultas), 1, params)
+            self.assertEqual(float(j['total_ingresos']), 2000.0)
+            self.assertEqual(float(j['total_gastos']), 580.5)
+            self.assertEqual(float(j['balance']), 1419.5)
+            self.assertEqual([c['categoria__nombre'] for c in j['por_categoria']],
+                             ['Salario', 'Alquiler', 'Ocio', None])
+
+    def test_resumen_sin_movimientos(self):
+        j, consultas = self.consultas_a_movimientos('/api/movimientos/resumen/', {'date_from': '2030-01-01'})
+        self.assertEqual(len(consultas), 1)
+        self.assertEqual(j, {'total_ingresos': 0, 'total_gastos': 0, 'balance': 0, 'por_categoria': []})
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='dashboard', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        cat_ing = Categoria.objects.create(usuario=self.u, nombre='Salario', tipo='ingreso')
+        cat_gas = Categoria.objects.create(usuario=self.u, nombre='Alquiler', tipo='gasto')
+        for mes in (4, 5, 6):
+            Movimiento.objects.create(usuario=self.u, categoria=cat_ing, descripcion='Nómina',
+                                      fecha=date(2025, mes, 1), cantidad='2000.00')
+            Movimiento.objects.create(usuario=self.u, categoria=cat_gas, descripcion='Piso',
+                                      fecha=date(2025, mes, 5), cantidad=Decimal(500 + mes))
+        Movimiento.objects.create(usuario=self.u, categoria=None, descripcion='Suelto',
+                                  fecha=date(2025, 7, 9), cantidad='3.00')
+
+    def test_igual_que_resumen_y_resumen_mensual(self):
+        for params in ({}, {'date_from': '2025-05-01', 'date_to': '2025-06-30'},
+                       {'date_from': '2025-04-03'}, {'tipo': 'gasto'}):
+            with CaptureQueriesContext(connection) as ctx:
+                d = self.c.get('/api/movimientos/dashboard/', params).json()
+            self.assertEqual(len([q for q in ctx.captured_queries if 'movimientos_' in q['sql']]), 1)
+
+            r = self.c.get('/api/movimientos/resumen/', params).json()
+            m = self.c.get('/api/movimientos/resumen-mensual/', params).json()
+            self.assertEqual(d['series'], m['series'], params)
+            for clave in ('total_ingresos', 'total_gastos', 'balance'):
+                self.assertEqual(d[clave], r[clave], params)
+            self.assertEqual(
+                sorted(d['por_categoria'], key=str), sorted(r['por_categoria'], key=str), params
+            )
+            self.assertNotIn('movimientos', d)
+
+    def test_incluir_movimientos_y_busqueda(self):
+        d = self.c.get('/api/movimientos/dashboard/', {
+            'incluir_movimientos': 1, 'search': 'piso', 'page_size': 2,
+        }).json()
+        self.assertEqual(d['movimientos']['count'], 3)
+        self.assertEqual(len(d['movimientos']['results']), 2)
+        self.assertEqual(float(d['total_gastos']), 1515.0)
+        self.assertEqual(d['total_ingresos'], 0)
+
+
+class LoteMovimientosTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='lote', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.cat_ing = Categoria.objects.create(usuario=self.u, nombre='Salario', tipo='ingreso')
+        self.cat_gas = Categoria.objects.create(usuario=self.u, nombre='Compras', tipo='gasto')
+        self.m1 = Movimiento.objects.create(usuario=self.u, categoria=self.cat_gas, descripcion='a',
+                                            fecha=date(2025, 3, 3), cantidad='10.00')
+        self.m2 = Movimiento.objects.create(usuario=self.u, categoria=self.cat_gas, descripcion='b',
+                                            fecha=date(2025, 3, 4), cantidad='20.00')
+
+        otro = User.objects.create_user(username='otro', password='pass123456')
+        self.cat_ajena = Categoria.objects.create(usuario=otro, nombre='Ajena', tipo='gasto')
+        self.mov_ajeno = Movimiento.objects.create(usuario=otro, categoria=self.cat_ajena,
+                                                   fecha=date(2025, 3, 4), cantidad='1.00')
+
+    def test_crear_actualizar_y_eliminar(self):
+        ops = [
+            {'accion': 'crear', 'categoria': self.cat_ing.id, 'fecha': '2025-04-01', 'cantidad': '1500.00'},
+            {'categoria': self.cat_gas.id, 'fecha': '2025-04-02', 'cantidad': '30.00', 'descripcion': 'c'},
+            {'accion': 'actualizar', 'id': self.m1.id, 'cantidad': '12.50', 'fecha': '2025-05-01'},
+            {'accion': 'eliminar', 'id': self.m2.id},
+        ]
+        r = self.c.post('/api/movimientos/lote/', ops, format='json')
+        self.assertEqual(r.status_code, 200, r.content)
+        j = r.json()
+        self.assertEqual(len(j['creados']), 2)
+        self.assertEqual(j['actualizados'], [self.m1.id])
+        self.assertEqual(j['eliminados'], [self.m2.id])
+
+        self.m1.refresh_from_db()
+        self.assertEqual(self.m1.cantidad, Decimal('12.50'))
+        self.assertFalse(Movimiento.objects.filter(pk=self.m2.pk).exists())
+        self.assertEqual(Movimiento.objects.filter(usuario=self.u).count(), 3)
+        self.assertEqual(verificar(self.u.id), [])
+
+    def test_errores_por_fila_sin_escribir_nada(self):
+        ops = [
+            {'categoria': self.cat_ing.id, 'fecha': '2025-04-01', 'cantidad': '1.00'},
+            {'categoria': self.cat_ajena.id, 'fecha': '2025-04-01', 'cantidad': '1.00'},
+            {'categoria': self.cat_ing.id, 'fecha': 'ayer', 'cantidad': '-3'},
+            {'accion': 'actualizar', 'id': self.mov_ajeno.id, 'cantidad': '2.00'},
+            {'accion': 'eliminar', 'id': self.m1.id},
+            {'accion': 'actualizar', 'id': self.m1.id, 'cantidad': '2.00'},
+            {'accion': 'mover'},
+        ]
+        r = self.c.post('/api/movimientos/lote/', ops, format='json')
+        self.assertEqual(r.status_code, 400)
+        errores = {e['indice']: e['errores'] for e in r.json()['errores']}
+        self.assertEqual(sorted(errores), [1, 2, 3, 5, 6])
+        self.assertIn('categoria', errores[1])
+        self.assertEqual(set(errores[2]), {'fecha', 'cantidad'})
+        self.assertIn('id', errores[3])
+        self.assertEqual(Movimiento.objects.filter(usuario=self.u).count(), 2)
+
+    def test_consultas_constantes(self):
+        def consultas(n):
+            ops = [{'categoria': self.cat_gas.id, 'fecha': '2025-06-01', 'cantidad': '1.00'} for _ in range(n)]
+            with CaptureQueriesContext(connection) as ctx:
+                r = self.c.post('/api/movimientos/lote/', ops, format='json')
+            self.assertEqual(r.status_code, 200)
+            return len([q for q in ctx.captured_queries if 'movimientos_movimiento' in q['sql']])
+
+        # SQLite parte el INSERT de bulk_create por su límite de parámetros: un lote grande que quepa en uno
+        campos = [f for f in Movimiento._meta.concrete_fields if not f.primary_key]
+        grande = connection.ops.bulk_batch_size(campos, [None] * 500)
+        self.assertEqual(consultas(5), consultas(grande))
+
+
+class ImportacionTests(TestCase):
+    CSV = (
+        'Fecha;Concepto;Importe;Categoría\n'
+        '01/03/2025;Nómina marzo;2.150,00;salario\n'
+        '03/03/2025;Mercadona;-54,30;Supermercado\n'
+        '04/03/2025;Lidl;-1.020,75;SUPERMERCADO\n'
+        '05/03/2025;Bizum;-10,00;\n'
+    )
+    OFX = (
+        'OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+        '<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20250410120000[-5:EST]\n<TRNAMT>-12.50\n'
+        '<NAME>Cine &amp; palomitas\n</STMTTRN>\n'
+        '<STMTTRN><TRNTYPE>CREDIT</TRNTYPE><DTPOSTED>20250411</DTPOSTED><TRNAMT>300.00</TRNAMT>'
+        '<NAME>Devolución</NAME><MEMO>Hacienda</MEMO></STMTTRN>\n'
+        '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+    )
+    COLUMNAS = {'fecha': 'Fecha', 'descripcion': 'Concepto', 'cantidad': 'Importe', 'categoria': 'Categoría'}
+
+    def setUp(self):
+        self.u = User.objects.create_user(username='importa', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.salario = Categoria.objects.create(usuario=self.u, nombre='Salario', tipo='ingreso')
+
+    def test_csv_con_coma_decimal_y_categorias(self):
+        filas = leer_csv(StringIO(self.CSV), columnas=self.COLUMNAS)
+        resultado = importar_movimientos(self.u, filas, tam_lote=2)
+        self.assertEqual(resultado, {'importados': 4, 'categorias_creadas': 2})
+
+        movs = Movimiento.objects.filter(usuario=self.u).order_by('fecha')
+        self.assertEqual([m.cantidad for m in movs],
+                         [Decimal('2150.00'), Decimal('54.30'), Decimal('1020.75'), Decimal('10.00')])
+        self.assertEqual(movs[0].categoria, self.salario)  # 'salario' resuelve a 'Salario'
+        self.assertEqual(movs[1].categoria_id, movs[2].categoria_id)
+        self.assertEqual((movs[1].categoria.nombre, movs[1].categoria.tipo), ('Supermercado', 'gasto'))
+        self.assertEqual(movs[3].categoria.nombre, 'Importados')
+        self.assertEqual(verificar(self.u.id), [])
+
+    def test_ofx(self):
+        filas = list(leer_ofx(StringIO(self.OFX)))
+        self.assertEqual([(f.fecha, f.cantidad, f.tipo, f.descripcion) for f in filas], [
+            (date(2025, 4, 10), Decimal('12.50'), 'gasto', 'Cine & palomitas'),
+            (date(2025, 4, 11), Decimal('300.00'), 'ingreso', 'Devolución - Hacienda'),
+        ])
+
+    def test_error_no_importa_nada(self):
+        csv_malo = self.CSV + '32/13/2025;Fecha imposible;-1,00;Ocio\n'
+        with self.assertRaisesMessage(ErrorImportacion, 'Línea 6'):
+            importar_movimientos(self.u, leer_csv(StringIO(csv_malo), columnas=self.COLUMNAS))
+        self.assertFalse(Movimiento.objects.filter(usuario=self.u).exists())
+
+    def test_cantidades_no_finitas(self):
+        for importe in ('NaN', '-Infinity', 'inf', 'sNaN'):
+            csv_malo = self.CSV + f'06/03/2025;Raro;{importe};Ocio\n'
+            with self.assertRaisesMessage(ErrorImportacion, 'Línea 6: cantidad no válida'):
+                importar_movimientos(self.u, leer_csv(StringIO(csv_malo), columnas=self.COLUMNAS))
+        ofx_malo = self.OFX.replace('<TRNAMT>300.00', '<TRNAMT>NaN')
+        with self.assertRaisesMessage(ErrorImportacion, 'Transacción 2: cantidad no válida'):
+            list(leer_ofx(StringIO(ofx_malo)))
+        self.assertFalse(Movimiento.objects.filter(usuario=self.u).exists())
+
+    def test_cantidad_que_redondea_a_cero(self):
+        for importe in ('0,004', '-0,001'):
+            csv_malo = self.CSV + f'06/03/2025;Céntimos;{importe};Ocio\n'
+            with self.assertRaisesMessage(ErrorImportacion, 'Línea 6: la cantidad no puede ser 0'):
+                importar_movimientos(self.u, leer_csv(StringIO(csv_malo), columnas=self.COLUMNAS))
+        filas = list(leer_csv(StringIO(self.CSV + '06/03/2025;Redondeo;-0,006;Ocio\n'), columnas=self.COLUMNAS))
+        self.assertEqual((filas[-1].cantidad, filas[-1].tipo), (Decimal('0.01'), 'gasto'))
+        self.assertFalse(Movimiento.objects.filter(usuario=self.u).exists())
+
+    def test_csv_mal_formado(self):
+        with self.assertRaisesMessage(ErrorImportacion, 'Cabecera:'):
+            list(leer_csv(StringIO('Fecha;Concepto\rX;Importe\n01/03/2025;a;1,00\n'), columnas=self.COLUMNAS))
+        campo_enorme = self.CSV + '06/03/2025;"' + 'x' * 200000 + '";-1,00;Ocio\n'
+        with self.assertRaisesMessage(ErrorImportacion, 'Línea 6: field larger than field limit'):
+            list(leer_csv(StringIO(campo_enorme), columnas=self.COLUMNAS))
+
+        fichero = SimpleUploadedFile('extracto.csv', campo_enorme.encode('utf-8'))
+        r = self.c.post('/api/movimientos/importar/', {'fichero': fichero, 'columnas': json.dumps(self.COLUMNAS)},
+                        format='multipart')
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(Movimiento.objects.filter(usuario=self.u).exists())
+
+    def test_cantidades_demasiado_grandes(self):
+        for importe in ('100.000.000,00', '-99.999.999,999', '1e9', '1e400'):
+            csv_malo = self.CSV + f'06/03/2025;Enorme;{importe};Ocio\n'
+            with self.assertRaisesMessage(ErrorImportacion, 'Línea 6: cantidad'):
+                importar_movimientos(self.u, leer_csv(StringIO(csv_malo), columnas=self.COLUMNAS))
+        self.assertFalse(Movimiento.objects.filter(usuario=self.u).exists())
+
+        maxima = self.CSV + '06/03/2025;Casi;-99.999.999,99;Ocio\n'
+        importar_movimientos(self.u, leer_csv(StringIO(maxima), columnas=self.COLUMNAS))
+        self.assertTrue(Movimiento.objects.filter(usuario=self.u, cantidad=Decimal('99999999.99')).exists())
+
+    def test_endpoint_y_comando(self):
+        fichero = SimpleUploadedFile('extracto.ofx', self.OFX.encode('utf-8'))
+        r = self.c.post('/api/movimientos/importar/', {'fichero': fichero, 'categoria': 'Banco'}, format='multipart')
+        self.assertEqual(r.status_code, 201, r.content)
+        self.assertEqual(r.json()['importados'], 2)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='latin-1', delete=False) as f:
+            f.write(self.CSV)
+        self.addCleanup(os.remove, f.name)
+        call_command('importar_movimientos', 'importa', f.name, '--codificacion', 'latin-1',
+                     *[f'--columna={k}={v}' for k, v in self.COLUMNAS.items()], stdout=StringIO())
+        self.assertEqual(Movimiento.objects.filter(usuario=self.u).count(), 6)
+        self.assertEqual(verificar(self.u.id), [])
+
+
+class ExportacionTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='exporta', password='pass123456')
+        self.otro = User.objects.create_user(username='ajeno', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.sueldo = Categoria.objects.create(usuario=self.u, nombre='Sueldo', tipo='ingreso')
+        self.ocio = Categoria.objects.create(usuario=self.u, nombre='Ocio', tipo='gasto')
+        Movimiento.objects.create(usuario=self.u, categoria=self.sueldo, fecha='2025-01-31',
+                                  cantidad='1500.00', descripcion='Nómina enero')
+        Movimiento.objects.create(usuario=self.u, categoria=self.ocio, fecha='2025-02-03',
+                                  cantidad='12.50', descripcion='Cine; "estreno"')
+        Movimiento.objects.create(usuario=self.u, categoria=None, fecha='2025-02-10',
+                                  cantidad='3.00', descripcion='Sin categoría')
+        Movimiento.objects.create(usuario=self.otro, categoria=None, fecha='2025-02-10',
+                                  cantidad='99.00', descripcion='De otro usuario')
+
+    def exportar(self, **params):
+        r = self.c.get('/api/movimientos/exportar/', params)
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.streaming)
+        return r, b''.join(r.streaming_content).decode('utf-8')
+
+    def test_csv_respeta_filtros_y_orden(self):
+        r, texto = self.exportar(date_from='2025-02-01', ordering='cantidad')
+        self.assertEqual(r['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('movimientos.csv', r['Content-Disposition'])
+        filas = list(csv.reader(StringIO(texto), delimiter=';'))
+        self.assertEqual(filas[0], ['id', 'fecha', 'descripcion', 'cantidad', 'categoria_id', 'categoria', 'tipo'])
+        self.assertEqual([f[1:] for f in filas[1:]], [
+            ['2025-02-10', 'Sin categoría', '3,00', '', '', ''],
+            ['2025-02-03', 'Cine; "estreno"', '12,50', str(self.ocio.id), 'Ocio', 'gasto'],
+        ])
+
+    def test_csv_se_puede_volver_a_importar(self):
+        _, texto = self.exportar()
+        Movimiento.objects.filter(usuario=self.u).delete()
+        resultado = importar_movimientos(self.u, leer_csv(StringIO(texto)))
+        self.assertEqual(resultado, {'importados': 3, 'categorias_creadas': 1})  # 'Importados'
+        self.assertEqual(
+            sorted(Movimiento.objects.filter(usuario=self.u).values_list('descripcion', 'cantidad')),
+            [('Cine; "estreno"', Decimal('12.50')), ('Nómina enero', Decimal('1500.00')),
+             ('Sin categoría', Decimal('3.00'))],
+        )
+
+    def test_ndjson_y_consultas(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r, texto = self.exportar(formato='ndjson', search='Nómina')
+        self.assertEqual(r['Content-Type'], 'application/x-ndjson')
+        filas = [json.loads(l) for l in texto.splitlines()]
+        self.assertEqual(filas, [{
+            'id': filas[0]['id'], 'fecha': '2025-01-31', 'descripcion': 'Nómina enero', 'cantidad': '1500.00',
+            'categoria_id': self.sueldo.id, 'categoria': 'Sueldo', 'tipo': 'ingreso',
+        }])
+        # Una sola consulta (con JOIN a categoría), sin N+1
+        self.assertEqual(len([q for q in ctx.captured_queries if 'movimientos_movimiento' in q['sql']]), 1)
+
+    async def test_asgi_en_streaming(self):
+        with warnings.catch_warnings():
+            # Django avisa si tiene que consumir entero un iterador síncrono
+            warnings.simplefilter('error')
+            r = await AsyncClient().get('/api/movimientos/exportar/', {'formato': 'ndjson', 'ordering': 'fecha'},
+                                        headers={'Authorization': 'Token ' + self.token.key})
+            self.assertEqual(r.status_code, 200)
+            self.assertTrue(r.is_async)
+            texto = b''.join([trozo async for trozo in r.streaming_content]).decode('utf-8')
+        self.assertEqual([json.loads(l)['descripcion'] for l in texto.splitlines()],
+                         ['Nómina enero', 'Cine; "estreno"', 'Sin categoría'])
+
+    def test_formato_no_soportado(self):
+        r = self.c.get('/api/movimientos/exportar/', {'formato': 'xlsx'})
+        self.assertEqual(r.status_code, 400)
+
+
+@override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=True)  # un solo proceso: vale la LocMemCache
+class CacheRespuestasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.u = User.objects.create_user(username='cacheado', password='pass123456')
+        token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.cat = Categoria.objects.create(usuario=self.u, nombre='Ocio', tipo='gasto')
+        Movimiento.objects.create(usuario=self.u, categoria=self.cat, fecha='2025-03-01', cantidad='10.00')
+
+    def get(self, url, **extra):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.c.get(url, **extra)
+        return r, len([q for q in ctx.captured_queries if 'movimientos_' in q['sql']])
+
+    def test_segunda_lectura_sin_consultas_y_escritura_invalida(self):
+        r1, n1 = self.get('/api/movimientos/resumen/?tipo=gasto')
+        r2, n2 = self.get('/api/movimientos/resumen/?tipo=gasto&search=')  # mismos params normalizados
+        self.assertGreater(n1, 0)
+        self.assertEqual(n2, 0)
+        self.assertEqual(r1.json(), r2.json())
+        self.assertEqual(r1['ETag'], r2['ETag'])
+        self.assertIn('private', r1['Cache-Control'])
+
+        self.c.post('/api/movimientos/', {'categoria': self.cat.id, 'fecha': '2025-03-02', 'cantidad': '5.00'},
+                    format='json')
+        r3, n3 = self.get('/api/movimientos/resumen/?tipo=gasto')
+        self.assertGreater(n3, 0)
+        self.assertEqual(Decimal(str(r3.json()['total_gastos'])), Decimal('15.00'))
+        self.assertNotEqual(r3['ETag'], r1['ETag'])
+
+    def test_if_none_match_devuelve_304(self):
+        r, _ = self.get('/api/movimientos/')
+        r304, n = self.get('/api/movimientos/', HTTP_IF_NONE_MATCH=r['ETag'])
+        self.assertEqual(r304.status_code, 304)
+        self.assertEqual(r304['ETag'], r['ETag'])
+        self.assertEqual(n, 0)
+
+        r_otro, _ = self.get('/api/movimientos/?ordering=cantidad', HTTP_IF_NONE_MATCH=r['ETag'])
+        self.assertEqual(r_otro.status_code, 200)
+
+    def test_caminos_masivos_invalidan(self):
+        r, _ = self.get('/api/categorias/')
+        self.assertEqual(len(r.json()), 1)
+        fichero = SimpleUploadedFile('e.csv', b'fecha;cantidad;categoria\n01/04/2025;-3,00;Bares\n')
+        self.c.post('/api/movimientos/importar/', {'fichero': fichero}, format='multipart')
+        r, _ = self.get('/api/categorias/')
+        self.assertEqual([c['nombre'] for c in r.json()], ['Bares', 'Ocio'])
+
+        r, _ = self.get('/api/movimientos/')
+        ops = [{'accion': 'eliminar', 'id': m['id']} for m in r.json()['results']]
+        self.c.post('/api/movimientos/lote/', ops, format='json')
+        r, _ = self.get('/api/movimientos/')
+        self.assertEqual(r.json()['count'], 0)
+
+    def test_aislado_por_usuario(self):
+        self.get('/api/movimientos/resumen/')
+        otro = User.objects.create_user(username='otro_cache', password='pass123456')
+        c = APIClient()
+        c.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=otro).key)
+        self.assertEqual(c.get('/api/movimientos/resumen/').json()['por_categoria'], [])
+
+
+class CacheCompartidaTests(TestCase):
+    """Varios procesos: cada uno con su cliente de la caché (aquí, dos instancias del backend)."""
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directorio,
+        }})
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.u = User.objects.create_user(username='compartida', password='pass123456')
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.u).key)
+        self.cat = Categoria.objects.create(usuario=self.u, nombre='Ocio', tipo='gasto')
+        Movimiento.objects.create(usuario=self.u, categoria=self.cat, fecha='2025-03-01', cantidad='10.00')
+
+    def total(self, proceso):
+        with mock.patch('movimientos.cache_api.cache', proceso), CaptureQueriesContext(connection) as ctx:
+            r = self.c.get('/api/movimientos/resumen/')
+        consultas = len([q for q in ctx.captured_queries if 'movimientos_' in q['sql']])
+        return Decimal(str(r.json()['total_gastos'])), consultas
+
+    def escribir(self, proceso):
+        with mock.patch('movimientos.cache_api.cache', proceso):
+            r = self.c.post('/api/movimientos/', {'categoria': self.cat.pk, 'fecha': '2025-03-02', 'cantidad': '5.00'},
+                            format='json')
+        self.assertEqual(r.status_code, 201)
+
+    def test_escritura_en_un_proceso_invalida_en_otro(self):
+        proceso_a, proceso_b = caches.create_connection('default'), caches.create_connection('default')
+        self.assertEqual(self.total(proceso_a)[0], Decimal('10.00'))
+        self.assertEqual(self.total(proceso_a), (Decimal('10.00'), 0))  # cacheada
+        self.escribir(proceso_b)
+        total, consultas = self.total(proceso_a)
+        self.assertEqual(total, Decimal('15.00'))
+        self.assertGreater(consultas, 0)
+
+    def test_con_cache_local_no_se_cachea(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertGreater(self.total(cache)[1], 0)
+            self.assertGreater(self.total(cache)[1], 0)
+
+        # Lo que evita: forzada con una LocMemCache por proceso, el otro sigue con la respuesta vieja
+        proceso_a, proceso_b = LocMemCache('proceso_a', {}), LocMemCache('proceso_b', {})
+        with override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=True):
+            self.total(proceso_a)
+            self.escribir(proceso_b)
+            self.assertEqual(self.total(proceso_a), (Decimal('10.00'), 0))
+
+
+class TokenCacheadoTests(TestCase):
+    def setUp(self):
+        cache_local().vaciar()
+        self.u = User.objects.create_user(username='token', password='pass123456')
+        self.token = Token.objects.create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def get(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.c.get('/api/categorias/')
+        return r.status_code, len([q for q in ctx.captured_queries if 'authtoken_token' in q['sql']])
+
+    def test_segunda_peticion_sin_consultar_token(self):
+        self.assertEqual(self.get(), (200, 1))
+        self.assertEqual(self.get(), (200, 0))
+
+    def test_borrar_token_invalida(self):
+        self.get()
+        self.token.delete()
+        self.assertEqual(self.get(), (401, 1))
+
+    def test_desactivar_o_cambiar_contrasena_invalida(self):
+        self.get()
+        self.u.set_password('otra-clave-123')
+        self.u.save()
+        self.assertEqual(self.get(), (200, 1))
+
+        self.u.is_active = False
+        self.u.save()
+        self.assertEqual(self.get(), (401, 1))
+
+    @override_settings(MOVIMIENTOS_TOKEN_CACHE_COMPARTIDA='default')
+    def test_cache_compartida(self):
+        cache.clear()
+        self.get()
+        cache_local().vaciar()  # como si la petición llegara a otro proceso
+        self.assertEqual(self.get(), (200, 0))
+
+        self.u.is_active = False
+        self.u.save()
+        cache_local().vaciar()
+        self.assertEqual(self.get(), (401, 1))
+
+
+class BusquedaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.u = User.objects.create_user(username='busca', password='pass123456')
+        token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.ocio = Categoria.objects.create(usuario=self.u, nombre='Ocio', tipo='gasto')
+        self.nomina = Categoria.objects.create(usuario=self.u, nombre='Nómina', tipo='ingreso')
+        datos = [
+            ('Compra en Mercadona', self.ocio, '2025-01-05'),
+            ('Compras de Navidad: compras y más compras', self.ocio, '2025-01-02'),
+            ('Cena con amigos', self.ocio, '2025-01-06'),
+            ('Devolución compra', self.nomina, '2025-01-07'),
+        ]
+        self.movs = {
+            d: Movimiento.objects.create(usuario=self.u, categoria=c, descripcion=d, fecha=f, cantidad='1.00')
+            for d, c, f in datos
+        }
+
+    def buscar(self, **params):
+        return [m['descripcion'] for m in self.c.get('/api/movimientos/', params).json()['results']]
+
+    def test_subcadena_y_filtros(self):
+        self.assertEqual(self.buscar(search='merca'), ['Compra en Mercadona'])
+        self.assertEqual(self.buscar(search='compra', tipo='ingreso'), ['Devolución compra'])
+        self.assertEqual(self.buscar(search='compra', ordering='-fecha'),
+                         ['Devolución compra', 'Compra en Mercadona', 'Compras de Navidad: compras y más compras'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Texto completo solo en PostgreSQL')
+    def test_raices_y_relevancia(self):
+        # "compras" no es subcadena de "Compra en Mercadona", pero comparten raíz
+        self.assertEqual(self.buscar(search='compras', tipo='gasto'),
+                         ['Compras de Navidad: compras y más compras', 'Compra en Mercadona'])
+        # El orden por relevancia también funciona con paginación por cursor
+        p1 = self.c.get('/api/movimientos/', {'search': 'compras', 'tipo': 'gasto', 'paginacion': 'cursor', 'page_size': 1}).json()
+        p2 = self.c.get(p1['next']).json()
+        self.assertEqual([p1['results'][0]['descripcion'], p2['results'][0]['descripcion']],
+                         ['Compras de Navidad: compras y más compras', 'Compra en Mercadona'])
+
+        # El trigger mantiene el tsvector en las escrituras por el ORM y en bulk_update
+        mov = self.movs['Cena con amigos']
+        self.c.patch(f'/api/movimientos/{mov.id}/', {'descripcion': 'Pago gasolinera'}, format='json')
+        self.assertEqual(self.buscar(search='gasolineras'), ['Pago gasolinera'])
+        self.c.post('/api/movimientos/lote/', [{'accion': 'actualizar', 'id': mov.id, 'descripcion': 'Cine'}],
+                    format='json')
+        self.assertEqual(self.buscar(search='gasolineras'), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Índices GIN solo en PostgreSQL')
+    def test_indices_coinciden_con_las_consultas(self):
+        def plan(qs):
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                sql, params = qs.query.sql_with_params()
+                cursor.execute('EXPLAIN ' + sql, params)
+                return '\n'.join(fila[0] for fila in cursor.fetchall())
+
+        consulta = SearchQuery('compras', config=CONFIGURACION, search_type='websearch')
+        self.assertIn('mov_descripcion_tsv_idx', plan(Movimiento.objects.filter(descripcion_tsv=consulta)))
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'mov_descripcion_trgm_idx'")
+            hay_trigramas = cursor.fetchone() is not None
+        if hay_trigramas:  # requiere pg_trgm en el servidor
+            self.assertIn('mov_descripcion_trgm_idx', plan(Movimiento.objects.filter(descripcion__icontains='merca')))
+
+
+
+class GenerarDatosTests(TestCase):
+    def generar(self, prefijo, **opciones):
+        call_command('generar_datos', usuarios=2, anios=1, movimientos_por_mes=20, prefijo=prefijo,
+                     hasta='2025-06-30', stdout=StringIO(), **opciones)
+
+    def filas(self, username):
+        return list(Movimiento.objects.filter(usuario__username=username)
+                    .order_by('id').values_list('fecha', 'cantidad', 'descripcion', 'categoria__nombre'))
+
+    def test_genera_usuarios_categorias_y_movimientos(self):
+        self.generar('gen')
+        usuarios = User.objects.filter(username__startswith='gen').order_by('username')
+        self.assertEqual([u.username for u in usuarios], ['gen0001', 'gen0002'])
+        for usuario in usuarios:
+            self.assertTrue(Token.objects.filter(user=usuario).exists())
+            self.assertTrue(usuario.check_password('demo12345'))
+            self.assertEqual(Categoria.objects.filter(usuario=usuario).count(), len(CATALOGO))
+
+        filas = self.filas('gen0001')
+        self.assertGreater(len(filas), 12 * 15)
+        self.assertTrue(all(date(2024, 6, 1) <= fecha <= date(2025, 6, 30) for fecha, *_ in filas))
+        # Un movimiento fijo al mes: 13 nóminas de junio de 2024 a junio de 2025
+        self.assertEqual(sum(1 for *_, categoria in filas if categoria == 'Nómina'), 13)
+        self.assertEqual(verificar(), [])
+
+    def test_misma_semilla_mismos_datos(self):
+        self.generar('a')
+        self.generar('b')
+        self.generar('c', semilla=2)
+        self.assertEqual(self.filas('a0001'), self.filas('b0001'))
+        self.assertNotEqual(self.filas('a0001'), self.filas('c0001'))
+        with self.assertRaises(CommandError):
+            self.generar('a')
+
+@override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=False)
+class VistasAsyncTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='async', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        ingreso = Categoria.objects.create(usuario=self.u, nombre='Salario', tipo='ingreso')
+        gasto = Categoria.objects.create(usuario=self.u, nombre='Compras', tipo='gasto')
+        for i in range(25):
+            Movimiento.objects.create(
+                usuario=self.u, categoria=gasto if i % 3 else ingreso, descripcion=f'compra {i}',
+                fecha=date(2025, 1, 1) + timedelta(days=5 * i), cantidad=Decimal(10 + i),
+            )
+
+    def comparar(self, ruta, params):
+        sincrona = self.c.get(f'/api/movimientos/{ruta}', params)
+        asincrona = self.c.get(f'/api/async/movimientos/{ruta}', params)
+        self.assertEqual(asincrona.status_code, sincrona.status_code, params)
+        datos = json.dumps(asincrona.json()).replace('/api/async/movimientos/', '/api/movimientos/')
+        self.assertEqual(json.loads(datos), sincrona.json(), params)
+
+    def test_mismas_respuestas_que_las_vistas_sincronas(self):
+        for params in ({}, {'page': 2}, {'page': 'last', 'page_size': 7}, {'page': 9}, {'page': 'x'},
+                       {'tipo': 'gasto', 'ordering': 'cantidad'}, {'search': 'compra 1'},
+                       {'paginacion': 'cursor', 'page_size': 4}):
+            self.comparar('', params)
+        for ruta in ('resumen/', 'resumen-mensual/'):
+            for params in ({}, {'date_from': '2025-02-01', 'date_to': '2025-03-31'},
+                           {'date_from': '2025-02-10', 'categoria': 1}):
+                self.comparar(ruta, params)
+
+    def test_autenticacion_y_metodos(self):
+        r = APIClient().get('/api/async/movimientos/')
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual(r['WWW-Authenticate'], 'Token')
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION='Token no-existe')
+        self.assertEqual(cliente.get('/api/async/movimientos/resumen/').status_code, 401)
+        self.assertEqual(self.c.post('/api/async/movimientos/').status_code, 405)
+
+
+class VistasAsyncParalelasTests(TransactionTestCase):
+    """Fuera de una transacción el COUNT y la página van en conexiones distintas."""
+
+    def test_listado_en_paralelo(self):
+        u = User.objects.create_user(username='paralelo', password='pass123456')
+        token, _ = Token.objects.get_or_create(user=u)
+        Movimiento.objects.bulk_create(
+            Movimiento(usuario=u, descripcion=f'mov {i}', fecha=date(2025, 3, 1), cantidad=Decimal(1))
+            for i in range(15)
+        )
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        with override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=False):
+            esperado = cliente.get('/api/movimientos/', {'page': 2}).json()
+            self.assertEqual(cliente.get('/api/async/movimientos/', {'page': 2}).json()['results'], esperado['results'])
+        self.assertEqual(esperado['count'], 15)
+
+
+@override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=False, MOVIMIENTOS_INSTRUMENTACION_MUESTREO=1.0)
+class InstrumentacionTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='instrumentado', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        Movimiento.objects.create(usuario=self.u, descripcion='café', fecha=date(2025, 1, 2), cantidad=Decimal(2))
+
+    def test_server_timing_cuenta_las_consultas(self):
+        cache_local().vaciar()
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.c.get('/api/movimientos/')
+        cabecera = r['Server-Timing']
+        self.assertIn(f'desc="{len(ctx.captured_queries)} consultas"', cabecera)
+        for tramo in ('total;dur=', 'db;dur=', 'auth;dur=', 'serializer;dur='):
+            self.assertIn(tramo, cabecera)
+
+    def test_registro_muestreado_y_lento(self):
+        with self.assertLogs('movimientos.instrumentacion', 'INFO') as logs:
+            self.c.get('/api/movimientos/resumen/')
+        registro = logs.records[0]
+        self.assertEqual(registro.levelname, 'INFO')
+        datos = registro.instrumentacion
+        self.assertEqual((datos['ruta'], datos['estado'], datos['usuario']), ('/api/movimientos/resumen/', 200, self.u.pk))
+        self.assertEqual(json.loads(registro.getMessage()), datos)
+        self.assertIn('similares', datos)
+
+        with override_settings(MOVIMIENTOS_PETICION_LENTA_MS=0, MOVIMIENTOS_INSTRUMENTACION_MUESTREO=0):
+            with self.assertLogs('movimientos.instrumentacion', 'INFO') as logs:
+                r = self.c.get('/api/movimientos/')
+        self.assertEqual([x.levelname for x in logs.records], ['WARNING'])
+        self.assertTrue(logs.records[0].instrumentacion['lenta'])
+        self.assertNotIn('similares', logs.records[0].instrumentacion)
+        self.assertIn('Server-Timing', r)
+
+    @override_settings(MOVIMIENTOS_INSTRUMENTACION_MUESTREO=0)
+    def test_sin_muestreo_no_registra(self):
+        with self.assertNoLogs('movimientos.instrumentacion', 'INFO'):
+            r = self.c.get('/api/movimientos/')
+        self.assertNotIn('dup', r['Server-Timing'])
+
+    def test_detecta_consultas_repetidas_y_similares(self):
+        with medir() as medicion:
+            for _ in range(3):
+                list(Movimiento.objects.filter(usuario=self.u))
+            for pk in (1, 2, 3, 4):
+                Categoria.objects.filter(pk=pk).exists()
+        self.assertEqual(medicion.consultas, 7)
+        self.assertEqual(medicion.repetidas, 2)
+        self.assertEqual(sorted(s['veces'] for s in medicion.similares), [3, 4])
+
+
+class CategoriasEscrituraTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='categorias', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.c.get('/api/categorias/')  # token ya en caché: solo cuentan las consultas de la escritura
+
+    def consultas(self, metodo, *args):
+        with CaptureQueriesContext(connection) as ctx:
+            r = getattr(self.c, metodo)(*args, format='json')
+        return r, [q['sql'].split()[0] for q in ctx.captured_queries if 'movimientos_categoria' in q['sql']]
+
+    def test_crear_con_un_insert(self):
+        r, sql = self.consultas('post', '/api/categorias/', {'nombre': ' Comida ', 'tipo': 'gasto'})
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.json()['nombre'], 'Comida')
+        self.assertEqual(sql, ['INSERT'])
+
+        r, sql = self.consultas('post', '/api/categorias/', {'nombre': 'COMIDA', 'tipo': 'gasto'})
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json(), {'nombre': 'Ya existe una categoría con ese nombre y tipo.'})
+        self.assertEqual(sql, ['INSERT'])
+        # La transacción sigue usable tras el IntegrityError
+        self.assertEqual(self.c.post('/api/categorias/', {'nombre': 'comida', 'tipo': 'ingreso'}).status_code, 201)
+
+    def test_editar_sin_consultas_de_duplicados(self):
+        comida = Categoria.objects.create(usuario=self.u, nombre='Comida', tipo='gasto')
+        Categoria.objects.create(usuario=self.u, nombre='Ocio', tipo='gasto')
+        r, sql = self.consultas('patch', f'/api/categorias/{comida.pk}/', {'nombre': 'Alimentación'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(sql, ['SELECT', 'UPDATE'])
+
+        r, sql = self.consultas('patch', f'/api/categorias/{comida.pk}/', {'nombre': 'ocio'})
+        self.assertEqual(r.status_code, 400)
+        self.assertIn('nombre', r.json())
+        comida.refresh_from_db()
+        self.assertEqual(comida.nombre, 'Alimentación')
+
+    def test_alta_en_bloque(self):
+        filas = [{'nombre': f'Cat {i}', 'tipo': 'gasto'} for i in range(20)]
+        r, sql = self.consultas('post', '/api/categorias/', filas)
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual([c['nombre'] for c in r.json()], [f['nombre'] for f in filas])
+        self.assertTrue(all(c['id'] and c['usuario'] == self.u.pk for c in r.json()))
+        self.assertEqual(sql, ['INSERT'])
+        self.assertEqual(len(self.c.get('/api/categorias/').json()), 20)
+
+    def test_alta_en_bloque_con_duplicados(self):
+        duplicada = {'nombre': 'Ya existe una categoría con ese nombre y tipo.'}
+        r = self.c.post('/api/categorias/', [
+            {'nombre': 'Nueva', 'tipo': 'gasto'}, {'nombre': 'NUEVA', 'tipo': 'gasto'},
+        ], format='json')
+        self.assertEqual((r.status_code, r.json()), (400, [{}, duplicada]))
+
+        Categoria.objects.create(usuario=self.u, nombre='Existente', tipo='gasto')
+        r = self.c.post('/api/categorias/', [
+            {'nombre': 'Otra', 'tipo': 'gasto'}, {'nombre': 'existente', 'tipo': 'gasto'},
+        ], format='json')
+        self.assertEqual((r.status_code, r.json()), (400, [{}, duplicada]))
+        self.assertEqual(Categoria.objects.filter(usuario=self.u).count(), 1)
+
+        r = self.c.post('/api/categorias/', [{'tipo': 'otro'}], format='json')
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(set(r.json()[0]), {'nombre', 'tipo'})
+
+    def test_registro_crea_categorias_iniciales(self):
+        clave = 'Clave-de-prueba-9'
+        with CaptureQueriesContext(connection) as ctx:
+            r = APIClient().post('/api/registro/', {'username': 'nuevo', 'password': clave, 'password2': clave})
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'movimientos_categoria' in q['sql']]), 1)
+        nuevo = User.objects.get(username='nuevo')
+        self.assertEqual(
+            sorted(Categoria.objects.filter(usuario=nuevo).values_list('nombre', 'tipo')),
+            sorted(CATEGORIAS_INICIALES),
+        )
+
+
+class BorrarYReasignarCategoriaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.u = User.objects.create_user(username='reasigna', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.super = Categoria.objects.create(usuario=self.u, nombre='Súper', tipo='gasto')
+        self.comida = Categoria.objects.create(usuario=self.u, nombre='Comida', tipo='gasto')
+        self.nomina = Categoria.objects.create(usuario=self.u, nombre='Nómina', tipo='ingreso')
+        for i in range(30):
+            Movimiento.objects.create(
+                usuario=self.u, categoria=self.super if i % 2 else self.comida, descripcion=f'compra {i}',
+                fecha=date(2025, 1, 1) + timedelta(days=7 * i), cantidad=Decimal(10 + i),
+            )
+        self.c.get('/api/categorias/')  # token ya en caché
+
+    def test_borrar_comprueba_con_exists(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.c.delete(f'/api/categorias/{self.super.pk}/')
+        self.assertEqual(r.status_code, 400)
+        self.assertIn('tiene 15 movimiento(s)', r.json()[0])
+        sql = [q['sql'] for q in ctx.captured_queries if 'movimientos_movimiento' in q['sql']]
+        self.assertEqual(len(sql), 2)
+        self.assertIn('LIMIT 1', sql[0])
+        self.assertIn('COUNT(', sql[1])
+
+        vacia = Categoria.objects.create(usuario=self.u, nombre='Vacía', tipo='gasto')
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.c.delete(f'/api/categorias/{vacia.pk}/')
+        self.assertEqual(r.status_code, 204)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+    def test_reasignar_mueve_y_borra(self):
+        regla = MovimientoRecurrente.objects.create(
+            usuario=self.u, categoria=self.super, descripcion='Compra semanal', cantidad=Decimal('40'),
+            frecuencia=MovimientoRecurrente.SEMANAL, inicio=date(2025, 1, 6), siguiente=date(2025, 1, 6),
+        )
+        antes = self.c.get('/api/movimientos/resumen/').json()
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.c.post(f'/api/categorias/{self.super.pk}/reasignar/', {'destino': self.comida.pk}, format='json')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), {'destino': self.comida.pk, 'movidos': 15})
+        updates = [q['sql'] for q in ctx.captured_queries
+                   if q['sql'].startswith('UPDATE "movimientos_movimiento"')]
+        # El traspaso y el SET_NULL (ya sin filas) del borrado, no uno por movimiento
+        self.assertEqual(len(updates), 2)
+
+        self.assertFalse(Categoria.objects.filter(pk=self.super.pk).exists())
+        self.assertEqual(Movimiento.objects.filter(categoria=self.comida).count(), 30)
+        regla.refresh_from_db()
+        self.assertEqual(regla.categoria, self.comida)
+        self.assertEqual(verificar(self.u.id), [])
+        despues = self.c.get('/api/movimientos/resumen/').json()
+        self.assertEqual(despues['total_gastos'], antes['total_gastos'])
+        self.assertEqual([c['categoria__nombre'] for c in despues['por_categoria']], ['Comida'])
+
+    def test_reasignar_valida_destino(self):
+        otro = User.objects.create_user(username='ajeno', password='pass123456')
+        ajena = Categoria.objects.create(usuario=otro, nombre='Ajena', tipo='gasto')
+        url = f'/api/categorias/{self.super.pk}/reasignar/'
+        for destino in (None, 'x', ajena.pk, self.super.pk, self.nomina.pk):
+            r = self.c.post(url, {'destino': destino}, format='json')
+            self.assertEqual(r.status_code, 400, destino)
+            self.assertIn('destino', r.json())
+        self.assertEqual(self.c.post(f'/api/categorias/{ajena.pk}/reasignar/', {'destino': self.comida.pk}).status_code, 404)
+        self.assertEqual(Movimiento.objects.filter(categoria=self.super).count(), 15)
+
+
+@override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=False)
+class SaldoTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='saldo', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        ingreso = Categoria.objects.create(usuario=self.u, nombre='Salario', tipo='ingreso')
+        gasto = Categoria.objects.create(usuario=self.u, nombre='Compras', tipo='gasto')
+        self.movimientos = []
+        for i in range(40):
+            categoria = ingreso if i % 5 == 0 else gasto if i % 7 else None
+            self.movimientos.append(Movimiento.objects.create(
+                usuario=self.u, categoria=categoria, descripcion=f'mov {i}',
+                fecha=date(2025, 1, 3) + timedelta(days=4 * i), cantidad=Decimal(100 if i % 5 == 0 else 7 + i),
+            ))
+
+    def neto(self, m):
+        tipo = m.categoria.tipo if m.categoria else None
+        return float(m.cantidad) if tipo == 'ingreso' else -float(m.cantidad) if tipo == 'gasto' else 0.0
+
+    def saldo(self, **params):
+        r = self.c.get('/api/movimientos/saldo/', params)
+        self.assertEqual(r.status_code, 200, r.content)
+        return r.json()
+
+    def test_saldo_acumulado_por_periodo(self):
+        total = sum(self.neto(m) for m in self.movimientos)
+        for periodo in ('dia', 'semana', 'mes'):
+            datos = self.saldo(periodo=periodo)
+            self.assertEqual(datos['periodo'], periodo)
+            self.assertEqual(len({len(datos[c]) for c in ('periodos', 'ingresos', 'gastos', 'saldo')}), 1)
+            self.assertEqual(datos['periodos'], sorted(datos['periodos']))
+            self.assertAlmostEqual(datos['saldo'][-1], total, places=2)
+            acumulado = 0
+            for ingresos, gastos, saldo in zip(datos['ingresos'], datos['gastos'], datos['saldo']):
+                acumulado += ingresos - gastos
+                self.assertAlmostEqual(saldo, acumulado, places=2)
+
+        semanas = self.saldo(periodo='semana')['periodos']
+        self.assertTrue(all(date.fromisoformat(p).weekday() == 0 for p in semanas))
+        self.assertEqual(self.saldo()['periodos'][:2], ['2025-01-01', '2025-02-01'])
+
+    def test_mes_igual_con_y_sin_agregados(self):
+        for params in ({}, {'date_from': '2025-02-01', 'saldo_inicial': '1'}, {'tipo': 'gasto'}):
+            con = self.saldo(**params)
+            with self.settings(MOVIMIENTOS_USAR_AGREGADOS=False):
+                self.assertEqual(self.saldo(**params), con, params)
+
+    def test_saldo_inicial(self):
+        for date_from in ('2025-03-01', '2025-03-10'):
+            anterior = sum(self.neto(m) for m in self.movimientos if m.fecha < date.fromisoformat(date_from))
+            sin = self.saldo(periodo='dia', date_from=date_from)
+            con = self.saldo(periodo='dia', date_from=date_from, saldo_inicial='1')
+            self.assertEqual(sin['saldo_inicial'], 0)
+            self.assertAlmostEqual(con['saldo_inicial'], anterior, places=2)
+            self.assertGreaterEqual(con['periodos'][0], date_from)
+            for a, b in zip(sin['saldo'], con['saldo']):
+                self.assertAlmostEqual(b - a, anterior, places=2)
+            completo = self.saldo(periodo='dia')
+            self.assertAlmostEqual(con['saldo'][-1], completo['saldo'][-1], places=2)
+
+    def test_una_consulta_y_periodo_no_valido(self):
+        self.saldo()
+        with CaptureQueriesContext(connection) as ctx:
+            self.saldo(periodo='semana')
+        self.assertEqual(len([q for q in ctx.captured_queries if 'OVER' in q['sql']]), 1)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'movimientos_' in q['sql']]), 1)
+        self.assertEqual(self.c.get('/api/movimientos/saldo/', {'periodo': 'anio'}).status_code, 400)
+
+
+@override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=False)
+@override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=False)
+class ComparacionTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='comparar', password='pass123456')
+        self.c = APIClient()
+        self.c.force_authenticate(self.u)
+        self.ingreso = Categoria.objects.create(usuario=self.u, nombre='Salario', tipo='ingreso')
+        self.gasto = Categoria.objects.create(usuario=self.u, nombre='Compras', tipo='gasto')
+        for fecha, categoria, cantidad in [
+            (date(2025, 3, 5), self.ingreso, 1000), (date(2025, 3, 9), self.gasto, 300),
+            (date(2025, 4, 2), self.gasto, 100), (date(2025, 3, 20), None, 7),
+            (date(2025, 1, 5), self.ingreso, 800), (date(2025, 2, 9), self.gasto, 400),
+            (date(2024, 3, 1), self.ingreso, 500), (date(2024, 4, 30), self.gasto, 50),
+        ]:
+            Movimiento.objects.create(usuario=self.u, categoria=categoria, fecha=fecha, cantidad=Decimal(cantidad))
+
+    def comparar(self, **params):
+        r = self.c.get('/api/movimientos/comparar/', params)
+        self.assertEqual(r.status_code, 200, r.content)
+        return r.json()
+
+    def test_periodo_anterior_y_anio_anterior(self):
+        datos = self.comparar(date_from='2025-03-01', date_to='2025-04-30')
+        self.assertEqual(datos['periodos'], [
+            {'nombre': 'base', 'desde': '2025-03-01', 'hasta': '2025-04-30'},
+            {'nombre': 'anterior', 'desde': '2025-01-01', 'hasta': '2025-02-28'},
+            {'nombre': 'anio_anterior', 'desde': '2024-03-01', 'hasta': '2024-04-30'},
+        ])
+        self.assertEqual(datos['ingresos'], {
+            'base': 1000.0, 'anterior': 800.0, 'anio_anterior': 500.0,
+            'diferencia': {'anterior': 200.0, 'anio_anterior': 500.0},
+            'variacion': {'anterior': 25.0, 'anio_anterior': 100.0},
+        })
+        self.assertEqual(datos['balance']['base'], 600.0)
+        self.assertEqual(datos['balance']['anterior'], 400.0)
+        self.assertEqual(datos['balance']['anio_anterior'], 450.0)
+
+        gastos = next(c for c in datos['por_categoria'] if c['categoria'] == self.gasto.pk)['total']
+        self.assertEqual((gastos['base'], gastos['anterior'], gastos['anio_anterior']), (400.0, 400.0, 50.0))
+        self.assertEqual(gastos['variacion']['anterior'], 0.0)
+        # Sin categoría aparece en el desglose pero no en los totales
+        self.assertEqual(next(c for c in datos['por_categoria'] if c['categoria'] is None)['total']['base'], 7.0)
+
+        # Marzo frente a enero (anterior) y a marzo de 2024; abril frente a febrero y abril de 2024
+        marzo, abril = datos['series']
+        self.assertEqual((marzo['month'], abril['month']), ('2025-03', '2025-04'))
+        self.assertEqual((marzo['ingresos']['anterior'], marzo['ingresos']['anio_anterior']), (800.0, 500.0))
+        self.assertEqual((abril['gastos']['base'], abril['gastos']['anterior'], abril['gastos']['anio_anterior']),
+                         (100.0, 400.0, 50.0))
+        self.assertIsNone(abril['ingresos']['variacion']['anterior'])
+
+    def test_con_y_sin_agregados_y_rangos_libres(self):
+        casos = [
+            {'date_from': '2025-03-01', 'date_to': '2025-03-31'},
+            {'date_from': '2025-03-01', 'date_to': '2025-04-30', 'tipo': 'gasto'},
+            {'date_from': '2025-03-03', 'date_to': '2025-04-10', 'comparar': 'anterior,2024-03-01:2024-05-31'},
+            # Meses completos de los agregados y días sueltos de los movimientos
+            {'date_from': '2025-02-15', 'date_to': '2025-04-10', 'comparar': 'anterior,anio_anterior,2024-02-20:2024-05-31'},
+            {'date_from': '2025-01-01', 'date_to': '2025-12-31', 'categoria': self.ingreso.pk},
+        ]
+        for params in casos:
+            con = self.comparar(**params)
+            with self.settings(MOVIMIENTOS_USAR_AGREGADOS=False):
+                self.assertEqual(self.comparar(**params), con, params)
+        datos = self.comparar(date_from='2025-03-03', date_to='2025-03-12', comparar='anterior')
+        self.assertEqual(datos['periodos'][1], {'nombre': 'anterior', 'desde': '2025-02-21', 'hasta': '2025-03-02'})
+        self.assertEqual((datos['gastos']['base'], datos['gastos']['anterior']), (300.0, 0.0))
+        self.assertIsNone(datos['gastos']['variacion']['anterior'])
+
+    def test_una_consulta_con_cualquier_numero_de_periodos(self):
+        for comparar in ('anterior', 'anterior,anio_anterior,2023-01-01:2023-02-28,2022-03-01:2022-04-30'):
+            for date_from in ('2025-03-01', '2025-03-02'):  # agregados y movimientos
+                with self.assertNumQueries(1):
+                    self.comparar(date_from=date_from, date_to='2025-04-30', comparar=comparar)
+
+    def test_validacion(self):
+        for params in ({}, {'date_from': '2025-03-01'}, {'date_from': '2025-03-01', 'date_to': '2025-02-01'},
+                       {'date_from': '2025-03-01', 'date_to': '2025-03-31', 'comparar': 'ayer'},
+                       {'date_from': '2025-03-01', 'date_to': '2025-03-31', 'comparar': '2025-01-01:x'},
+                       {'date_from': '2025-03-01', 'date_to': '2025-03-31',
+                        'comparar': ','.join(f'2020-01-{d:02d}:2020-01-{d:02d}' for d in range(1, 14))}):
+            self.assertEqual(self.c.get('/api/movimientos/comparar/', params).status_code, 400, params)
+
+
+class RecurrentesTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='recurrente', password='pass123456')
+        token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.salario = Categoria.objects.create(usuario=self.u, nombre='Salario', tipo='ingreso')
+        self.casa = Categoria.objects.create(usuario=self.u, nombre='Casa', tipo='gasto')
+
+    def crear(self, **datos):
+        r = self.c.post('/api/recurrentes/', datos, format='json')
+        self.assertEqual(r.status_code, 201, r.content)
+        return MovimientoRecurrente.objects.get(pk=r.json()['id'])
+
+    def test_ocurrencias(self):
+        def fechas(frecuencia, inicio, intervalo=1, fin=None, desde=date(2000, 1, 1), hasta=date(2025, 6, 30)):
+            regla = MovimientoRecurrente(frecuencia=frecuencia, intervalo=intervalo, inicio=inicio, fin=fin)
+            return [f.isoformat() for f in recurrentes.ocurrencias(regla, desde, hasta)]
+
+        self.assertEqual(fechas('mensual', date(2025, 1, 31)),
+                         ['2025-01-31', '2025-02-28', '2025-03-31', '2025-04-30', '2025-05-31', '2025-06-30'])
+        self.assertEqual(fechas('mensual', date(2025, 1, 31), desde=date(2025, 3, 1), fin=date(2025, 4, 30)),
+                         ['2025-03-31', '2025-04-30'])
+        self.assertEqual(fechas('semanal', date(2025, 5, 1), intervalo=2, desde=date(2025, 5, 2)),
+                         ['2025-05-15', '2025-05-29', '2025-06-12', '2025-06-26'])
+        self.assertEqual(fechas('anual', date(2020, 2, 29), hasta=date(2024, 12, 31)),
+                         ['2020-02-29', '2021-02-28', '2022-02-28', '2023-02-28', '2024-02-29'])
+        self.assertEqual(fechas('mensual', date(2025, 1, 15), intervalo=3), ['2025-01-15', '2025-04-15'])
+
+    def test_api_y_validacion(self):
+        regla = self.crear(categoria=self.casa.pk, descripcion='Alquiler', cantidad='700.00',
+                           frecuencia='mensual', inicio='2025-01-01')
+        self.assertEqual(regla.siguiente, date(2025, 1, 1))
+        self.assertEqual(self.c.get('/api/recurrentes/').json()['count'], 1)
+
+        otro = User.objects.create_user(username='otro_recurrente', password='pass123456')
+        ajena = Categoria.objects.create(usuario=otro, nombre='Ajena', tipo='gasto')
+        for datos in ({'categoria': ajena.pk}, {'fin': '2024-12-31'}, {'intervalo': 0},
+                      {'cantidad': '0'}, {'frecuencia': 'diaria'}):
+            base = {'categoria': self.casa.pk, 'cantidad': '1.00', 'frecuencia': 'mensual', 'inicio': '2025-01-01'}
+            r = self.c.post('/api/recurrentes/', {**base, **datos}, format='json')
+            self.assertEqual(r.status_code, 400, datos)
+        cliente_otro = APIClient()
+        cliente_otro.force_authenticate(otro)
+        self.assertEqual(cliente_otro.get(f'/api/recurrentes/{regla.pk}/').status_code, 404)
+
+    def test_materializar_por_lotes_e_idempotente(self):
+        otro = User.objects.create_user(username='otro_recurrente', password='pass123456')
+        cat_otro = Categoria.objects.create(usuario=otro, nombre='Nómina', tipo='ingreso')
+        alquiler = self.crear(categoria=self.casa.pk, descripcion='Alquiler', cantidad='700.00',
+                              frecuencia='mensual', inicio='2025-01-05')
+        self.crear(categoria=self.salario.pk, cantidad='2000.00', frecuencia='mensual', inicio='2025-01-28',
+                   fin='2025-02-28')
+        self.crear(categoria=self.casa.pk, cantidad='5.00', frecuencia='semanal', inicio='2025-03-20')
+        MovimientoRecurrente.objects.create(usuario=otro, categoria=cat_otro, cantidad=Decimal('1500'),
+                                            frecuencia='mensual', inicio=date(2025, 3, 1), siguiente=date(2025, 3, 1))
+        antes = self.c.get('/api/movimientos/resumen/').json()  # queda en la caché de respuestas
+
+        salida = StringIO()
+        call_command('materializar_recurrentes', hasta='2025-03-31', tam_lote=2, stdout=salida)
+        self.assertIn('8 movimiento(s) creado(s) de 4 regla(s)', salida.getvalue())
+        self.assertEqual(
+            sorted(Movimiento.objects.filter(recurrente=alquiler).values_list('fecha', flat=True)),
+            [date(2025, 1, 5), date(2025, 2, 5), date(2025, 3, 5)],
+        )
+        self.assertEqual(Movimiento.objects.filter(usuario=self.u, fecha__gte='2025-03-20').count(), 2)
+        self.assertEqual(Movimiento.objects.get(usuario=otro).cantidad, Decimal('1500.00'))
+        self.assertEqual(verificar(), [])
+        alquiler.refresh_from_db()
+        self.assertEqual(alquiler.siguiente, date(2025, 4, 5))
+        self.assertIsNone(MovimientoRecurrente.objects.get(fin='2025-02-28').siguiente)
+        despues = self.c.get('/api/movimientos/resumen/').json()
+        self.assertNotEqual(despues, antes)
+        self.assertEqual(despues['total_ingresos'], 4000)
+
+        # Repetir (o volver a empezar una regla) no duplica movimientos ni agregados
+        MovimientoRecurrente.objects.update(siguiente=date(2025, 1, 1))
+        call_command('materializar_recurrentes', hasta='2025-03-31', stdout=StringIO())
+        self.assertEqual(Movimiento.objects.count(), 8)
+        self.assertEqual(verificar(), [])
+
+        # Cambiar el calendario reprograma a partir del último movimiento creado
+        r = self.c.patch(f'/api/recurrentes/{alquiler.pk}/', {'frecuencia': 'semanal'}, format='json')
+        self.assertEqual(r.json()['siguiente'], '2025-03-09')
+
+    def test_conflicto_deshace_el_lote(self):
+        alquiler = self.crear(categoria=self.casa.pk, descripcion='Alquiler', cantidad='700.00',
+                              frecuencia='mensual', inicio='2025-01-05')
+        Movimiento.objects.create(usuario=self.u, categoria=self.casa, recurrente=alquiler,
+                                  fecha=date(2025, 2, 5), cantidad=Decimal('700.00'))
+        # Como si otro proceso lo hubiera creado después de buscar las ocurrencias ya existentes
+        with mock.patch.object(Movimiento.objects, 'filter', return_value=Movimiento.objects.none()):
+            with self.assertRaises(IntegrityError):
+                recurrentes.materializar(date(2025, 3, 31))
+        self.assertEqual(Movimiento.objects.count(), 1)
+        self.assertEqual(MovimientoRecurrente.objects.get(pk=alquiler.pk).siguiente, date(2025, 1, 5))
+        self.assertEqual(verificar(self.u.id), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'El upsert de agregados en bloque es de PostgreSQL')
+    def test_consultas_por_lote_constantes(self):
+        def consultas(n):
+            Movimiento.objects.all().delete()
+            MovimientoRecurrente.objects.all().delete()
+            usuarios = [User.objects.create_user(username=f'r{n}_{i}', password='x') for i in range(n)]
+            MovimientoRecurrente.objects.bulk_create(
+                MovimientoRecurrente(usuario=u, categoria=self.casa, cantidad=Decimal('9.99'), frecuencia='semanal',
+                                     inicio=date(2025, 1, 1), siguiente=date(2025, 1, 1))
+                for u in usuarios
+            )
+            with CaptureQueriesContext(connection) as ctx:
+                recurrentes.materializar(date(2025, 3, 31), tam_lote=1000)
+            self.assertEqual(Movimiento.objects.count(), n * 13)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(consultas(3), consultas(60))
+
+    @override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=False)
+    def test_proyeccion(self):
+        Movimiento.objects.create(usuario=self.u, categoria=self.salario, fecha=date(2025, 1, 2), cantidad=Decimal('300'))
+        self.crear(categoria=self.salario.pk, cantidad='1000.00', frecuencia='mensual', inicio='2025-02-01')
+        self.crear(categoria=self.casa.pk, cantidad='10.00', frecuencia='semanal', inicio='2025-01-20',
+                   fin='2025-02-10')
+        self.crear(cantidad='99.00', frecuencia='mensual', inicio='2025-01-20')  # sin categoría: no cuenta
+        with mock.patch('movimientos.views.timezone.localdate', return_value=date(2025, 1, 15)):
+            r = self.c.get('/api/movimientos/proyeccion/', {'hasta': '2025-03-31'})
+            self.assertEqual(r.status_code, 200, r.content)
+            datos = r.json()
+            self.assertEqual(datos['saldo_inicial'], 300.0)
+            self.assertEqual(datos['periodos'], ['2025-01-01', '2025-02-01', '2025-03-01'])
+            self.assertEqual(datos['ingresos'], [0.0, 1000.0, 1000.0])
+            self.assertEqual(datos['gastos'], [20.0, 20.0, 0.0])
+            self.assertEqual(datos['saldo'], [280.0, 1260.0, 2260.0])
+
+            semanas = self.c.get('/api/movimientos/proyeccion/', {'hasta': '2025-02-10', 'periodo': 'semana'}).json()
+            self.assertEqual(semanas['periodos'], ['2025-01-20', '2025-01-27', '2025-02-03', '2025-02-10'])
+            for params in ({'hasta': '2024-12-31'}, {'hasta': '2040-01-01'}, {'hasta': 'x'}, {'periodo': 'anio'}):
+                self.assertEqual(self.c.get('/api/movimientos/proyeccion/', params).status_code, 400, params)
+        # Lo ya materializado pasa al saldo actual y deja de proyectarse
+        call_command('materializar_recurrentes', hasta='2025-02-01', stdout=StringIO())
+        with mock.patch('movimientos.views.timezone.localdate', return_value=date(2025, 2, 2)):
+            datos = self.c.get('/api/movimientos/proyeccion/', {'hasta': '2025-03-31'}).json()
+        self.assertEqual(datos['saldo_inicial'], 1280.0)
+        self.assertEqual(datos['saldo'][-1], 2260.0)
+
+
+@override_settings(MOVIMIENTOS_CAMBIOS_MARGEN=0)
+class CambiosTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='sincroniza', password='pass123456')
+        token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.casa = Categoria.objects.create(usuario=self.u, nombre='Casa', tipo='gasto')
+        self.ocio = Categoria.objects.create(usuario=self.u, nombre='Ocio', tipo='gasto')
+        self.movs = [
+            Movimiento.objects.create(usuario=self.u, categoria=categoria, fecha=date(2025, 1, i + 1),
+                                      cantidad=Decimal('10.00'))
+            for i, categoria in enumerate([self.casa, self.casa, self.casa, self.casa, self.ocio])
+        ]
+        otro = User.objects.create_user(username='otro_sincroniza', password='pass123456')
+        Movimiento.objects.create(usuario=otro, fecha=date(2025, 1, 1), cantidad=Decimal('1.00'))
+
+    def cambios(self, **params):
+        r = self.c.get('/api/cambios/', params)
+        self.assertEqual(r.status_code, 200, r.content)
+        return r.json()
+
+    def test_carga_inicial_y_cambios_desde_el_token(self):
+        inicial = self.cambios()
+        self.assertEqual([c['nombre'] for c in inicial['categorias']['actualizados']], ['Casa', 'Ocio'])
+        self.assertEqual([m['id'] for m in inicial['movimientos']['actualizados']], [m.pk for m in self.movs])
+        self.assertEqual(inicial['movimientos']['borrados'], [])
+
+        m1, m2, m3, m4, m5 = self.movs
+        self.c.patch(f'/api/movimientos/{m1.pk}/', {'cantidad': '12.00'}, format='json')
+        self.c.delete(f'/api/movimientos/{m2.pk}/')
+        r = self.c.post('/api/movimientos/lote/', [
+            {'accion': 'crear', 'categoria': self.casa.pk, 'fecha': '2025-02-01', 'cantidad': '5.00'},
+            {'accion': 'actualizar', 'id': m3.pk, 'descripcion': 'Luz'},
+            {'accion': 'eliminar', 'id': m4.pk},
+        ], format='json')
+        nuevo = r.json()['creados'][0]
+        # Reasignar cambia los movimientos de Ocio con update() y borra la categoría
+        self.c.post(f'/api/categorias/{self.ocio.pk}/reasignar/', {'destino': self.casa.pk}, format='json')
+
+        datos = self.cambios(since=inicial['token'])
+        self.assertEqual(datos['categorias'], {'actualizados': [], 'borrados': [self.ocio.pk]})
+        actualizados = {m['id']: m for m in datos['movimientos']['actualizados']}
+        self.assertCountEqual(actualizados, [m1.pk, nuevo, m3.pk, m5.pk])
+        self.assertEqual(actualizados[m1.pk]['cantidad'], '12.00')
+        self.assertEqual(actualizados[m3.pk]['descripcion'], 'Luz')
+        self.assertEqual(actualizados[m5.pk]['categoria'], self.casa.pk)
+        self.assertEqual(datos['movimientos']['borrados'], [m2.pk, m4.pk])
+
+        sin_cambios = self.cambios(since=datos['token'], modelos='movimientos')
+        self.assertEqual(sin_cambios, {'token': sin_cambios['token'],
+                                       'movimientos': {'actualizados': [], 'borrados': []}})
+
+        # Un borrado desde fuera de la API (admin) también deja lápida y marca sus movimientos
+        casa = self.casa.pk
+        self.casa.delete()
+        datos = self.cambios(since=datos['token'])
+        self.assertEqual(datos['categorias']['borrados'], [casa])
+        self.assertEqual(len(datos['movimientos']['actualizados']), 4)
+        self.assertTrue(all(m['categoria'] is None for m in datos['movimientos']['actualizados']))
+
+    def test_errores_y_recarga_completa(self):
+        self.assertEqual(self.c.get('/api/cambios/', {'since': 'ayer'}).status_code, 400)
+        self.assertEqual(self.c.get('/api/cambios/', {'modelos': 'tareas'}).status_code, 400)
+        self.assertEqual(APIClient().get('/api/cambios/').status_code, 401)
+
+        antiguo = cambios.token(timezone.now() - timedelta(days=31))
+        r = self.c.get('/api/cambios/', {'since': antiguo})
+        self.assertEqual(r.status_code, 410)
+        self.assertIn('token', r.json())
+
+        with override_settings(MOVIMIENTOS_CAMBIOS_MAXIMO=6):
+            self.assertEqual(self.c.get('/api/cambios/').status_code, 410)
+            self.assertEqual(len(self.cambios(modelos='movimientos')['movimientos']['actualizados']), 5)
+
+        Borrado.objects.filter(usuario=self.u).delete()
+        self.movs[0].delete()
+        Borrado.objects.filter(usuario=self.u).update(borrado=timezone.now() - timedelta(days=31))
+        salida = StringIO()
+        call_command('purgar_borrados', stdout=salida)
+        self.assertIn('1 lápida(s)', salida.getvalue())
+        self.assertFalse(Borrado.objects.exists())
+
+    @skipUnless(connection.vendor == 'postgresql', 'pg_stat_activity es de PostgreSQL')
+    def test_el_token_no_pasa_de_una_escritura_abierta(self):
+        otra = connection.copy()
+        self.addCleanup(otra.close)
+        otra.set_autocommit(False)
+        with otra.cursor() as cursor:
+            cursor.execute('SELECT txid_current(), now()')  # la transacción ya tiene escrituras
+            inicio = cursor.fetchone()[1]
+        self.assertLessEqual(cambios.corte(), inicio)
+        otra.rollback()
+        otra.set_autocommit(True)
+        self.assertGreater(cambios.corte(), inicio)
+
+
+class ColumnasTests(TestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='columnas', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        ingreso = Categoria.objects.create(usuario=self.u, nombre='Salario', tipo='ingreso')
+        gasto = Categoria.objects.create(usuario=self.u, nombre='Compras', tipo='gasto')
+        for i in range(25):
+            Movimiento.objects.create(
+                usuario=self.u, categoria=gasto if i % 3 else ingreso if i % 2 else None,
+                descripcion=f'compra {i}', fecha=date(2025, 1, 1) + timedelta(days=3 * i),
+                cantidad=Decimal(10 + i) / 4,
+            )
+
+    def transponer(self, filas):
+        return {clave: [float(f[clave]) if clave == 'cantidad' else f[clave] for f in filas] for clave in filas[0]}
+
+    def test_listado_igual_que_json_sin_serializer(self):
+        for params in ({}, {'page': 2, 'page_size': 7}, {'ordering': 'cantidad', 'tipo': 'gasto'},
+                       {'search': 'compra 1'}):
+            esperado = self.c.get('/api/movimientos/', params).json()
+            with mock.patch.object(MovimientoSerializer, 'to_representation', side_effect=AssertionError):
+                r = self.c.get('/api/movimientos/', {**params, 'format': 'columnas'})
+            self.assertEqual(r['Content-Type'], 'application/vnd.movimientos.columnas+json')
+            datos = r.json()
+            self.assertEqual(datos['count'], esperado['count'], params)
+            self.assertEqual(datos['results'], self.transponer(esperado['results']), params)
+
+        r = self.c.get('/api/movimientos/', HTTP_ACCEPT='application/vnd.movimientos.columnas+json')
+        self.assertEqual(list(r.json()['results']), ['id', 'usuario', 'categoria', 'descripcion', 'fecha', 'cantidad'])
+        vacio = self.c.get('/api/movimientos/', {'format': 'columnas', 'date_from': '2030-01-01'}).json()
+        self.assertEqual(vacio['results']['id'], [])
+
+    def test_paginacion_por_cursor(self):
+        params = {'paginacion': 'cursor', 'page_size': 10}
+        json_ = self.c.get('/api/movimientos/', params).json()
+        columnas = self.c.get('/api/movimientos/', {**params, 'format': 'columnas'}).json()
+        siguiente = self.c.get(columnas['next']).json()
+        self.assertEqual(siguiente['results'], self.transponer(self.c.get(json_['next']).json()['results']))
+
+    @skipUnless(connection.vendor == 'postgresql', 'Texto completo solo en PostgreSQL')
+    def test_paginacion_por_cursor_con_busqueda(self):
+        params = {'paginacion': 'cursor', 'page_size': 4, 'search': 'compra'}
+        json_ = self.c.get('/api/movimientos/', params).json()
+        r = self.c.get('/api/movimientos/', {**params, 'format': 'columnas'})
+        self.assertEqual(r.status_code, 200)
+        columnas = r.json()
+        self.assertEqual(list(columnas['results']), ['id', 'usuario', 'categoria', 'descripcion', 'fecha', 'cantidad'])
+        self.assertEqual(columnas['results'], self.transponer(json_['results']))
+        siguiente = self.c.get(columnas['next']).json()
+        self.assertEqual(siguiente['results'], self.transponer(self.c.get(json_['next']).json()['results']))
+
+    def test_resumenes_con_numeros(self):
+        resumen = self.c.get('/api/movimientos/resumen/', {'format': 'columnas'}).json()
+        original = self.c.get('/api/movimientos/resumen/').json()
+        self.assertIsInstance(resumen['total_gastos'], float)
+        self.assertAlmostEqual(resumen['balance'], float(original['balance']))
+        self.assertEqual(resumen['por_categoria']['categoria__nombre'],
+                         [c['categoria__nombre'] for c in original['por_categoria']])
+        mensual = self.c.get('/api/movimientos/resumen-mensual/', {'format': 'columnas'}).json()
+        self.assertEqual(mensual['series']['month'][0], '2025-01')
+
+    @skipUnless(msgpack, 'msgpack no está instalado')
+    def test_msgpack(self):
+        r = self.c.get('/api/movimientos/', {'page_size': 50}, HTTP_ACCEPT='application/x-msgpack')
+        self.assertEqual(r['Content-Type'], 'application/x-msgpack')
+        columnas = self.c.get('/api/movimientos/', {'page_size': 50, 'format': 'columnas'}).json()
+        self.assertEqual(msgpack.unpackb(r.content), columnas)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'El pool de conexiones es para PostgreSQL')
+class PoolConexionesTests(TestCase):
+    def setUp(self):
+        from tfg_finanzas.postgresql_pool.base import cerrar_pools
+        self.addCleanup(cerrar_pools)
+
+    def conexion(self, **pool):
+        ajustes = {**connection.settings_dict, 'ENGINE': 'tfg_finanzas.postgresql_pool', 'CONN_MAX_AGE': 0, 'POOL': pool}
+        conexion = load_backend('tfg_finanzas.postgresql_pool').DatabaseWrapper(ajustes, 'pool_pruebas')
+        self.addCleanup(conexion.close)
+        return conexion
+
+    def pid(self, conexion):
+        with conexion.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_reutiliza_y_deshace_transacciones(self):
+        conexion = self.conexion(VERIFICAR_TRAS=0)
+        pid = self.pid(conexion)
+        conexion.set_autocommit(False)
+        self.pid(conexion)
+        conexion.close()
+
+        self.assertEqual(self.pid(conexion), pid)
+        self.assertTrue(conexion.get_autocommit())
+        self.assertFalse(conexion.in_atomic_block)
+
+        conexion.errors_occurred = True
+        conexion.close()
+        self.assertNotEqual(self.pid(conexion), pid)
+
+    def test_espera_si_no_hay_conexiones_libres(self):
+        primera = self.conexion(MAXIMO=1, ESPERA=0.05)
+        segunda = self.conexion(MAXIMO=1, ESPERA=0.05)
+        pid = self.pid(primera)
+        with self.assertRaises(OperationalError):
+            segunda.ensure_connection()
+        primera.close()
+        self.assertEqual(self.pid(segunda), pid)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'El particionado por fecha es de PostgreSQL')
+class ParticionadoTests(TestCase):
+    """La conversión se hace dentro de la transacción de cada test (el DDL de PostgreSQL es transaccional)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = User.objects.create_user(username='particiones', password='pass123456')
+        cls.cat = Categoria.objects.create(usuario=cls.u, nombre='Comida', tipo='gasto')
+
+    def setUp(self):
+        cache.clear()
+        Movimiento.objects.bulk_create([
+            Movimiento(usuario=self.u, categoria=self.cat, descripcion=f'mov {i}',
+                       fecha=date(2021, 1, 1) + timedelta(days=i * 3), cantidad=Decimal('10.00'))
+            for i in range(500)
+        ])
+        self.particionar()
+        token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+    def particionar(self):
+        with connection.cursor() as cursor:
+            # No se puede alterar una tabla con comprobaciones de claves ajenas diferidas pendientes
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        particiones.particionar(connection, 'anual', adelantar=0)
+
+    def filas(self, tabla, **filtro):
+        where = ' AND '.join(f'{campo} = %s' for campo in filtro) or 'TRUE'
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {tabla} WHERE {where}', list(filtro.values()))
+            return cursor.fetchone()[0]
+
+    def tablas_recorridas(self, url, params):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.c.get(url, params)
+        self.assertEqual(r.status_code, 200)
+        tablas = set()
+        for q in ctx.captured_queries:
+            if particiones.TABLA not in q['sql']:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + q['sql'])
+                plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            pendientes = [plan[0]['Plan']]
+            while pendientes:
+                nodo = pendientes.pop()
+                pendientes += nodo.get('Plans', [])
+                if nodo.get('Relation Name', '').startswith(particiones.TABLA):
+                    tablas.add(nodo['Relation Name'])
+        return tablas
+
+    def test_convierte_conservando_los_datos(self):
+        with connection.cursor() as cursor:
+            self.assertTrue(particiones.esta_particionada(cursor))
+            nombres = [nombre for nombre, _, _ in particiones.particiones(cursor)]
+        for anio in range(2021, date.today().year + 1):
+            self.assertIn(f'{particiones.TABLA}_p{anio}', nombres)
+        self.assertIn(particiones.DEFECTO, nombres)
+        self.assertEqual(Movimiento.objects.count(), 500)
+        self.assertEqual(self.filas(particiones.DEFECTO), 0)
+        self.assertEqual(self.filas(f'{particiones.TABLA}_p2022'), Movimiento.objects.filter(fecha__year=2022).count())
+
+    def test_poda_de_particiones_por_fecha(self):
+        rango = {'date_from': '2023-02-01', 'date_to': '2023-05-31'}
+        self.assertEqual(self.tablas_recorridas('/api/movimientos/', rango), {f'{particiones.TABLA}_p2023'})
+        parcial = {'date_from': '2022-03-15', 'date_to': '2022-04-10'}  # no usa los agregados mensuales
+        self.assertEqual(self.tablas_recorridas('/api/movimientos/resumen/', parcial), {f'{particiones.TABLA}_p2022'})
+        self.assertEqual(
+            self.tablas_recorridas('/api/movimientos/', {'date_from': '2024-06-01'}),
+            {f'{particiones.TABLA}_p{anio}' for anio in range(2024, date.today().year + 1)} | {particiones.DEFECTO},
+        )
+
+    def test_la_api_escribe_en_su_particion(self):
+        maximo = Movimiento.objects.order_by('-id').values_list('id', flat=True)[0]
+        r = self.c.post('/api/movimientos/', {
+            'categoria': self.cat.id, 'descripcion': 'nuevo', 'fecha': '2022-07-01', 'cantidad': '5.00',
+        }, format='json')
+        self.assertEqual(r.status_code, 201)
+        pk = r.json()['id']
+        self.assertGreater(pk, maximo)
+        self.assertEqual(self.filas(f'{particiones.TABLA}_p2022', id=pk), 1)
+
+        r = self.c.patch(f'/api/movimientos/{pk}/', {'fecha': '2024-02-01'}, format='json')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.filas(f'{particiones.TABLA}_p2022', id=pk), 0)
+        self.assertEqual(self.filas(f'{particiones.TABLA}_p2024', id=pk), 1)
+        self.assertTrue(Movimiento.objects.filter(descripcion_tsv=SearchQuery('nuevo', config=CONFIGURACION)).exists())
+
+        self.assertEqual(self.c.delete(f'/api/movimientos/{pk}/').status_code, 204)
+        self.assertFalse(Movimiento.objects.filter(pk=pk).exists())
+
+    def test_comando_crea_particiones_y_archiva(self):
+        futuro = date(date.today().year + 4, 3, 1)
+        Movimiento.objects.create(usuario=self.u, categoria=self.cat, fecha=futuro, cantidad=Decimal('1.00'))
+        self.assertEqual(self.filas(particiones.DEFECTO), 1)
+        de_2021 = Movimiento.objects.filter(fecha__year=2021).count()
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        salida = StringIO()
+        call_command('particiones_movimientos', adelantar=5, archivar_antes='2022-01-01', stdout=salida)
+
+        self.assertIn(f'Creada {particiones.TABLA}_p{futuro.year}', salida.getvalue())
+        self.assertEqual(self.filas(particiones.DEFECTO), 0)
+        self.assertEqual(self.filas(f'{particiones.TABLA}_p{futuro.year}'), 1)
+        self.assertEqual(self.filas(f'archivo.{particiones.TABLA}_p2021'), de_2021)
+        self.assertFalse(Movimiento.objects.filter(fecha__year=2021).exists())
+        self.assertEqual(Movimiento.objects.count(), 501 - de_2021)
+        self.assertEqual(Borrado.objects.filter(usuario=self.u, modelo=Borrado.MOVIMIENTO).count(), de_2021)
+
+    @override_settings(MOVIMIENTOS_CACHEAR_RESPUESTAS=True)  # un solo proceso: vale la LocMemCache
+    def test_archivar_descuenta_agregados_e_invalida_cache(self):
+        recalcular(self.u.id)
+        de_2021 = Movimiento.objects.filter(fecha__year=2021).count()
+        resumen = self.c.get('/api/movimientos/resumen/').json()
+        saldo = self.c.get('/api/movimientos/saldo/').json()
+        self.assertEqual(Decimal(resumen['total_gastos']), Decimal('5000.00'))
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        with transaction.atomic():
+            self.assertEqual(particiones.archivar(connection, date(2022, 1, 1)), [f'{particiones.TABLA}_p2021'])
+
+        self.assertEqual(verificar(self.u.id), [])
+        despues = self.c.get('/api/movimientos/resumen/').json()
+        self.assertEqual(Decimal(despues['total_gastos']), Decimal('5000.00') - 10 * de_2021)
+        self.assertNotEqual(self.c.get('/api/movimientos/saldo/').json(), saldo)
+        self.assertEqual(recurrentes.saldo_actual(self.u), -(Decimal('5000.00') - 10 * de_2021))
+
+    def test_desparticionar(self):
+        particiones.desparticionar(connection)
+        with connection.cursor() as cursor:
+            self.assertFalse(particiones.esta_particionada(cursor))
+        self.assertEqual(Movimiento.objects.count(), 500)
+        self.assertEqual(self.c.get('/api/movimientos/', {'date_from': '2023-01-01'}).status_code, 200)
+
+
+class TareasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=carpeta.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.u = User.objects.create_user(username='tareas', password='pass123456')
+        self.token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.sueldo = Categoria.objects.create(usuario=self.u, nombre='Sueldo', tipo='ingreso')
+        self.comida = Categoria.objects.create(usuario=self.u, nombre='Comida', tipo='gasto')
+        for mes in range(1, 13):
+            Movimiento.objects.create(usuario=self.u, categoria=self.sueldo, fecha=date(2023, mes, 1), cantidad=Decimal('1000'))
+            Movimiento.objects.create(usuario=self.u, categoria=self.comida, fecha=date(2023, mes, 15), cantidad=Decimal('250.50'))
+
+    def encargar(self, tipo, **parametros):
+        r = self.c.post('/api/tareas/', {'tipo': tipo, 'parametros': parametros}, format='json')
+        self.assertEqual(r.status_code, 202, r.content)
+        self.assertEqual(r.json()['estado'], 'pendiente')
+        self.assertTrue(r['Location'].endswith(f"/api/tareas/{r.json()['id']}/"))
+        return r.json()['id']
+
+    def test_informe_igual_que_los_endpoints(self):
+        filtros = {'date_from': '2023-01-01', 'date_to': '2023-12-31'}
+        pk = self.encargar('informe', **filtros)
+        self.assertEqual(self.c.get(f'/api/tareas/{pk}/').json()['resultado'], None)
+
+        salida = StringIO()
+        call_command('procesar_tareas', procesos=0, una_vez=True, stdout=salida)
+        self.assertIn('1 tarea(s)', salida.getvalue())
+
+        tarea = self.c.get(f'/api/tareas/{pk}/').json()
+        self.assertEqual(tarea['estado'], 'terminada')
+        resultado = tarea['resultado']
+        resumen = self.c.get('/api/movimientos/resumen/', filtros).json()
+        self.assertEqual(resultado['total_ingresos'], resumen['total_ingresos'])
+        self.assertEqual(resultado['por_categoria'], resumen['por_categoria'])
+        self.assertEqual(resultado['series'], self.c.get('/api/movimientos/resumen-mensual/', filtros).json()['series'])
+        self.assertEqual(resultado['saldo']['saldo'][-1], 12 * (1000 - 250.5))
+
+    def test_exportar_y_descargar(self):
+        pk = self.encargar('exportar', formato='csv', date_from='2023-06-01', ordering='fecha')
+        tareas.procesar()
+        tarea = self.c.get(f'/api/tareas/{pk}/').json()
+        self.assertEqual(tarea['estado'], 'terminada')
+        r = self.c.get(tarea['descarga'])
+        self.assertEqual(r.status_code, 200)
+        lineas = b''.join(r.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lineas), 1 + 14)
+        self.assertTrue(lineas[1].split(';')[1] == '2023-06-01')
+
+        self.assertEqual(self.c.delete(f'/api/tareas/{pk}/').status_code, 204)
+        self.assertFalse(Tarea.objects.filter(pk=pk).exists())
+
+    def test_importar(self):
+        csv_texto = 'fecha;cantidad;descripcion;categoria\n01/02/2024;-12,50;Cine;Ocio\n02/02/2024;100,00;Venta;\n'
+        fichero = SimpleUploadedFile('extracto.csv', csv_texto.encode('utf-8'))
+        r = self.c.post('/api/tareas/', {'tipo': 'importar', 'fichero': fichero}, format='multipart')
+        self.assertEqual(r.status_code, 202, r.content)
+        tarea = Tarea.objects.get(pk=r.json()['id'])
+        self.assertTrue(tarea.entrada)
+
+        tareas.procesar()
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, Tarea.TERMINADA, tarea.error)
+        self.assertEqual(tarea.resultado, {'importados': 2, 'categorias_creadas': 2})
+        self.assertFalse(tarea.entrada)  # el fichero subido se borra al terminar
+        self.assertEqual(Movimiento.objects.filter(usuario=self.u, fecha__year=2024).count(), 2)
+
+        malo = SimpleUploadedFile('malo.csv', b'fecha;cantidad\n32/13/2024;1,00\n')
+        r = self.c.post('/api/tareas/', {'tipo': 'importar', 'fichero': malo}, format='multipart')
+        tareas.procesar()
+        tarea = Tarea.objects.get(pk=r.json()['id'])
+        self.assertEqual(tarea.estado, Tarea.FALLIDA)
+        self.assertIn('Línea 2', tarea.error)
+
+    def test_validacion_y_propiedad(self):
+        casos = [
+            {'tipo': 'borrar_todo'},
+            {'tipo': 'informe', 'parametros': {'date_from': 'ayer'}},
+            {'tipo': 'informe', 'parametros': {'usuario': 1}},
+            {'tipo': 'exportar', 'parametros': {'formato': 'xlsx'}},
+            {'tipo': 'importar'},
+        ]
+        for datos in casos:
+            self.assertEqual(self.c.post('/api/tareas/', datos, format='json').status_code, 400, datos)
+
+        ajena = Tarea.objects.create(usuario=User.objects.create_user(username='otro'), tipo='informe')
+        self.assertEqual(self.c.get(f'/api/tareas/{ajena.pk}/').status_code, 404)
+        self.assertEqual(self.c.get('/api/tareas/').json()['count'], 0)
+
+    def test_recalcular_agregados_y_abandonadas(self):
+        AgregadoMensual.objects.filter(usuario=self.u).delete()
+        pk = self.encargar('recalcular_agregados', desde='2023-01-01', hasta='2023-12-31')
+        tarea = tareas.tomar()
+        self.assertEqual((tarea.pk, tarea.estado, tarea.intentos), (pk, Tarea.EN_CURSO, 1))
+        self.assertIsNone(tareas.tomar())
+        self.assertEqual(self.c.delete(f'/api/tareas/{pk}/').status_code, 400)
+
+        # Su trabajador muere: vuelve a la cola y otro la termina
+        Tarea.objects.filter(pk=pk).update(iniciada=tarea.iniciada - timedelta(hours=2))
+        self.assertEqual(tareas.recuperar_abandonadas(timedelta(hours=1)), (1, 0))
+        self.assertEqual(tareas.procesar(), 1)
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos, tarea.resultado), (Tarea.TERMINADA, 2, {'agregados': 24}))
+        self.assertEqual(verificar(self.u.id), [])
+
+        Tarea.objects.filter(pk=pk).update(
+            estado=Tarea.EN_CURSO, intentos=tareas.MAX_INTENTOS, iniciada=tarea.iniciada - timedelta(hours=2)
+        )
+        self.assertEqual(tareas.recuperar_abandonadas(timedelta(hours=1)), (0, 1))
+        self.assertEqual(Tarea.objects.get(pk=pk).estado, Tarea.FALLIDA)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED y varios procesos necesitan PostgreSQL')
+class TareasConcurrentesTests(TransactionTestCase):
+    def setUp(self):
+        self.u = User.objects.create_user(username='cola', password='pass123456')
+        Movimiento.objects.create(usuario=self.u, fecha=date(2024, 1, 1), cantidad=Decimal('1'))
+
+    def test_skip_locked(self):
+        primera = Tarea.objects.create(usuario=self.u, tipo='informe')
+        segunda = Tarea.objects.create(usuario=self.u, tipo='informe')
+        bloqueada, liberar = threading.Event(), threading.Event()
+
+        def bloquear():
+            with transaction.atomic():
+                Tarea.objects.select_for_update().get(pk=primera.pk)
+                bloqueada.set()
+                liberar.wait(10)
+            connection.close()
+
+        hilo = threading.Thread(target=bloquear)
+        hilo.start()
+        self.addCleanup(hilo.join)
+        self.addCleanup(liberar.set)
+        bloqueada.wait(10)
+        # No espera al bloqueo de la primera: toma la siguiente
+        self.assertEqual(tareas.tomar().pk, segunda.pk)
+        self.assertIsNone(tareas.tomar())
+
+    def test_grupo_de_procesos(self):
+        Tarea.objects.bulk_create([Tarea(usuario=self.u, tipo='informe') for _ in range(8)])
+        call_command('procesar_tareas', procesos=2, una_vez=True, stdout=StringIO())
+        self.assertEqual(Tarea.objects.filter(estado=Tarea.TERMINADA).count(), 8)
+        self.assertFalse(Tarea.objects.exclude(intentos=1).exists())  # ninguna se ha ejecutado dos veces
+
+
+@override_settings(MOVIMIENTOS_REPLICAS=['replica_pruebas'], MOVIMIENTOS_CACHEAR_RESPUESTAS=False)
+class ReplicasLecturaTests(TransactionTestCase):
+    """Réplica simulada: un segundo alias sobre la misma base de datos de pruebas."""
+    # El alias se crea en setUpClass, después de preparar las bases de datos de pruebas
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        connections.settings['replica_pruebas'] = {
+            **connections['default'].settings_dict, 'TEST': {'MIRROR': 'default'},
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica_pruebas'].close()
+        del connections['replica_pruebas']
+        del connections.settings['replica_pruebas']
+
+    def setUp(self):
+        cache.clear()
+        self.u = User.objects.create_user(username='replica', password='pass123456')
+        token, _ = Token.objects.get_or_create(user=self.u)
+        self.c = APIClient()
+        self.c.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.cat = Categoria.objects.create(usuario=self.u, nombre='Compras', tipo='gasto')
+        Movimiento.objects.create(usuario=self.u, categoria=self.cat, fecha=date(2025, 1, 1), cantidad=Decimal('5'))
+        # Las escrituras anteriores (señales) abren la ventana: se da por pasada
+        cache.delete(replicas._clave(self.u.pk))
+
+    def consultas(self, peticion):
+        with CaptureQueriesContext(connections['default']) as primario, \
+                CaptureQueriesContext(connections['replica_pruebas']) as replica:
+            respuesta = peticion()
+        return respuesta, len(primario), len(replica)
+
+    def test_lecturas_en_la_replica(self):
+        for ruta in ('/api/movimientos/', '/api/movimientos/resumen/', '/api/categorias/',
+                     '/api/async/movimientos/resumen/'):
+            r, primario, replica = self.consultas(lambda: self.c.get(ruta))
+            self.assertEqual(r.status_code, 200, ruta)
+            self.assertGreater(replica, 0, ruta)
+            # En el primario solo queda la autenticación (token cacheado: ninguna)
+            self.assertLessEqual(primario, 1, ruta)
+        # El fichero se genera al recorrerlo, ya fuera de la vista: sigue en la réplica
+        r = self.c.get('/api/movimientos/exportar/')
+        _, primario, replica = self.consultas(lambda: b''.join(r.streaming_content))
+        self.assertEqual((primario, replica > 0), (0, True))
+
+    def test_lee_lo_que_acaba_de_escribir(self):
+        r, _, replica = self.consultas(lambda: self.c.post('/api/movimientos/', {
+            'categoria': self.cat.pk, 'fecha': '2025-02-01', 'cantidad': '7.00', 'descripcion': 'nuevo',
+        }, format='json'))
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(replica, 0)
+        # Dentro de la ventana, las lecturas de este usuario van al primario
+        r, primario, replica = self.consultas(lambda: self.c.get('/api/movimientos/'))
+        self.assertEqual(r.json()['count'], 2)
+        self.assertEqual(replica, 0)
+        self.assertGreater(primario, 0)
+        # Pasada la ventana vuelven a la réplica
+        cache.delete(replicas._clave(self.u.pk))
+        _, _, replica = self.consultas(lambda: self.c.get('/api/movimientos/'))
+        self.assertGreater(replica, 0)
+
+    def test_tareas_de_lectura(self):
+        tarea = tareas.encolar(self.u, 'informe')
+        with CaptureQueriesContext(connections['replica_pruebas']) as replica:
+            tareas.procesar()
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, Tarea.TERMINADA)
+        self.assertGreater(len(replica), 0)
+
+    def test_router(self):
+        router = replicas.RouterReplicas()
+        self.assertEqual(router.db_for_read(Movimiento), 'default')
+        with replicas.lecturas_en_replica() as alias:
+            self.assertEqual(alias, 'replica_pruebas')
+            self.assertEqual(router.db_for_read(Movimiento), 'replica_pruebas')
+            self.assertEqual(router.db_for_write(Movimiento), 'default')
+            self.assertEqual(Movimiento.objects.all().db, 'replica_pruebas')
+        self.assertEqual(router.db_for_read(Movimiento), 'default')
+        self.assertFalse(router.allow_migrate('replica_pruebas', 'movimientos'))
+        self.assertIsNone(router.allow_migrate('default', 'movimientos'))
+
+    def test_exige_cache_compartida(self):
+        with override_settings(DEBUG=False):
+            self.assertEqual([e.id for e in checks.replicas_con_cache_compartida(None)], ['movimientos.E001'])
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.gettempdir(),
+            }}):
+                self.assertEqual(checks.replicas_con_cache_compartida(None), [])
+
+        entorno = {
+            'DJANGO_SECRET_KEY': 'x', 'DJANGO_ALLOWED_HOSTS': 'ejemplo.com', 'DJANGO_DB_NAME': 'tfg',
+            'DJANGO_DB_USER': 'tfg', 'DJANGO_DB_PASSWORD': 'x', 'DJANGO_DB_REPLICAS': 'replica.interna',
+        }
+        with mock.patch.dict(os.environ, entorno):
+            os.environ.pop('DJANGO_REDIS_URL', None)
+            with self.assertRaisesMessage(ImproperlyConfigured, 'DJANGO_REDIS_URL'):
+                runpy.run_module('tfg_finanzas.settings_produccion')
+            os.environ['DJANGO_REDIS_URL'] = 'redis://localhost:6379/0'
+            ajustes = runpy.run_module('tfg_finanzas.settings_produccion')
+        self.assertEqual(ajustes['MOVIMIENTOS_REPLICAS'], ['replica1'])
@@ -1,16 +1,121 @@
 # movimientos/views.py
-from rest_framework import viewsets, permissions
+import io
+import json
+import operator
+from datetime import timedelta
+from functools import reduce
+
+from rest_framework import viewsets, permissions, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Sum, Q
-from django.db.models.functions import TruncMonth
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import MultiPartParser
+from rest_framework.serializers import as_serializer_error
+from rest_framework.settings import api_settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.db.models import DecimalField, F, Func, Q, Sum, Value, Window
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek
+
+
+from . import comparacion, exportacion, importacion, recurrentes
+from .agregados import Deltas, agregados_para, mover_categoria
+from .busqueda import BusquedaMovimientosFilter
+from .cache_api import datos_modificados, respuesta_cacheada
+from .cambios import registrar_borrados
+from .columnas import CAMPOS_MOVIMIENTO, RENDERERS, columnas_movimientos, es_columnar
+from .models import Categoria, Movimiento, MovimientoRecurrente
+from .serializers import (
+    CategoriaSerializer, MovimientoLoteSerializer, MovimientoRecurrenteSerializer, MovimientoSerializer,
+)
+from .signals import en_lote
+from .pagination import KeysetPagination, StandardResultsSetPagination
+from .replicas import LecturaEnReplicaMixin
+
+
+def totales_por_tipo(por_categoria):
+    """
+    (total_ingresos, total_gastos) a partir de filas con 'categoria__tipo' y 'total'.
+    Los movimientos sin categoría no cuentan en ninguno de los dos.
+    """
+    ingresos = sum((c['total'] for c in por_categoria if c['categoria__tipo'] == 'ingreso'), 0)
+    gastos = sum((c['total'] for c in por_categoria if c['categoria__tipo'] == 'gasto'), 0)
+    return ingresos, gastos
+
+
+def serie_mensual(filas):
+    """Serie de resumen-mensual a partir de filas con 'mes', 'ingresos' y 'gastos'."""
+    series = []
+    for row in filas:
+        ing = row['ingresos'] or 0
+        gas = row['gastos'] or 0
+        series.append({
+            'month': row['mes'].strftime('%Y-%m'),
+            'ingresos': float(ing),
+            'gastos': float(gas),
+            'balance': float(ing - gas),
+        })
+    return series
 
 
-from .models import Categoria, Movimiento
-from .serializers import CategoriaSerializer, MovimientoSerializer
-from .pagination import StandardResultsSetPagination
+class SumaAcumulada(Func):
+    """
+    SUM(...) como función de ventana sobre agregados de la misma consulta:
+    Sum() de Django no admite expresiones que ya son agregados.
+    """
+    function = 'SUM'
+    window_compatible = True
+
+
+def serie_saldo(filas, periodo, saldo_inicial):
+    """
+    Respuesta de saldo en columnas: una lista por campo en lugar de un objeto
+    por periodo, que en rangos de varios años con periodo=dia pesa mucho menos.
+    """
+    columnas = {'periodos': [], 'ingresos': [], 'gastos': [], 'saldo': []}
+    for row in filas:
+        columnas['periodos'].append(row['periodo'].isoformat())
+        columnas['ingresos'].append(float(row['ingresos']))
+        columnas['gastos'].append(float(row['gastos']))
+        columnas['saldo'].append(float(saldo_inicial + row['saldo']))
+    return {'periodo': periodo, 'saldo_inicial': float(saldo_inicial), **columnas}
+
+
+def datos_resumen(por_categoria):
+    """Respuesta de resumen a partir del desglose por categoría."""
+    total_ingresos, total_gastos = totales_por_tipo(por_categoria)
+    return {
+        'total_ingresos': total_ingresos,
+        'total_gastos': total_gastos,
+        'balance': (total_ingresos - total_gastos),
+        'por_categoria': por_categoria,
+    }
+
+
+def opciones_importacion(datos, fichero):
+    """
+    (formato, opciones del lector) a partir de los campos del formulario de
+    importación: formato según la extensión si no se indica y, para CSV,
+    separador, decimal, formato_fecha y columnas (JSON campo -> cabecera).
+    """
+    formato = datos.get('formato') or ('ofx' if fichero.name.lower().endswith(('.ofx', '.qfx')) else 'csv')
+    opciones = {}
+    if formato == 'csv':
+        for campo in ('separador', 'decimal', 'formato_fecha'):
+            if datos.get(campo):
+                opciones[campo] = datos[campo]
+        if datos.get('columnas'):
+            try:
+                opciones['columnas'] = json.loads(datos['columnas'])
+            except ValueError:
+                raise ValidationError({'columnas': 'Debe ser un objeto JSON campo -> columna.'})
+            if not isinstance(opciones['columnas'], dict):
+                raise ValidationError({'columnas': 'Debe ser un objeto JSON campo -> columna.'})
+    return formato, opciones
 
 
 class IsAuthenticatedAndOwner(permissions.IsAuthenticated):
@@ -21,10 +126,11 @@ class IsAuthenticatedAndOwner(permissions.IsAuthenticated):
     pass
 
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(LecturaEnReplicaMixin, viewsets.ModelViewSet):
     serializer_class = CategoriaSerializer
     permission_classes = [IsAuthenticatedAndOwner]
     pagination_class = None  
+    lote_maximo = 1000  # categorías admitidas en un POST con una lista
 
     def get_queryset(self):
         # Solo categorías del usuario logueado
@@ -37,78 +143,129 @@ class CategoriaViewSet(viewsets.ModelViewSet):
 
         return qs
 
-    def perform_create(self, serializer):
-        """
-        Crea la categoría para el usuario autenticado.
-        Valida duplicados (usuario + tipo + nombre) sin distinguir mayúsculas.
-        """
-        user = self.request.user
-        nombre = str(serializer.validated_data.get('nombre', '')).strip()
-        tipo = serializer.validated_data.get('tipo')
+    @respuesta_cacheada
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-        # Bloqueo de duplicados case-insensitive
-        if Categoria.objects.filter(usuario=user, tipo=tipo, nombre__iexact=nombre).exists():
-            raise ValidationError({'nombre': 'Ya existe una categoría con ese nombre y tipo.'})
-
-        serializer.save(usuario=user, nombre=nombre)
-
-    def perform_update(self, serializer):
-        """
-        Evita que al editar se renombre a un duplicado.
-        """
-        user = self.request.user
-        instance = self.get_object()
-        # Tomamos valores nuevos o los actuales si no se actualizan
-        nombre = str(serializer.validated_data.get('nombre', instance.nombre)).strip()
-        tipo = serializer.validated_data.get('tipo', instance.tipo)
-
-        qs = Categoria.objects.filter(usuario=user, tipo=tipo, nombre__iexact=nombre).exclude(pk=instance.pk)
-        if qs.exists():
-            raise ValidationError({'nombre': 'Ya existe una categoría con ese nombre y tipo.'})
-
-        serializer.save(nombre=nombre, tipo=tipo)
+    def get_serializer(self, *args, **kwargs):
+        # POST con una lista: alta de varias categorías en un solo INSERT
+        if self.action == 'create' and isinstance(kwargs.get('data'), list):
+            kwargs.update(many=True, max_length=self.lote_maximo)
+        return super().get_serializer(*args, **kwargs)
 
     def perform_destroy(self, instance):
         """
         Impide borrar si tiene movimientos asociados y devuelve un mensaje con el recuento.
         """
-        n = Movimiento.objects.filter(
-            usuario=self.request.user,
-            categoria=instance
-        ).count()
+        asociados = Movimiento.objects.filter(usuario=self.request.user, categoria=instance)
 
-        if n > 0:
+        # EXISTS se detiene en la primera fila; el recuento solo hace falta para el mensaje
+        if asociados.exists():
             # DRF devolverá {"detail": "..."} con 400
             raise ValidationError(
-                f'No se puede eliminar la categoría porque tiene {n} movimiento(s) asociado(s). '
-                'Primero reasigna o elimina esos movimientos.'
+                f'No se puede eliminar la categoría porque tiene {asociados.count()} movimiento(s) asociado(s). '
+                'Reasígnalos a otra categoría con /reasignar/ o elimina esos movimientos.'
             )
 
         # Si no tiene movimientos, borrado estándar
         return super().perform_destroy(instance)
 
+    @action(detail=True, methods=['post'])
+    def reasignar(self, request, pk=None):
+        """
+        Pasa todos los movimientos de la categoría a {"destino": id} (otra
+        categoría del usuario y del mismo tipo) con un único UPDATE, y también
+        sus reglas recurrentes, traspasa sus agregados mensuales y la borra,
+        todo en una transacción.
+        Devuelve {"destino": id, "movidos": n}.
+        """
+        origen = self.get_object()
+        try:
+            destino = Categoria.objects.get(usuario=request.user, pk=request.data.get('destino'))
+        except (Categoria.DoesNotExist, TypeError, ValueError):
+            raise ValidationError({'destino': 'Categoría no válida.'})
+        if destino.pk == origen.pk:
+            raise ValidationError({'destino': 'Debe ser una categoría distinta.'})
+        if destino.tipo != origen.tipo:
+            raise ValidationError({'destino': 'Debe ser una categoría del mismo tipo.'})
+
+        with transaction.atomic():
+            # update() no envía señales: los agregados se traspasan de una vez
+            movidos = Movimiento.objects.filter(usuario=request.user, categoria=origen).update(
+                categoria=destino, modificado=timezone.now(),
+            )
+            # Si no, el borrado las dejaría sin categoría (SET_NULL) y sus próximos movimientos también
+            MovimientoRecurrente.objects.filter(usuario=request.user, categoria=origen).update(categoria=destino)
+            mover_categoria(origen.pk, destino.pk)
+            # Sin el mantenimiento de las señales, que ya no tiene movimientos que traspasar
+            borrada = origen.pk
+            with en_lote():
+                origen.delete()
+            registrar_borrados(Categoria, request.user.pk, [borrada])
+            datos_modificados(request.user.pk)
+
+        return Response({'destino': destino.pk, 'movidos': movidos})
+
 
-class MovimientoViewSet(viewsets.ModelViewSet):
+class MovimientoRecurrenteViewSet(LecturaEnReplicaMixin, viewsets.ModelViewSet):
+    """
+    Reglas de movimientos recurrentes. Sus movimientos los crea
+    `manage.py materializar_recurrentes` al vencer; borrar la regla no borra
+    los ya creados.
+    """
+    serializer_class = MovimientoRecurrenteSerializer
+    permission_classes = [IsAuthenticatedAndOwner]
+    pagination_class = StandardResultsSetPagination
+
+    def get_queryset(self):
+        return MovimientoRecurrente.objects.filter(usuario=self.request.user).order_by('id')
+
+    @respuesta_cacheada
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class MovimientoViewSet(LecturaEnReplicaMixin, viewsets.ModelViewSet):
     serializer_class = MovimientoSerializer
     permission_classes = [IsAuthenticatedAndOwner]
 
-    filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['descripcion']  # ?search=texto
+    # La búsqueda va después de la ordenación para poder ordenar por relevancia
+    filter_backends = [OrderingFilter, BusquedaMovimientosFilter]
+    search_fields = ['descripcion']  # ?search=texto (texto completo + subcadena en PostgreSQL)
+    campo_texto_completo = 'descripcion_tsv'
     ordering_fields = ['fecha', 'cantidad', 'id', 'descripcion']  # ?ordering=-fecha,cantidad
     ordering = ['-fecha', '-id']  # orden por defecto
 
     pagination_class = StandardResultsSetPagination
+    # JSON y navegable, más las representaciones en columnas (?format=columnas|msgpack)
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, *RENDERERS]
+    lote_maximo = 50000  # operaciones admitidas por petición en /lote/
+    proyeccion_maxima = timedelta(days=3660)  # hasta dónde se puede proyectar el saldo en /proyeccion/
+    exportar_chunk_size = 2000  # filas por FETCH del cursor en /exportar/
+
+    @property
+    def paginator(self):
+        """
+        Paginación por páginas numeradas por defecto; con ?paginacion=cursor
+        (o al seguir un enlace con ?cursor=...) se usa KeysetPagination.
+        """
+        if not hasattr(self, '_paginator') and self.request is not None:
+            params = self.request.query_params
+            if params.get('paginacion') == 'cursor' or 'cursor' in params:
+                self._paginator = KeysetPagination()
+        return super().paginator
 
-
-    def get_queryset(self):
+    def get_queryset(self, fechas=True):
         """
         Filtra por usuario y acepta query params:
           - categoria: id numérico de categoría
           - tipo: 'ingreso' | 'gasto'
           - date_from: 'YYYY-MM-DD'
           - date_to:   'YYYY-MM-DD'
+        Con fechas=False no se aplican date_from ni date_to.
         """
-        qs = Movimiento.objects.filter(usuario=self.request.user)
+        # descripcion_tsv solo se usa en la búsqueda (dentro de la consulta)
+        qs = Movimiento.objects.filter(usuario=self.request.user).defer('descripcion_tsv')
 
         categoria = self.request.query_params.get('categoria')
         tipo = self.request.query_params.get('tipo')
@@ -121,64 +278,495 @@ class MovimientoViewSet(viewsets.ModelViewSet):
         if tipo in ('ingreso', 'gasto'):
             qs = qs.filter(categoria__tipo=tipo)
 
-        if date_from:
+        if fechas and date_from:
             qs = qs.filter(fecha__gte=date_from)
 
-        if date_to:
+        if fechas and date_to:
             qs = qs.filter(fecha__lte=date_to)
 
         return qs
 
+    @respuesta_cacheada
+    def list(self, request, *args, **kwargs):
+        if es_columnar(request):
+            return self.listado_columnas()
+        return super().list(request, *args, **kwargs)
+
+    def listado_columnas(self):
+        """
+        Listado en columnas: la página se lee con values_list y se transpone,
+        sin instanciar modelos ni serializers. Filas con nombre para que
+        KeysetPagination lea de ellas los valores del cursor; por eso se leen
+        también los campos de orden que no son columnas (el rango de la
+        búsqueda), que columnas_movimientos descarta.
+        """
+        qs = self.filter_queryset(self.get_queryset())
+        campos = [campo for _, campo in CAMPOS_MOVIMIENTO]
+        orden = [c.lstrip('-') for c in qs.query.order_by if isinstance(c, str)]
+        extra = [c for c in dict.fromkeys(orden) if c not in campos and c != 'pk']
+        qs = qs.values_list(*campos, *extra, named=True)
+        pagina = self.paginate_queryset(qs)
+        if pagina is None:
+            return Response(columnas_movimientos(qs))
+        return self.get_paginated_response(columnas_movimientos(pagina))
+
     def perform_create(self, serializer):
         serializer.save(usuario=self.request.user)
 
-    @action(detail=False, methods=['get'], url_path='resumen-mensual')
-    def resumen_mensual(self, request):
+    def get_origen_resumen(self, con_busqueda=False):
         """
-        Agrupa por mes y devuelve ingresos, gastos y balance por mes.
-        Respeta filtros: categoria, tipo, date_from, date_to.
+        Devuelve (queryset, campo a sumar) para los resúmenes: AgregadoMensual si
+        los filtros lo permiten o, si no, los movimientos de get_queryset.
+        Con con_busqueda=True también se aplica ?search= (y se descartan los agregados).
         """
+        request = self.request
+        busqueda = con_busqueda and request.query_params.get(BusquedaMovimientosFilter.search_param)
+        if not busqueda:
+            agregados = agregados_para(request.user, request.query_params)
+            if agregados is not None:
+                return agregados, 'total'
+
         qs = self.get_queryset()
-        agg = (
-            qs.annotate(mes=TruncMonth('fecha'))
-              .values('mes')
+        if busqueda:
+            qs = BusquedaMovimientosFilter().filtrar(request, qs, self)
+        return qs, 'cantidad'
+
+    def consulta_resumen_mensual(self):
+        """Filas {mes, ingresos, gastos} de resumen-mensual, ordenadas por mes."""
+        qs, campo = self.get_origen_resumen()
+        if campo == 'cantidad':
+            qs = qs.annotate(mes=TruncMonth('fecha'))
+
+        return (
+            qs.values('mes')
               .annotate(
-                  ingresos=Sum('cantidad', filter=Q(categoria__tipo='ingreso')),
-                  gastos=Sum('cantidad', filter=Q(categoria__tipo='gasto')),
+                  ingresos=Sum(campo, filter=Q(categoria__tipo='ingreso')),
+                  gastos=Sum(campo, filter=Q(categoria__tipo='gasto')),
               )
               .order_by('mes')
         )
 
-        series = []
-        for row in agg:
-            ing = row['ingresos'] or 0
-            gas = row['gastos'] or 0
-            series.append({
-                'month': row['mes'].strftime('%Y-%m'),
-                'ingresos': float(ing),
-                'gastos': float(gas),
-                'balance': float(ing - gas),
+    def consulta_resumen(self):
+        """
+        Desglose por categoría de resumen. Es la única consulta: ya separa
+        ingresos y gastos, así que los totales se obtienen sumando sus filas.
+        """
+        qs, campo = self.get_origen_resumen()
+        return (
+            qs.values('categoria', 'categoria__nombre', 'categoria__tipo')
+              .annotate(total=Sum(campo))
+              .order_by('-total')
+        )
+
+    def consulta_saldo(self, periodo):
+        """
+        Filas {periodo, ingresos, gastos, saldo} ordenadas por periodo, con el
+        saldo acumulado (ingresos - gastos) calculado en la base de datos con
+        una función de ventana. Por meses se lee de AgregadoMensual si se puede.
+        """
+        if periodo == 'mes':
+            qs, campo = self.get_origen_resumen()
+            agrupacion = F('mes') if campo == 'total' else TruncMonth('fecha')
+        else:
+            qs, campo = self.get_queryset(), 'cantidad'
+            agrupacion = F('fecha') if periodo == 'dia' else TruncWeek('fecha')
+
+        cero = Value(0, output_field=DecimalField())
+        return (
+            qs.annotate(periodo=agrupacion)
+              .values('periodo')
+              .annotate(
+                  ingresos=Coalesce(Sum(campo, filter=Q(categoria__tipo='ingreso')), cero),
+                  gastos=Coalesce(Sum(campo, filter=Q(categoria__tipo='gasto')), cero),
+              )
+              .annotate(saldo=Window(
+                  SumaAcumulada(F('ingresos') - F('gastos'), output_field=DecimalField()),
+                  order_by=F('periodo').asc(),
+              ))
+              .order_by('periodo')
+        )
+
+    def consulta_comparacion(self, periodos):
+        """
+        Filas {mes_grupo, categoria, categoria__nombre, categoria__tipo, p0,
+        p1, ...} con la suma de cada periodo (comparacion.periodos) por mes y
+        categoría. Los meses completos se suman de AgregadoMensual y los días
+        sueltos de los movimientos, en una sola consulta (UNION ALL).
+        """
+        params = self.request.query_params
+        agregados = agregados_para(self.request.user, {'categoria': params.get('categoria'), 'tipo': params.get('tipo')})
+        if agregados is None:
+            por_periodo = [(None, [(p.desde, p.hasta)]) for p in periodos]
+        else:
+            por_periodo = [comparacion.partes(p) for p in periodos]
+
+        consultas = []
+        if any(meses for meses, _ in por_periodo):
+            consultas.append(self._sumas_por_periodo(
+                agregados, F('mes'), 'total',
+                [Q(mes__range=meses) if meses else None for meses, _ in por_periodo],
+            ))
+        if any(dias for _, dias in por_periodo):
+            consultas.append(self._sumas_por_periodo(
+                self.get_queryset(fechas=False), TruncMonth('fecha'), 'cantidad',
+                [reduce(operator.or_, (Q(fecha__range=r) for r in dias)) if dias else None for _, dias in por_periodo],
+            ))
+        if len(consultas) == 1:
+            return consultas[0]
+        return consultas[0].union(consultas[1], all=True)
+
+    @staticmethod
+    def _sumas_por_periodo(qs, mes, campo, filtros):
+        """
+        Suma de `campo` por mes y categoría para cada filtro (p0, p1, ...),
+        sobre las filas de alguno de ellos. Las dos partes de
+        consulta_comparacion tienen así las mismas columnas en el mismo orden.
+        """
+        nulo = Value(None, output_field=DecimalField())
+        return (
+            qs.filter(reduce(operator.or_, (f for f in filtros if f is not None)))
+              .annotate(mes_grupo=mes)
+              .values('categoria', 'categoria__nombre', 'categoria__tipo', 'mes_grupo')
+              .annotate(**{
+                  f'p{i}': nulo if filtro is None else Sum(campo, filter=filtro) for i, filtro in enumerate(filtros)
+              })
+              .order_by()
+        )
+
+    def saldo_anterior(self):
+        """
+        Ingresos - gastos antes de date_from con el resto de filtros (0 sin
+        date_from). Si date_from es día 1 se suma sobre AgregadoMensual.
+        """
+        params = self.request.query_params
+        date_from = params.get('date_from')
+        if not date_from:
+            return 0
+
+        agregados = None
+        try:
+            desde = parse_date(date_from)
+        except ValueError:
+            desde = None
+        if desde is not None and desde.day == 1:
+            agregados = agregados_para(self.request.user, {
+                'categoria': params.get('categoria'), 'tipo': params.get('tipo'),
+                'date_to': (desde - timedelta(days=1)).isoformat(),
             })
+        if agregados is not None:
+            qs, campo = agregados, 'total'
+        else:
+            qs, campo = self.get_queryset(fechas=False).filter(fecha__lt=date_from), 'cantidad'
+
+        totales = qs.aggregate(
+            ingresos=Sum(campo, filter=Q(categoria__tipo='ingreso')),
+            gastos=Sum(campo, filter=Q(categoria__tipo='gasto')),
+        )
+        return (totales['ingresos'] or 0) - (totales['gastos'] or 0)
 
-        return Response({'series': series})
+    @action(detail=False, methods=['get'])
+    @respuesta_cacheada
+    def saldo(self, request):
+        """
+        Evolución del saldo por ?periodo=dia|semana|mes (mes por defecto), con
+        los filtros de resumen-mensual. Con ?saldo_inicial=1 el acumulado parte
+        de lo anterior a date_from. Solo aparecen los periodos con movimientos;
+        en los que faltan el saldo es el del periodo anterior.
+        """
+        periodo = request.query_params.get('periodo', 'mes')
+        if periodo not in ('dia', 'semana', 'mes'):
+            raise ValidationError({'periodo': "Debe ser 'dia', 'semana' o 'mes'."})
+        saldo_inicial = self.saldo_anterior() if request.query_params.get('saldo_inicial') in ('1', 'true') else 0
+        return Response(serie_saldo(self.consulta_saldo(periodo), periodo, saldo_inicial))
 
     @action(detail=False, methods=['get'])
+    @respuesta_cacheada
+    def proyeccion(self, request):
+        """
+        Saldo previsto hasta ?hasta= (por defecto, dentro de un año) por
+        ?periodo=dia|semana|mes: el saldo actual más las ocurrencias futuras de
+        los movimientos recurrentes, calculadas al vuelo. Mismo formato que saldo/.
+        """
+        periodo = request.query_params.get('periodo', 'mes')
+        if periodo not in ('dia', 'semana', 'mes'):
+            raise ValidationError({'periodo': "Debe ser 'dia', 'semana' o 'mes'."})
+        hoy = timezone.localdate()
+        hasta = request.query_params.get('hasta')
+        try:
+            hasta = parse_date(hasta) if hasta else hoy + timedelta(days=365)
+        except ValueError:
+            hasta = None
+        if hasta is None or not hoy <= hasta <= hoy + self.proyeccion_maxima:
+            raise ValidationError(
+                {'hasta': f'Debe ser una fecha YYYY-MM-DD de los próximos {self.proyeccion_maxima.days} días.'}
+            )
+        filas = recurrentes.proyeccion(request.user, hasta, periodo)
+        return Response(serie_saldo(filas, periodo, recurrentes.saldo_actual(request.user)))
+
+    @action(detail=False, methods=['get'], url_path='resumen-mensual')
+    @respuesta_cacheada
+    def resumen_mensual(self, request):
+        """
+        Agrupa por mes y devuelve ingresos, gastos y balance por mes.
+        Respeta filtros: categoria, tipo, date_from, date_to.
+        Si las fechas coinciden con meses completos se lee de AgregadoMensual.
+        """
+        return Response({'series': serie_mensual(self.consulta_resumen_mensual())})
+
+    @action(detail=False, methods=['get'])
+    @respuesta_cacheada
     def resumen(self, request):
         """
         Devuelve totales y desglose por categoría, respetando los mismos filtros
         (categoria, tipo, date_from, date_to) aplicados en get_queryset.
+        Igual que resumen-mensual, usa AgregadoMensual cuando los filtros lo permiten.
         """
-        qs = self.get_queryset()
-        total_ingresos = qs.filter(categoria__tipo='ingreso').aggregate(total=Sum('cantidad'))['total'] or 0
-        total_gastos = qs.filter(categoria__tipo='gasto').aggregate(total=Sum('cantidad'))['total'] or 0
+        return Response(datos_resumen(list(self.consulta_resumen())))
 
-        por_categoria = qs.values('categoria', 'categoria__nombre', 'categoria__tipo') \
-                          .annotate(total=Sum('cantidad')) \
-                          .order_by('-total')
+    @action(detail=False, methods=['get'])
+    @respuesta_cacheada
+    def comparar(self, request):
+        """
+        Compara el periodo [date_from, date_to] con los de ?comparar=
+        (anterior, anio_anterior o desde:hasta; por defecto los dos primeros):
+        totales, desglose por categoría y serie mensual con la diferencia y la
+        variación porcentual frente a cada uno. Admite categoria y tipo.
+        """
+        periodos = comparacion.periodos(request.query_params)
+        return Response(comparacion.datos_comparacion(self.consulta_comparacion(periodos), periodos))
 
-        return Response({
+    @action(detail=False, methods=['get'])
+    @respuesta_cacheada
+    def dashboard(self, request):
+        """
+        Reúne en una sola respuesta la serie mensual (como resumen-mensual), los
+        totales y el desglose por categoría (como resumen). Con
+        ?incluir_movimientos=1 añade además la página pedida del listado.
+
+        Todo sale de la misma base filtrada (categoria, tipo, date_from, date_to
+        y también search) con una única consulta agrupada por mes y categoría.
+        """
+        qs, campo = self.get_origen_resumen(con_busqueda=True)
+        if campo == 'cantidad':
+            qs = qs.annotate(mes=TruncMonth('fecha'))
+
+        filas = (
+            qs.values('mes', 'categoria', 'categoria__nombre', 'categoria__tipo')
+              .annotate(total=Sum(campo))
+              .order_by('mes')
+        )
+
+        meses = {}
+        categorias = {}
+        for row in filas:
+            mes = meses.setdefault(row['mes'], {'ingreso': 0, 'gasto': 0})
+            if row['categoria__tipo'] in mes:
+                mes[row['categoria__tipo']] += row['total']
+
+            clave = (row['categoria'], row['categoria__nombre'], row['categoria__tipo'])
+            categorias[clave] = categorias.get(clave, 0) + row['total']
+
+        series = [
+            {
+                'month': mes.strftime('%Y-%m'),
+                'ingresos': float(t['ingreso']),
+                'gastos': float(t['gasto']),
+                'balance': float(t['ingreso'] - t['gasto']),
+            }
+            for mes, t in meses.items()
+        ]
+        por_categoria = sorted(
+            (
+                {'categoria': cat, 'categoria__nombre': nombre, 'categoria__tipo': tipo, 'total': total}
+                for (cat, nombre, tipo), total in categorias.items()
+            ),
+            key=lambda c: c['total'], reverse=True,
+        )
+        total_ingresos, total_gastos = totales_por_tipo(por_categoria)
+
+        data = {
+            'series': series,
             'total_ingresos': total_ingresos,
             'total_gastos': total_gastos,
-            'balance': (total_ingresos - total_gastos),
-            'por_categoria': list(por_categoria),
+            'balance': total_ingresos - total_gastos,
+            'por_categoria': por_categoria,
+        }
+
+        if request.query_params.get('incluir_movimientos') in ('1', 'true'):
+            movimientos = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(movimientos)
+            if page is not None:
+                data['movimientos'] = self.get_paginated_response(self.get_serializer(page, many=True).data).data
+            else:
+                data['movimientos'] = self.get_serializer(movimientos, many=True).data
+
+        return Response(data)
+
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """
+        Crea, actualiza (parcialmente) y borra movimientos en una sola petición.
+        Recibe una lista de operaciones:
+          {"accion": "crear", "categoria": 1, "fecha": "...", "cantidad": "..."}
+          {"accion": "actualizar", "id": 7, "cantidad": "..."}
+          {"accion": "eliminar", "id": 9}
+        Se valida todo antes de escribir: si alguna fila tiene errores se devuelven
+        todos juntos ({"errores": [{"indice": i, "errores": {...}}]}) y no se
+        guarda nada. Si no, se escribe con bulk_create/bulk_update en una transacción.
+        """
+        operaciones = request.data
+        if not isinstance(operaciones, list):
+            raise ValidationError({'detail': 'Se esperaba una lista de operaciones.'})
+        if len(operaciones) > self.lote_maximo:
+            raise ValidationError({'detail': f'Como máximo {self.lote_maximo} operaciones por lote.'})
+
+        errores = {}
+        por_accion = {'crear': [], 'actualizar': [], 'eliminar': []}
+        ids = {}
+        for i, op in enumerate(operaciones):
+            if not isinstance(op, dict):
+                errores[i] = {'non_field_errors': ['Cada operación debe ser un objeto.']}
+                continue
+            accion = op.get('accion', 'crear')
+            if accion not in por_accion:
+                errores[i] = {'accion': ['Debe ser crear, actualizar o eliminar.']}
+                continue
+            if accion != 'crear':
+                pk = op.get('id')
+                if not isinstance(pk, int) or isinstance(pk, bool):
+                    errores[i] = {'id': ['Este campo es requerido.']}
+                    continue
+                if pk in ids:
+                    errores[i] = {'id': [f'El movimiento ya aparece en la operación {ids[pk]}.']}
+                    continue
+                ids[pk] = i
+            por_accion[accion].append((i, op))
+
+        # Validación de campos: un serializer reutilizado por tipo de operación, sin consultas
+        validados = {}
+        for accion, partial in (('crear', False), ('actualizar', True)):
+            serializer = MovimientoLoteSerializer(partial=partial, context=self.get_serializer_context())
+            for i, op in por_accion[accion]:
+                try:
+                    validados[i] = serializer.run_validation(op)
+                except ValidationError as exc:
+                    errores[i] = as_serializer_error(exc)
+
+        # Pertenencia de categorías y movimientos: una consulta para cada cosa
+        usuario = request.user
+        categorias = {datos['categoria_id'] for datos in validados.values() if datos.get('categoria_id')}
+        propias = set(Categoria.objects.filter(usuario=usuario, id__in=categorias).values_list('id', flat=True))
+        for i, datos in validados.items():
+            if datos.get('categoria_id') and datos['categoria_id'] not in propias:
+                errores.setdefault(i, {})['categoria'] = ['La categoría no existe o no pertenece al usuario.']
+
+        existentes = Movimiento.objects.filter(usuario=usuario).in_bulk(list(ids))
+        for pk, i in ids.items():
+            if pk not in existentes:
+                errores.setdefault(i, {})['id'] = ['No existe el movimiento.']
+
+        if errores:
+            return Response(
+                {'errores': [{'indice': i, 'errores': errores[i]} for i in sorted(errores)]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        deltas = Deltas()
+        nuevos = [Movimiento(usuario=usuario, **validados[i]) for i, _ in por_accion['crear']]
+        for mov in nuevos:
+            deltas.sumar(mov)
+
+        actualizados = []
+        campos = set()
+        for i, op in por_accion['actualizar']:
+            mov = existentes[op['id']]
+            deltas.restar(mov)
+            for campo, valor in validados[i].items():
+                setattr(mov, campo, valor)
+                campos.add(campo)
+            deltas.sumar(mov)
+            actualizados.append(mov)
+        if actualizados:
+            # bulk_update no pasa por auto_now
+            ahora = timezone.now()
+            for mov in actualizados:
+                mov.modificado = ahora
+            campos.add('modificado')
+
+        eliminados = [existentes[op['id']] for _, op in por_accion['eliminar']]
+        for mov in eliminados:
+            deltas.restar(mov)
+
+        with transaction.atomic(), en_lote():
+            Movimiento.objects.bulk_create(nuevos, batch_size=1000)
+            if actualizados and campos:
+                Movimiento.objects.bulk_update(actualizados, sorted(campos), batch_size=1000)
+            if eliminados:
+                Movimiento.objects.filter(pk__in=[m.pk for m in eliminados]).delete()
+                registrar_borrados(Movimiento, usuario.pk, [m.pk for m in eliminados])
+            deltas.aplicar()
+            datos_modificados(request.user.pk)
+
+        return Response({
+            'creados': [m.pk for m in nuevos],
+            'actualizados': [m.pk for m in actualizados],
+            'eliminados': [m.pk for m in eliminados],
         })
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def importar(self, request):
+        """
+        Importa un extracto bancario subido en el campo 'fichero' (multipart).
+        Campos opcionales: formato (csv | ofx; por defecto según la extensión),
+        codificacion (utf-8-sig), categoria (categoría para filas sin ella) y,
+        para CSV, separador (;), decimal (,), formato_fecha (%d/%m/%Y) y
+        columnas (JSON campo -> cabecera, p. ej. {"cantidad": "Importe"}).
+        El fichero se procesa en streaming y se inserta por trozos.
+        """
+        fichero = request.FILES.get('fichero')
+        if fichero is None:
+            raise ValidationError({'fichero': 'Este campo es requerido.'})
+
+        datos = request.data
+        formato, opciones = opciones_importacion(datos, fichero)
+        try:
+            texto = io.TextIOWrapper(fichero.file, encoding=datos.get('codificacion') or 'utf-8-sig', newline='')
+            resultado = importacion.importar(
+                request.user,
+                importacion.leer(texto, formato, **opciones),
+                categoria_por_defecto=datos.get('categoria') or 'Importados',
+            )
+        except LookupError:
+            raise ValidationError({'codificacion': 'Codificación desconocida.'})
+        except UnicodeDecodeError:
+            raise ValidationError({'codificacion': 'El fichero no está en la codificación indicada.'})
+        except importacion.ErrorImportacion as exc:
+            raise ValidationError({'detail': str(exc)})
+
+        return Response(resultado, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """
+        Exporta todos los movimientos que cumplen los filtros del listado
+        (categoria, tipo, fechas, search y ordering), sin paginar.
+        ?formato=csv (por defecto) | ndjson. La respuesta se genera en
+        streaming desde un cursor, sin cargar las filas en memoria (también
+        con ASGI, con un iterador asíncrono).
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in exportacion.FORMATOS:
+            raise ValidationError({'formato': f"Formato '{formato}' no soportado (csv o ndjson)."})
+        content_type, extension = exportacion.FORMATOS[formato]
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # El cuerpo se genera después de terminar la vista: se fija ya la base
+        # de datos (réplica o primario) de la que leer
+        contenido = exportacion.generar(
+            queryset.using(queryset.db), formato, chunk_size=self.exportar_chunk_size
+        )
+        if isinstance(request._request, ASGIRequest):
+            contenido = exportacion.en_asincrono(contenido)
+        respuesta = StreamingHttpResponse(contenido, content_type=content_type)
+        respuesta['Content-Disposition'] = f'attachment; filename="movimientos.{extension}"'
+        return respuesta
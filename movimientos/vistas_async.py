@@ -0,0 +1,176 @@
+# movimientos/vistas_async.py
+"""
+Lecturas de movimientos en vistas asíncronas (ASGI), bajo /api/async/movimientos/:
+listado, resumen y resumen-mensual.
+
+Devuelven lo mismo que las acciones de MovimientoViewSet (se reutilizan sus
+filtros, su búsqueda y el formato de las respuestas) pero son vistas async de
+Django, porque DRF no las admite. El ORM asíncrono de Django 4.2 ejecuta cada
+consulta en un hilo (sync_to_async); la diferencia con WSGI es que el
+servidor no reserva un hilo de trabajo por petición, así que una agregación
+lenta no bloquea a las demás.
+
+Las consultas independientes de una misma petición (COUNT y página del
+listado) se lanzan a la vez con `en_paralelo`, cada una con su conexión.
+Estas vistas no usan la caché de respuestas de cache_api; leen de las
+réplicas igual que las síncronas (replicas.py).
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connection
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .autenticacion import TokenAuthenticationCacheada
+from .replicas import lecturas_para
+from .views import MovimientoViewSet, datos_resumen, serie_mensual
+
+
+def _respuesta(data, status_code=status.HTTP_200_OK):
+    # Mismo JSON que el JSONRenderer de las vistas síncronas
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status_code)
+
+
+def _con_conexion_propia(funcion):
+    """Como una petición: cierra la conexión del hilo si caducó (CONN_MAX_AGE) antes y después."""
+    def envoltorio():
+        close_old_connections()
+        try:
+            return funcion()
+        finally:
+            close_old_connections()
+    return envoltorio
+
+
+def _en_transaccion():
+    return connection.in_atomic_block
+
+
+async def en_paralelo(*funciones):
+    """
+    Ejecuta a la vez funciones síncronas que consultan la base de datos, cada
+    una en un hilo del ejecutor por defecto y con su propia conexión (las
+    llamadas del ORM asíncrono de una petición comparten hilo y conexión, así
+    que con asyncio.gather irían una detrás de otra). Dentro de una
+    transacción se ejecutan en orden en la conexión de la petición, la única
+    que ve sus cambios sin confirmar.
+    """
+    if len(funciones) > 1 and not await sync_to_async(_en_transaccion)():
+        return await asyncio.gather(*(
+            sync_to_async(_con_conexion_propia(funcion), thread_sensitive=False)()
+            for funcion in funciones
+        ))
+    return [await sync_to_async(funcion)() for funcion in funciones]
+
+
+def vista_async(accion):
+    """
+    Decorador de las vistas: solo GET, autenticación por token (con la caché
+    de autenticacion.py) y errores de DRF como respuesta JSON. La función
+    decorada recibe un MovimientoViewSet preparado como para `accion` y
+    devuelve los datos de la respuesta.
+    """
+    def decorador(funcion):
+        @wraps(funcion)
+        async def envoltorio(request):
+            autenticador = TokenAuthenticationCacheada()
+            try:
+                if request.method != 'GET':
+                    raise exceptions.MethodNotAllowed(request.method)
+                credenciales = await autenticador.aauthenticate(request)
+                if credenciales is None:
+                    raise exceptions.NotAuthenticated()
+
+                peticion = Request(request)
+                peticion.user, peticion.auth = credenciales
+                vista = MovimientoViewSet(request=peticion, action=accion, format_kwarg=None, args=(), kwargs={})
+                # sync_to_async copia las variables de contexto: las consultas de los hilos también van a la réplica
+                with lecturas_para(peticion.user.pk):
+                    return _respuesta(await funcion(vista))
+            except exceptions.APIException as exc:
+                data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                respuesta = _respuesta(data, exc.status_code)
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    respuesta['WWW-Authenticate'] = autenticador.authenticate_header(request)
+                elif isinstance(exc, exceptions.MethodNotAllowed):
+                    respuesta['Allow'] = 'GET'
+                return respuesta
+        return envoltorio
+    return decorador
+
+
+def _enlaces(paginador, request, numero, paginas):
+    """Enlaces next/previous como los de PageNumberPagination."""
+    url = request.build_absolute_uri()
+    siguiente = anterior = None
+    if numero < paginas:
+        siguiente = replace_query_param(url, paginador.page_query_param, numero + 1)
+    if numero == 2:
+        anterior = remove_query_param(url, paginador.page_query_param)
+    elif numero > 2:
+        anterior = replace_query_param(url, paginador.page_query_param, numero - 1)
+    return siguiente, anterior
+
+
+@vista_async('list')
+async def listado(vista):
+    """GET /api/async/movimientos/ (mismos parámetros que /api/movimientos/)."""
+    request = vista.request
+    queryset = await sync_to_async(lambda: vista.filter_queryset(vista.get_queryset()))()
+    paginador = vista.paginator
+
+    if not isinstance(paginador, PageNumberPagination):
+        # ?paginacion=cursor: una sola consulta, sin nada que paralelizar
+        pagina = await sync_to_async(paginador.paginate_queryset)(queryset, request, vista)
+        return paginador.get_paginated_response(vista.get_serializer(pagina, many=True).data).data
+
+    tamano = paginador.get_page_size(request)
+    numero = request.query_params.get(paginador.page_query_param) or 1
+    filas = None
+    if numero in paginador.last_page_strings:
+        total = await queryset.acount()
+        numero = max(1, -(-total // tamano))
+    else:
+        try:
+            numero = int(numero)
+        except ValueError:
+            raise exceptions.NotFound(paginador.invalid_page_message)
+        if numero < 1:
+            raise exceptions.NotFound(paginador.invalid_page_message)
+        inicio = (numero - 1) * tamano
+        total, filas = await en_paralelo(queryset.count, lambda: list(queryset[inicio:inicio + tamano]))
+
+    paginas = max(1, -(-total // tamano))
+    if numero > paginas:
+        raise exceptions.NotFound(paginador.invalid_page_message)
+    if filas is None:
+        inicio = (numero - 1) * tamano
+        filas = [movimiento async for movimiento in queryset[inicio:inicio + tamano]]
+
+    siguiente, anterior = _enlaces(paginador, request, numero, paginas)
+    return {
+        'count': total,
+        'next': siguiente,
+        'previous': anterior,
+        'results': vista.get_serializer(filas, many=True).data,
+    }
+
+
+@vista_async('resumen')
+async def resumen(vista):
+    """GET /api/async/movimientos/resumen/"""
+    consulta = await sync_to_async(vista.consulta_resumen)()
+    return datos_resumen([fila async for fila in consulta])
+
+
+@vista_async('resumen_mensual')
+async def resumen_mensual(vista):
+    """GET /api/async/movimientos/resumen-mensual/"""
+    consulta = await sync_to_async(vista.consulta_resumen_mensual)()
+    return {'series': serie_mensual([fila async for fila in consulta])}
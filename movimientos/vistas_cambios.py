@@ -0,0 +1,50 @@
+# movimientos/vistas_cambios.py
+"""
+/api/cambios/: sincronización incremental de categorías y movimientos para
+los clientes que guardan una copia local (ver movimientos/cambios.py).
+"""
+from rest_framework import status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from . import cambios
+from .serializers import CategoriaSerializer, MovimientoSerializer
+from .views import IsAuthenticatedAndOwner
+
+SERIALIZERS = {'categorias': CategoriaSerializer, 'movimientos': MovimientoSerializer}
+
+
+class CambiosViewSet(viewsets.ViewSet):
+    """
+    Sin LecturaEnReplicaMixin ni caché de respuestas: una réplica retrasada
+    perdería cambios anteriores al token, y el token cambia en cada petición.
+    """
+    permission_classes = [IsAuthenticatedAndOwner]
+
+    def list(self, request):
+        """
+        ?since=<token> (el de la respuesta anterior; sin él, todas las filas)
+        y ?modelos=categorias,movimientos (por defecto, los dos). Devuelve
+        {"token": ..., "categorias": {"actualizados": [...], "borrados": [ids]},
+        "movimientos": {...}}, con las filas como en los listados. Si no se
+        pueden dar los cambios responde 410 con el token desde el que seguir
+        tras volver a cargarlo todo.
+        """
+        modelos = []
+        for nombre in (request.query_params.get('modelos') or ','.join(cambios.MODELOS)).split(','):
+            nombre = nombre.strip()
+            if nombre not in cambios.MODELOS:
+                raise ValidationError({'modelos': f"'{nombre}' no es 'categorias' ni 'movimientos'."})
+            if nombre not in modelos:
+                modelos.append(nombre)
+        since = request.query_params.get('since')
+        desde = cambios.leer_token(since) if since else None
+
+        try:
+            datos = cambios.cambios(request.user, modelos, desde)
+        except cambios.CambiosPerdidos as exc:
+            return Response({'detail': str(exc), 'token': exc.token}, status=status.HTTP_410_GONE)
+        for nombre in modelos:
+            serializer = SERIALIZERS[nombre](datos[nombre]['actualizados'], many=True, context={'request': request})
+            datos[nombre]['actualizados'] = serializer.data
+        return Response(datos)
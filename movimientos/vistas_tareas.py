@@ -0,0 +1,84 @@
+# movimientos/vistas_tareas.py
+"""
+/api/tareas/: encargar trabajos pesados (informes de varios años, recalcular
+agregados, importaciones y exportaciones grandes) y consultar cómo van. La
+petición solo guarda la tarea y responde 202; la ejecutan los procesos de
+`manage.py procesar_tareas` (ver movimientos/tareas.py).
+"""
+import codecs
+import os
+
+from django.http import FileResponse
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from . import exportacion, tareas
+from .models import Tarea
+from .pagination import StandardResultsSetPagination
+from .serializers import TareaSerializer
+from .views import IsAuthenticatedAndOwner, opciones_importacion
+
+
+class TareaViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.CreateModelMixin,
+                   mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    serializer_class = TareaSerializer
+    permission_classes = [IsAuthenticatedAndOwner]
+    pagination_class = StandardResultsSetPagination
+
+    def get_queryset(self):
+        return Tarea.objects.filter(usuario=self.request.user).order_by('-id')
+
+    def create(self, request, *args, **kwargs):
+        """
+        JSON {"tipo": ..., "parametros": {...}}. Para importar, multipart con
+        tipo=importar, fichero y los mismos campos que /movimientos/importar/.
+        """
+        fichero = None
+        datos = request.data
+        if datos.get('tipo') == 'importar':
+            fichero = request.FILES.get('fichero')
+            if fichero is None:
+                raise ValidationError({'fichero': 'Este campo es requerido.'})
+            formato, opciones = opciones_importacion(datos, fichero)
+            if formato not in ('csv', 'ofx'):
+                raise ValidationError({'formato': f"Formato '{formato}' no soportado (csv u ofx)."})
+            codificacion = datos.get('codificacion') or 'utf-8-sig'
+            try:
+                codecs.lookup(codificacion)
+            except LookupError:
+                raise ValidationError({'codificacion': 'Codificación desconocida.'})
+            datos = {'tipo': 'importar', 'parametros': {
+                'formato': formato, 'opciones': opciones, 'codificacion': codificacion,
+                'categoria': datos.get('categoria') or 'Importados',
+            }}
+
+        serializer = self.get_serializer(data=datos)
+        serializer.is_valid(raise_exception=True)
+        tarea = tareas.encolar(
+            request.user, serializer.validated_data['tipo'], serializer.validated_data.get('parametros'), fichero
+        )
+        ubicacion = reverse('tarea-detail', args=[tarea.pk], request=request)
+        return Response(self.get_serializer(tarea).data, status=status.HTTP_202_ACCEPTED, headers={'Location': ubicacion})
+
+    def perform_destroy(self, instance):
+        """Cancela una tarea pendiente o borra una terminada con sus ficheros; las en curso no."""
+        if instance.estado == Tarea.EN_CURSO:
+            raise ValidationError({'detail': 'La tarea se está ejecutando; se podrá borrar cuando termine.'})
+        instance.entrada.delete(save=False)
+        instance.salida.delete(save=False)
+        instance.delete()
+
+    @action(detail=True, methods=['get'])
+    def descarga(self, request, pk=None):
+        """Fichero generado por una tarea de exportación terminada."""
+        tarea = self.get_object()
+        if not tarea.salida:
+            raise NotFound('Esta tarea no tiene ningún fichero para descargar.')
+        content_type, _ = exportacion.FORMATOS[tarea.parametros.get('formato', 'csv')]
+        return FileResponse(
+            tarea.salida.open('rb'), as_attachment=True,
+            filename=os.path.basename(tarea.salida.name), content_type=content_type,
+        )
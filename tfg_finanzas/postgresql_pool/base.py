@@ -0,0 +1,144 @@
+# tfg_finanzas/postgresql_pool/base.py
+"""
+Backend de PostgreSQL (psycopg2) con un pool de conexiones por proceso.
+
+Django 4.2 no trae pool: con CONN_MAX_AGE = 0 cada petición abre y cierra
+una conexión, y las conexiones persistentes (CONN_MAX_AGE > 0) van ligadas
+a un hilo, lo que bajo ASGI deja conexiones abiertas por cada hilo del
+ejecutor. Este backend se usa con CONN_MAX_AGE = 0: cuando Django "cierra"
+la conexión al terminar la petición, se devuelve al pool (con ROLLBACK si
+quedó una transacción abierta), y la siguiente petición de cualquier hilo
+la reutiliza sin el coste de conectar.
+
+Se configura con la clave POOL de DATABASES:
+
+    'ENGINE': 'tfg_finanzas.postgresql_pool',
+    'CONN_MAX_AGE': 0,
+    'POOL': {'MAXIMO': 10, 'ESPERA': 10, 'VERIFICAR_TRAS': 30},
+
+MAXIMO es el número de conexiones abiertas como mucho; si están todas en
+uso se espera hasta ESPERA segundos antes de fallar. Una conexión que lleva
+más de VERIFICAR_TRAS segundos sin usarse se comprueba con SELECT 1 antes de
+entregarla (p. ej. tras reiniciar el servidor). Las que han dado errores se
+cierran en lugar de devolverse.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class Pool:
+    def __init__(self, maximo=10, espera=10, verificar_tras=30):
+        self.espera = espera
+        self.verificar_tras = verificar_tras
+        self._libres = deque()  # (conexión, instante en que se devolvió)
+        self._huecos = threading.BoundedSemaphore(maximo)
+        self._lock = threading.Lock()
+
+    def tomar(self, conectar):
+        """Entrega una conexión libre o, si no hay, una nueva de conectar()."""
+        if not self._huecos.acquire(timeout=self.espera):
+            raise OperationalError(f'No hay conexiones libres en el pool tras esperar {self.espera} s.')
+        try:
+            while True:
+                with self._lock:
+                    # La última devuelta: las que sobran se quedan al fondo y son las que se verifican
+                    conexion, desde = self._libres.pop() if self._libres else (None, None)
+                if conexion is None:
+                    return conectar()
+                if self._usable(conexion, desde):
+                    return conexion
+                self._cerrar(conexion)
+        except BaseException:
+            self._huecos.release()
+            raise
+
+    def devolver(self, conexion, descartar=False):
+        try:
+            if not descartar and not conexion.closed:
+                estado = conexion.get_transaction_status()
+                if estado == TRANSACTION_STATUS_UNKNOWN:
+                    descartar = True
+                elif estado != TRANSACTION_STATUS_IDLE:
+                    conexion.rollback()
+            if descartar or conexion.closed:
+                self._cerrar(conexion)
+            else:
+                with self._lock:
+                    self._libres.append((conexion, time.monotonic()))
+        except Exception:
+            self._cerrar(conexion)
+        finally:
+            self._huecos.release()
+
+    def cerrar(self):
+        """Cierra las conexiones libres (las que están en uso se cierran al devolverlas)."""
+        with self._lock:
+            libres, self._libres = list(self._libres), deque()
+        for conexion, _ in libres:
+            self._cerrar(conexion)
+
+    def _usable(self, conexion, desde):
+        if conexion.closed:
+            return False
+        if time.monotonic() - desde < self.verificar_tras:
+            return True
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not conexion.autocommit:
+                conexion.rollback()
+        except base.Database.Error:
+            return False
+        return True
+
+    @staticmethod
+    def _cerrar(conexion):
+        try:
+            conexion.close()
+        except base.Database.Error:
+            pass
+
+
+def cerrar_pools():
+    """Cierra las conexiones libres de todos los pools del proceso (p. ej. antes de borrar la BD)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.cerrar()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def pool(self, conn_params):
+        # Un pool por proceso (tras un fork no se comparten sockets) y por destino
+        clave = (os.getpid(), repr(sorted(conn_params.items())))
+        with _pools_lock:
+            if clave not in _pools:
+                opciones = self.settings_dict.get('POOL', {})
+                _pools[clave] = Pool(
+                    maximo=opciones.get('MAXIMO', 10), espera=opciones.get('ESPERA', 10),
+                    verificar_tras=opciones.get('VERIFICAR_TRAS', 30),
+                )
+            return _pools[clave]
+
+    def get_new_connection(self, conn_params):
+        self._pool_actual = self.pool(conn_params)
+        conexion = self._pool_actual.tomar(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # Lo fija la conexión original al crearse; una reutilizada no pasa por ahí
+        nivel = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = IsolationLevel(nivel) if nivel is not None else IsolationLevel.READ_COMMITTED
+        return conexion
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._pool_actual.devolver(self.connection, descartar=self.errors_occurred)
@@ -1,12 +1,15 @@
 # tfg_finanzas/register_api.py
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers, status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 
+from movimientos.categorias import crear_categorias_iniciales
+
 class RegisterSerializer(serializers.Serializer):
     username = serializers.CharField(max_length=150)
     email = serializers.EmailField(required=False, allow_blank=True)
@@ -34,11 +37,14 @@ class RegisterSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         email = validated_data.get('email', '')
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=email,
-            password=validated_data['password']
-        )
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=validated_data['username'],
+                email=email,
+                password=validated_data['password']
+            )
+            # Categorías de partida, en un solo INSERT
+            crear_categorias_iniciales(user)
         return user
 
 class RegisterView(APIView):
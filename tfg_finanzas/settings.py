@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir la petición entera (Server-Timing y registro de peticiones lentas)
+    'movimientos.instrumentacion.InstrumentacionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +90,66 @@ DATABASES = {
 }
 
 
+# Particionado por fecha de la tabla de movimientos (solo PostgreSQL):
+# None, 'anual' o 'mensual'. Lo aplica la migración 0007 y las particiones se
+# mantienen con `manage.py particiones_movimientos` (movimientos/particiones.py).
+
+MOVIMIENTOS_PARTICIONES = None
+
+
+# Réplicas de lectura (movimientos/replicas.py): alias de DATABASES a los que
+# van las lecturas de las peticiones GET. Tras escribir, las lecturas de ese
+# usuario siguen en 'default' durante MOVIMIENTOS_REPLICAS_VENTANA segundos.
+# Para probarlo en local con una sola base de datos:
+#   DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+#   MOVIMIENTOS_REPLICAS = ['replica']
+
+DATABASE_ROUTERS = ['movimientos.replicas.RouterReplicas']
+MOVIMIENTOS_REPLICAS = []
+MOVIMIENTOS_REPLICAS_VENTANA = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Guarda las respuestas de lectura de la API por usuario (movimientos/cache_api.py).
+# Cada proceso tiene su propia LocMemCache, así que con ella no se cachean
+# respuestas: un proceso no vería las escrituras atendidas por otro. Con una
+# caché compartida (Redis o Memcached) se cachean salvo con
+# MOVIMIENTOS_CACHEAR_RESPUESTAS = False; True las cachea con cualquier
+# caché (solo para un único proceso, como runserver).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+MOVIMIENTOS_CACHEAR_RESPUESTAS = None
+
+
+# Instrumentación por petición (movimientos/instrumentacion.py): cabecera
+# Server-Timing en todas las respuestas y registro JSON de las peticiones
+# lentas. Con el logger en INFO se registra también la muestra, con las
+# consultas repetidas y similares (N+1).
+
+MOVIMIENTOS_INSTRUMENTACION_MUESTREO = 0.1
+MOVIMIENTOS_PETICION_LENTA_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'movimientos.instrumentacion': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -124,6 +186,22 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Ficheros de las tareas en segundo plano (importaciones subidas y exportaciones generadas)
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Segundos tras los que una tarea en curso se da por abandonada (su trabajador
+# ha muerto) y vuelve a la cola: más que la tarea más larga (procesar_tareas)
+MOVIMIENTOS_TAREAS_TIEMPO_MAXIMO = 3600
+
+# Sincronización incremental (/api/cambios/, movimientos/cambios.py): días que
+# se guardan las lápidas de lo borrado (`manage.py purgar_borrados`), cambios
+# como máximo por respuesta (con más, o con un token más antiguo, el cliente
+# recarga todo) y segundos que se restan al token por la diferencia de
+# relojes entre servidores
+MOVIMIENTOS_CAMBIOS_RETENCION = 30
+MOVIMIENTOS_CAMBIOS_MAXIMO = 5000
+MOVIMIENTOS_CAMBIOS_MARGEN = 5
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -131,7 +209,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication con caché token -> usuario (ver movimientos/autenticacion.py)
+        'movimientos.autenticacion.TokenAuthenticationCacheada',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -0,0 +1,128 @@
+"""
+Configuración de producción: DJANGO_SETTINGS_MODULE=tfg_finanzas.settings_produccion.
+
+Parte de settings.py y lee de variables de entorno todo lo que depende del
+despliegue; no hay credenciales en el código. Obligatorias: DJANGO_SECRET_KEY,
+DJANGO_ALLOWED_HOSTS (separados por comas) y los datos de la base de datos
+DJANGO_DB_NAME, DJANGO_DB_USER y DJANGO_DB_PASSWORD (DJANGO_DB_HOST y
+DJANGO_DB_PORT tienen valores por defecto).
+
+Conexiones a PostgreSQL según DJANGO_DB_MODO:
+
+- 'persistente' (por defecto): cada hilo del servidor conserva su conexión
+  DJANGO_DB_CONN_MAX_AGE segundos (60) y la comprueba antes de reutilizarla
+  (CONN_HEALTH_CHECKS). Para WSGI (gunicorn con workers sync o gthread).
+  Con ASGI las conexiones van ligadas a los hilos del ejecutor: mejor 'pool'.
+- 'pool': pool de conexiones por proceso (tfg_finanzas/postgresql_pool), de
+  DJANGO_DB_POOL_MAXIMO conexiones (10) con una espera máxima de
+  DJANGO_DB_POOL_ESPERA segundos (10). Vale para WSGI y ASGI.
+- 'pgbouncer': conexión a un PgBouncer en modo transaction pooling. Se
+  mantienen las conexiones persistentes contra PgBouncer. Los cursores del
+  lado del servidor (exportar, verificar agregados) siempre se recorren
+  dentro de una transacción, así que funcionan en ese modo; psycopg2 no usa
+  sentencias preparadas del servidor.
+
+Réplicas de lectura: DJANGO_DB_REPLICAS, lista de host[:puerto] separados por
+comas, con los mismos usuario, base de datos y modo de conexión que el
+primario. Se crean los alias replica1, replica2... y las peticiones GET leen
+de ellas (movimientos/replicas.py). DJANGO_DB_REPLICAS_VENTANA (5) son los
+segundos que las lecturas de un usuario siguen en el primario tras escribir.
+La marca de esa escritura se guarda en la caché, así que con réplicas es
+obligatorio DJANGO_REDIS_URL: si no, la siguiente petición del usuario
+llegaría a otro proceso que no la ve y leería de una réplica retrasada.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES
+
+
+def entorno(nombre, defecto=None):
+    valor = os.environ.get(nombre, defecto)
+    if valor is None:
+        raise ImproperlyConfigured(f'Falta la variable de entorno {nombre}.')
+    return valor
+
+
+SECRET_KEY = entorno('DJANGO_SECRET_KEY')
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host.strip() for host in entorno('DJANGO_ALLOWED_HOSTS').split(',') if host.strip()]
+
+
+# Database
+
+MODO_CONEXIONES = entorno('DJANGO_DB_MODO', 'persistente')
+if MODO_CONEXIONES not in ('persistente', 'pool', 'pgbouncer'):
+    raise ImproperlyConfigured(f"DJANGO_DB_MODO debe ser 'persistente', 'pool' o 'pgbouncer', no '{MODO_CONEXIONES}'.")
+
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'NAME': entorno('DJANGO_DB_NAME'),
+        'USER': entorno('DJANGO_DB_USER'),
+        'PASSWORD': entorno('DJANGO_DB_PASSWORD'),
+        'HOST': entorno('DJANGO_DB_HOST', 'localhost'),
+        'PORT': entorno('DJANGO_DB_PORT', '6432' if MODO_CONEXIONES == 'pgbouncer' else '5432'),
+        'CONN_MAX_AGE': int(entorno('DJANGO_DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': int(entorno('DJANGO_DB_CONNECT_TIMEOUT', '5')),
+            'application_name': entorno('DJANGO_DB_APPLICATION_NAME', 'tfg_finanzas'),
+        },
+    }
+}
+
+if MODO_CONEXIONES == 'pool':
+    DATABASES['default'].update({
+        'ENGINE': 'tfg_finanzas.postgresql_pool',
+        # La conexión vuelve al pool al terminar cada petición
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAXIMO': int(entorno('DJANGO_DB_POOL_MAXIMO', '10')),
+            'ESPERA': float(entorno('DJANGO_DB_POOL_ESPERA', '10')),
+            'VERIFICAR_TRAS': float(entorno('DJANGO_DB_POOL_VERIFICAR_TRAS', '30')),
+        },
+    })
+
+# Réplicas de lectura: copias de 'default' con otro host (ver movimientos/replicas.py)
+
+MOVIMIENTOS_REPLICAS = []
+for numero, direccion in enumerate(
+    (d.strip() for d in os.environ.get('DJANGO_DB_REPLICAS', '').split(',') if d.strip()), start=1
+):
+    host, _, puerto = direccion.partition(':')
+    alias = f'replica{numero}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': puerto or DATABASES['default']['PORT'],
+        # En los tests la réplica es la propia base de datos de pruebas
+        'TEST': {'MIRROR': 'default'},
+    }
+    MOVIMIENTOS_REPLICAS.append(alias)
+MOVIMIENTOS_REPLICAS_VENTANA = float(entorno('DJANGO_DB_REPLICAS_VENTANA', '5'))
+
+# Particionado de movimientos por fecha ('anual' o 'mensual'; ver movimientos/particiones.py)
+MOVIMIENTOS_PARTICIONES = os.environ.get('DJANGO_MOVIMIENTOS_PARTICIONES') or None
+
+
+# Cache: compartida entre procesos si se indica un Redis (requiere el paquete redis)
+
+if os.environ.get('DJANGO_REDIS_URL'):
+    CACHES = {
+        'default': {
+            **CACHES['default'],
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DJANGO_REDIS_URL'],
+            'OPTIONS': {},
+        }
+    }
+elif MOVIMIENTOS_REPLICAS:
+    raise ImproperlyConfigured(
+        'DJANGO_DB_REPLICAS necesita DJANGO_REDIS_URL: la marca de escritura reciente de cada usuario '
+        '(movimientos/replicas.py) tiene que verse desde todos los procesos.'
+    )
@@ -2,15 +2,25 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
-from movimientos.views import CategoriaViewSet, MovimientoViewSet
+from movimientos import vistas_async
+from movimientos.views import CategoriaViewSet, MovimientoRecurrenteViewSet, MovimientoViewSet
+from movimientos.vistas_cambios import CambiosViewSet
+from movimientos.vistas_tareas import TareaViewSet
 from tfg_finanzas.register_api import RegisterView
 
 router = DefaultRouter()
 router.register(r'categorias', CategoriaViewSet, basename='categoria')
 router.register(r'movimientos', MovimientoViewSet, basename='movimiento')
+router.register(r'recurrentes', MovimientoRecurrenteViewSet, basename='recurrente')
+router.register(r'tareas', TareaViewSet, basename='tarea')
+router.register(r'cambios', CambiosViewSet, basename='cambios')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Lecturas en vistas asíncronas (ASGI), con las mismas respuestas que las de /api/movimientos/
+    path('api/async/movimientos/', vistas_async.listado),
+    path('api/async/movimientos/resumen/', vistas_async.resumen),
+    path('api/async/movimientos/resumen-mensual/', vistas_async.resumen_mensual),
     path('api/', include(router.urls)),
     path('api-auth/', include('rest_framework.urls')),
     path('api-token-auth/', obtain_auth_token),